@@ -39,7 +39,7 @@ class RecordModel {
       content: json['content'],
       recordType: json['record_type'],
       createdAt: DateTime.parse(json['created_at']),
-      emotionScore: (json['emotion_score'] as num).toDouble(),
+      emotionScore: (json['emotion_score'] as num?)?.toDouble() ?? 0.5, // AI 分析完成前为空
       categories: List<String>.from(json['categories'] ?? []),
       isSynced: json['is_synced'] ?? true, // 从云端获取的默认已同步
       userId: json['user_id'],
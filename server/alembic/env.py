@@ -30,6 +30,17 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    全文检索对象 (SQLite 的 records_fts 虚拟表及其影子表、PostgreSQL 的 GIN 表达式索引)
+    由迁移中的原生 DDL 维护，不在模型元数据中，autogenerate 时跳过，避免生成删除它们的迁移
+    """
+    if type_ == "table" and name.startswith("records_fts"):
+        return False
+    if type_ == "index" and name == "ix_records_search_terms":
+        return False
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
@@ -38,6 +49,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -55,6 +67,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_object=include_object,
             render_as_batch=True
         )
 
@@ -0,0 +1,53 @@
+"""Add daily stats rollups
+
+Revision ID: 0a6d3e9f8b21
+Revises: f1a8c4e2b7d5
+Create Date: 2026-10-18 16:48:12.530284
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6d3e9f8b21'
+down_revision: Union[str, Sequence[str], None] = 'f1a8c4e2b7d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_stats',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('record_count', sa.Integer(), nullable=False),
+        sa.Column('scored_count', sa.Integer(), nullable=False),
+        sa.Column('emotion_sum', sa.Float(), nullable=False),
+        sa.Column('emotion_min', sa.Float(), nullable=True),
+        sa.Column('emotion_max', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'date', name='uq_daily_stats_user_date')
+    )
+    op.create_index(op.f('ix_daily_stats_id'), 'daily_stats', ['id'], unique=False)
+
+    op.create_table(
+        'daily_category_stats',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'date', 'category', name='uq_daily_category_stats_user_date_category')
+    )
+    op.create_index(op.f('ix_daily_category_stats_id'), 'daily_category_stats', ['id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_daily_category_stats_id'), table_name='daily_category_stats')
+    op.drop_table('daily_category_stats')
+    op.drop_index(op.f('ix_daily_stats_id'), table_name='daily_stats')
+    op.drop_table('daily_stats')
@@ -0,0 +1,25 @@
+"""Add record analysis source
+
+Revision ID: 3c9b7e5d1f42
+Revises: 0a6d3e9f8b21
+Create Date: 2026-10-18 16:05:41.502317
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9b7e5d1f42'
+down_revision: Union[str, Sequence[str], None] = '0a6d3e9f8b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # 已有记录无法区分是 LLM 还是降级结果，保持为空，不参与本地分类器训练
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('analysis_source', sa.String(), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_column('analysis_source')
@@ -0,0 +1,47 @@
+"""Add record sync tracking
+
+Revision ID: 5e8a1c7d2b94
+Revises: 9d2f6b4a8c13
+Create Date: 2026-10-18 18:11:46.902735
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8a1c7d2b94'
+down_revision: Union[str, Sequence[str], None] = '9d2f6b4a8c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_records_user_id_change_seq', ['user_id', 'change_seq'], unique=False)
+
+    # 已有记录按创建顺序编号，保证每个用户内序号唯一，首次同步 (since=0) 可以分页拉取
+    op.execute("UPDATE records SET updated_at = created_at")
+    op.execute(
+        "UPDATE records SET change_seq = numbered.seq FROM ("
+        "SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at, id) AS seq FROM records"
+        ") AS numbered WHERE records.id = numbered.id"
+    )
+    op.execute(
+        "UPDATE users SET change_seq = COALESCE((SELECT MAX(change_seq) FROM records WHERE records.user_id = users.id), 0)"
+    )
+
+def downgrade() -> None:
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_index('ix_records_user_id_change_seq')
+        batch_op.drop_column('change_seq')
+        batch_op.drop_column('deleted_at')
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('change_seq')
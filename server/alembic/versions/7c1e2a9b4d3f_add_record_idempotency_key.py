@@ -0,0 +1,26 @@
+"""Add record idempotency key
+
+Revision ID: 7c1e2a9b4d3f
+Revises: 4505489d7f18
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e2a9b4d3f'
+down_revision: Union[str, Sequence[str], None] = '4505489d7f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(), nullable=True))
+        batch_op.create_unique_constraint('uq_records_user_idempotency_key', ['user_id', 'idempotency_key'])
+
+def downgrade() -> None:
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_records_user_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
@@ -0,0 +1,55 @@
+"""Add record search index
+
+Revision ID: 8b3f6d2a9e47
+Revises: 5e8a1c7d2b94
+Create Date: 2026-10-18 21:04:12.518330
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f6d2a9e47'
+down_revision: Union[str, Sequence[str], None] = '5e8a1c7d2b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # 不使用 batch 模式：SQLite 重建 records 表会改变 rowid，外部内容 FTS5 表依赖 rowid
+    op.add_column('records', sa.Column('search_terms', sa.Text(), nullable=True))
+    op.add_column('records', sa.Column('embedding', sa.LargeBinary(), nullable=True))
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(search_terms, content='records', content_rowid='rowid', detail='none')")
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS records_fts_ai AFTER INSERT ON records BEGIN "
+            "INSERT INTO records_fts(rowid, search_terms) VALUES (new.rowid, new.search_terms); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON records BEGIN "
+            "INSERT INTO records_fts(records_fts, rowid, search_terms) VALUES ('delete', old.rowid, old.search_terms); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF search_terms ON records BEGIN "
+            "INSERT INTO records_fts(records_fts, rowid, search_terms) VALUES ('delete', old.rowid, old.search_terms); "
+            "INSERT INTO records_fts(rowid, search_terms) VALUES (new.rowid, new.search_terms); END"
+        )
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_records_search_terms ON records USING gin (to_tsvector('simple', coalesce(search_terms, '')))")
+    # 已有记录的词项与向量由 scripts/backfill_search.py 回填 (需要应用内的切分与向量化逻辑)
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS records_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS records_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS records_fts_ai")
+        op.execute("DROP TABLE IF EXISTS records_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_records_search_terms")
+
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.drop_column('search_terms')
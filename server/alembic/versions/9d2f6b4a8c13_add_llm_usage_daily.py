@@ -0,0 +1,43 @@
+"""Add llm usage daily
+
+Revision ID: 9d2f6b4a8c13
+Revises: 3c9b7e5d1f42
+Create Date: 2026-10-18 17:32:09.184620
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6b4a8c13'
+down_revision: Union[str, Sequence[str], None] = '3c9b7e5d1f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_usage_daily',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('endpoint', sa.String(), nullable=False),
+        sa.Column('task', sa.String(), nullable=False),
+        sa.Column('provider', sa.String(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False),
+        sa.Column('estimated_calls', sa.Integer(), nullable=False),
+        sa.Column('latency_sum', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('date', 'user_id', 'endpoint', 'task', 'provider', 'model', name='uq_llm_usage_daily_key')
+    )
+    op.create_index(op.f('ix_llm_usage_daily_id'), 'llm_usage_daily', ['id'], unique=False)
+    op.create_index('ix_llm_usage_daily_date_user_id', 'llm_usage_daily', ['date', 'user_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_llm_usage_daily_date_user_id', table_name='llm_usage_daily')
+    op.drop_index(op.f('ix_llm_usage_daily_id'), table_name='llm_usage_daily')
+    op.drop_table('llm_usage_daily')
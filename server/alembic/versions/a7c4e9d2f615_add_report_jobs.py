@@ -0,0 +1,45 @@
+"""Add report jobs
+
+Revision ID: a7c4e9d2f615
+Revises: 8b3f6d2a9e47
+Create Date: 2026-10-18 21:06:42.518304
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e9d2f615'
+down_revision: Union[str, Sequence[str], None] = '8b3f6d2a9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('timezone', sa.String(), nullable=True))
+    op.create_table(
+        'report_jobs',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'date', name='uq_report_jobs_user_date')
+    )
+    op.create_index(op.f('ix_report_jobs_id'), 'report_jobs', ['id'], unique=False)
+    op.create_index('ix_report_jobs_status_date', 'report_jobs', ['status', 'date'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_report_jobs_status_date', table_name='report_jobs')
+    op.drop_index(op.f('ix_report_jobs_id'), table_name='report_jobs')
+    op.drop_table('report_jobs')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('timezone')
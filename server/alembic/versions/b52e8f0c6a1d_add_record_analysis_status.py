@@ -0,0 +1,25 @@
+"""Add record analysis status
+
+Revision ID: b52e8f0c6a1d
+Revises: 7c1e2a9b4d3f
+Create Date: 2026-10-18 11:40:05.218934
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e8f0c6a1d'
+down_revision: Union[str, Sequence[str], None] = '7c1e2a9b4d3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # 已有记录都是同步分析过的，标记为 done
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('analysis_status', sa.String(), nullable=False, server_default='done'))
+
+def downgrade() -> None:
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_column('analysis_status')
@@ -0,0 +1,25 @@
+"""Add record analysis claim
+
+Revision ID: d3b8f1a6c2e4
+Revises: a7c4e9d2f615
+Create Date: 2026-10-18 22:14:07.361920
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3b8f1a6c2e4'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e9d2f615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # 已有的 pending 记录未被认领，启动恢复时照常重新投递
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('analysis_claimed_at', sa.DateTime(), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_column('analysis_claimed_at')
@@ -0,0 +1,41 @@
+"""Add per-user time indexes and unique daily report
+
+Revision ID: e4d7a3b1c9f2
+Revises: b52e8f0c6a1d
+Create Date: 2026-10-18 14:03:52.771640
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4d7a3b1c9f2'
+down_revision: Union[str, Sequence[str], None] = 'b52e8f0c6a1d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_index('ix_records_user_id_created_at', 'records', ['user_id', 'created_at'], unique=False)
+
+    # 清理历史上并发生成的重复报告，每个 (user_id, date) 只保留一份
+    op.execute(
+        """
+        DELETE FROM daily_reports
+        WHERE date IS NOT NULL AND id NOT IN (
+            SELECT keep_id FROM (
+                SELECT MIN(id) AS keep_id FROM daily_reports
+                WHERE date IS NOT NULL
+                GROUP BY user_id, date
+            ) AS kept
+        )
+        """
+    )
+    with op.batch_alter_table('daily_reports', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_daily_reports_user_date', ['user_id', 'date'])
+
+def downgrade() -> None:
+    with op.batch_alter_table('daily_reports', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_daily_reports_user_date', type_='unique')
+
+    op.drop_index('ix_records_user_id_created_at', table_name='records')
@@ -0,0 +1,42 @@
+"""Add report coverage tracking
+
+Revision ID: f1a8c4e2b7d5
+Revises: e4d7a3b1c9f2
+Create Date: 2026-10-18 15:26:47.093315
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a8c4e2b7d5'
+down_revision: Union[str, Sequence[str], None] = 'e4d7a3b1c9f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('daily_reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('record_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_record_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('emotion_sum', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('scored_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('category_counts', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('narrative_record_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('narrative_avg_emotion', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('is_stale', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    op.execute("UPDATE daily_reports SET updated_at = created_at")
+
+def downgrade() -> None:
+    with op.batch_alter_table('daily_reports', schema=None) as batch_op:
+        batch_op.drop_column('is_stale')
+        batch_op.drop_column('narrative_avg_emotion')
+        batch_op.drop_column('narrative_record_count')
+        batch_op.drop_column('category_counts')
+        batch_op.drop_column('scored_count')
+        batch_op.drop_column('emotion_sum')
+        batch_op.drop_column('last_record_at')
+        batch_op.drop_column('record_count')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date, timedelta
+from typing import Literal, Optional
+from ..schemas.report import ReportJobEnqueueResult, ReportJobProgress
+from ..schemas.usage import UsageSummary
+from ..services.report_scheduler import report_scheduler
+from ..services.usage_service import usage_service
+from .auth import get_admin_user
+from ..models.models import UserModel
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/llm-usage", response_model=UsageSummary)
+async def get_llm_usage(
+    start_date: Optional[date] = Query(None, description="缺省为今天"),
+    end_date: Optional[date] = Query(None, description="缺省与 start_date 相同"),
+    group_by: Literal["user", "endpoint", "model", "task", "date"] = "user",
+    limit: int = Query(50, ge=1, le=1000),
+    admin: UserModel = Depends(get_admin_user)
+):
+    """
+    LLM token 用量与估算花费汇总，按用户/接口/模型/任务/日期分组，按 token 总量降序
+    """
+    start_date = start_date or date.today()
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date 不能早于 start_date")
+    return await usage_service.summarize(start_date, end_date, group_by, limit)
+
+@router.get("/report-jobs", response_model=ReportJobProgress)
+async def get_report_jobs(
+    start_date: Optional[date] = Query(None, description="缺省为昨天"),
+    end_date: Optional[date] = Query(None, description="缺省与 start_date 相同"),
+    admin: UserModel = Depends(get_admin_user)
+):
+    """
+    日报预生成进度：各日期按状态统计的任务数与最近失败的任务
+    """
+    start_date = start_date or date.today() - timedelta(days=1)
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date 不能早于 start_date")
+    return await report_scheduler.progress(start_date, end_date)
+
+@router.post("/report-jobs", response_model=ReportJobEnqueueResult)
+async def enqueue_report_jobs(
+    target_date: date = Query(..., alias="date", description="为该日期有记录的所有用户预生成日报"),
+    admin: UserModel = Depends(get_admin_user)
+):
+    """
+    手动入队 (例如补跑错过的日期)，不考虑用户时区；已有任务的 (用户, 日期) 不会重复生成
+    """
+    if target_date >= date.today():
+        raise HTTPException(status_code=400, detail="只能预生成今天之前的日报")
+    enqueued = await report_scheduler.enqueue(target_date)
+    report_scheduler.wake()
+    return {"date": target_date, "enqueued": enqueued}
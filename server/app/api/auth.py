@@ -1,59 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 from ..core.database import get_db
 from ..core.config import settings
+from ..core.otp import otp_store, rate_limiter
 from ..core.security import create_access_token
+from ..core.usage import set_usage_scope
 from ..models.models import UserModel
-from ..schemas.user import User, Token, TokenData, OTPRequest, OTPVerify
-import random
+from ..services.user_service import user_service
+from ..schemas.user import User, Token, TokenData, OTPRequest, OTPVerify, UserSettingsUpdate
+import secrets
 
 router = APIRouter(tags=["auth"])
 
-# Mock OTP storage: phone_number -> code
-otp_storage = {}
-
-async def get_current_user(db: Session = Depends(get_db), token: str = str(Depends(settings.oauth2_scheme)) if hasattr(settings, 'oauth2_scheme') else None) -> UserModel:
-    # Fallback if oauth2_scheme is not in settings
-    from fastapi.security import OAuth2PasswordBearer
-    oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
-    
-    token_val = token
-    if not token_val:
-        # This is a bit hacky but depends on how it's called
-        raise HTTPException(status_code=401, detail="Not authenticated")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> UserModel:
+    """
+    校验 Bearer token 并解析当前用户。token 携带 uid 时按主键走缓存查询，
+    不再为每个请求占用数据库连接；旧 token 只有手机号，回退到按手机号查询。
+    同时把本次请求中的 LLM 调用记到该用户和路由名下，用于用量统计与配额。
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token_val, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        phone_number: str = payload.get("sub")
-        if phone_number is None:
-            raise credentials_exception
-        token_data = TokenData(phone_number=phone_number)
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        token_data = TokenData(phone_number=payload.get("sub"), user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
-    user = db.query(UserModel).filter(UserModel.phone_number == token_data.phone_number).first()
+
+    if token_data.user_id:
+        user = await user_service.get_by_id(token_data.user_id)
+    elif token_data.phone_number:
+        user = await user_service.get_by_phone(token_data.phone_number)
+    else:
+        raise credentials_exception
+
     if user is None:
         raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+    route = request.scope.get("route")
+    set_usage_scope(user.id, f"{request.method} {getattr(route, 'path', request.url.path)}")
     return user
 
+async def get_admin_user(current_user: UserModel = Depends(get_current_user)) -> UserModel:
+    if current_user.phone_number not in settings.ADMIN_PHONE_NUMBERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
+
+async def _check_rate_limit(key: str, capacity: int, refill_seconds: float) -> None:
+    allowed, retry_after = await rate_limiter.acquire(key, capacity, refill_seconds)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many verification code requests",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
 @router.post("/send-otp")
-async def send_otp(request: OTPRequest):
+async def send_otp(request: OTPRequest, http_request: Request):
+    # 先按 IP 再按手机号限流，防止同一来源轮换号码刷短信
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    await _check_rate_limit(f"otp:ip:{client_ip}", settings.OTP_IP_BUCKET_CAPACITY, settings.OTP_IP_REFILL_SECONDS)
+    await _check_rate_limit(f"otp:phone:{request.phone_number}", settings.OTP_PHONE_BUCKET_CAPACITY, settings.OTP_PHONE_REFILL_SECONDS)
+
     # In a real app, send SMS here
-    code = str(random.randint(100000, 999999))
-    otp_storage[request.phone_number] = code
+    code = f"{secrets.randbelow(900000) + 100000}"
+    await otp_store.save(request.phone_number, code)
     print(f"OTP for {request.phone_number}: {code}")
     return {"message": "OTP sent successfully", "code": code} # Returning code for testing convenience
 
 @router.post("/login", response_model=Token)
-async def login(verify_data: OTPVerify, db: Session = Depends(get_db)):
-    # Verify OTP
-    stored_code = otp_storage.get(verify_data.phone_number)
-    if not stored_code or stored_code != verify_data.code:
+async def login(verify_data: OTPVerify, db: AsyncSession = Depends(get_db)):
+    # Verify OTP (过期或错误次数超限的验证码会被作废)
+    if not await otp_store.verify(verify_data.phone_number, verify_data.code):
         # For development, allow 123456
         if verify_data.code != "123456":
             raise HTTPException(
@@ -62,42 +88,40 @@ async def login(verify_data: OTPVerify, db: Session = Depends(get_db)):
             )
     
     # Get or create user
-    user = db.query(UserModel).filter(UserModel.phone_number == verify_data.phone_number).first()
+    user = (await db.execute(
+        select(UserModel).filter(UserModel.phone_number == verify_data.phone_number)
+    )).scalars().first()
     if not user:
         user = UserModel(
             phone_number=verify_data.phone_number,
             full_name=f"User_{verify_data.phone_number[-4:]}"
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
     # Clear OTP
-    if verify_data.phone_number in otp_storage:
-        del otp_storage[verify_data.phone_number]
+    await otp_store.discard(verify_data.phone_number)
 
     return {
-        "access_token": create_access_token(subject=user.phone_number),
+        "access_token": create_access_token(subject=user.phone_number, claims={"uid": user.id}),
         "token_type": "bearer",
     }
 
 @router.get("/me", response_model=User)
-async def read_users_me(db: Session = Depends(get_db), token: str = Depends(OAuth2PasswordBearer(tokenUrl="auth/login"))):
-    # Re-implementing get_current_user logic here for simplicity or use a proper dependency
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        phone_number: str = payload.get("sub")
-        if phone_number is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(UserModel).filter(UserModel.phone_number == phone_number).first()
-    if user is None:
-        raise credentials_exception
+async def read_users_me(current_user: UserModel = Depends(get_current_user)):
+    return current_user
+
+@router.patch("/me", response_model=User)
+async def update_users_me(
+    update: UserSettingsUpdate,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 只更新请求中出现的字段；鉴权缓存由 UserModel 的 after_update 事件清除
+    user = await db.get(UserModel, current_user.id)
+    for field, value in update.model_dump(exclude_unset=True).items():
+        setattr(user, field, value)
+    await db.commit()
+    await db.refresh(user)
     return user
@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from ..schemas.record import Record, RecordCreate
-from ..services.record_service import record_service
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Literal, Optional
+import asyncio
+import hashlib
+import json
+from ..schemas.record import Record, RecordCreate, RecordBatchCreate, RecordBatchResult, RecordSearchHit, record_payload
+from ..services.record_service import record_service, decode_cursor
+from ..services.analysis_service import analysis_service
+from ..services.search_service import search_service
 from ..core.database import get_db
+from ..core.config import settings
+from ..core.http_cache import is_not_modified, make_etag, not_modified
+from ..core.serialization import dumps_json, render_payload
+from ..services.change_log import current_change_seq
 from .auth import get_current_user
 from ..models.models import UserModel
 
@@ -11,22 +22,153 @@ router = APIRouter(prefix="/records", tags=["records"])
 
 @router.post("/", response_model=Record)
 async def create_record(
+    request: Request,
     record_in: RecordCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
     """
     创建一条新记录，并持久化到数据库
     """
-    return await record_service.create_record(db, record_in, current_user.id)
+    record = await record_service.create_record(db, record_in, current_user.id)
+    return await render_payload(request, record_payload(record))
+
+@router.post("/batch", response_model=RecordBatchResult)
+async def create_records_batch(
+    request: Request,
+    batch_in: RecordBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    批量上传记录 (离线同步)，一次事务写入，结果与请求顺序一致。
+    携带相同 idempotency_key 的重试不会产生重复记录。
+    """
+    if len(batch_in.records) > settings.RECORD_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"单次最多上传 {settings.RECORD_BATCH_MAX_SIZE} 条记录"
+        )
+    results = await record_service.create_records_batch(db, batch_in.records, current_user.id)
+    return await render_payload(request, {
+        "results": [
+            {"idempotency_key": record.idempotency_key, "created": created, "record": record_payload(record)}
+            for record, created in results
+        ]
+    })
 
 @router.get("/", response_model=List[Record])
 async def get_records(
-    limit: int = 10,
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 中的游标"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson 为流式全量导出，忽略 limit"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    按时间倒序获取记录列表，支持游标分页、日期范围和分类过滤。
+    还有下一页时通过响应头 X-Next-Cursor 返回游标。
+    Accept: application/msgpack 时返回 MessagePack，较大的响应按 Accept-Encoding 压缩。
+    响应带 ETag (用户记录的变更序号 + 查询参数)，记录未变化时 If-None-Match 返回 304。
+    """
+    if format == "ndjson":
+        try:
+            if cursor:
+                decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+        records = record_service.stream_records(current_user.id, cursor, start_date, end_date, category)
+
+        async def ndjson_stream():
+            async for record in records:
+                yield dumps_json(record_payload(record)) + b"\n"
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+    # 任何记录变更 (含分析结果回写) 都会推进变更序号，主键查询即可判断本页是否可能变化
+    limit = min(limit, settings.RECORD_PAGE_MAX_SIZE)
+    query_key = hashlib.sha256(
+        "|".join(str(p) for p in (limit, cursor, start_date, end_date, category)).encode("utf-8")
+    ).hexdigest()[:16]
+    etag = make_etag(request, await current_change_seq(db, current_user.id), query_key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if is_not_modified(request, etag):
+        return not_modified(headers)
+
+    try:
+        records, next_cursor = await record_service.list_records(
+            db, current_user.id, limit, cursor, start_date, end_date, category
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return await render_payload(request, [record_payload(r) for r in records], headers=headers)
+
+@router.get("/events")
+async def stream_analysis_events(
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    以 Server-Sent Events 推送当前用户记录的 AI 分析完成事件
+    """
+    async def event_stream():
+        events = analysis_service.subscribe(current_user.id)
+        next_event = asyncio.ensure_future(events.__anext__())
+        try:
+            while True:
+                done, _ = await asyncio.wait({next_event}, timeout=15)
+                if not done:
+                    # 心跳，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+                    continue
+                event = next_event.result()
+                next_event = asyncio.ensure_future(events.__anext__())
+                yield f"event: analysis\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.get("/search", response_model=List[RecordSearchHit])
+async def search_records(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="搜索词，中文按字与相邻二字匹配"),
+    mode: Literal["keyword", "semantic", "hybrid"] = Query("keyword", description="semantic 按本地文本向量的相似度排序"),
+    limit: int = Query(20, ge=1),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    emotion: Optional[Literal["negative", "neutral", "positive"]] = Query(None, description="情绪区间：<0.4 / 0.4-0.6 / >=0.6"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    搜索当前用户的记录，支持日期范围、分类与情绪区间过滤，结果按相关度降序
+    """
+    hits = await search_service.search(
+        db, current_user.id, q, mode, min(limit, settings.RECORD_PAGE_MAX_SIZE),
+        start_date, end_date, category, emotion, settings.SEARCH_HYBRID_CANDIDATES
+    )
+    return await render_payload(request, [{**record_payload(record), "score": score} for record, score in hits])
+
+@router.get("/{record_id}", response_model=Record)
+async def get_record(
+    request: Request,
+    record_id: str,
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
     """
-    从数据库获取最近的记录列表
+    获取单条记录，可用于轮询 AI 分析状态 (analysis_status)
     """
-    return await record_service.get_recent_records(db, current_user.id, limit)
+    record = await record_service.get_record(db, record_id, current_user.id)
+    if not record:
+        raise HTTPException(status_code=404, detail="记录不存在")
+    return await render_payload(request, record_payload(record))
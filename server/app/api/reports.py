@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import date
-from ..schemas.report import DailyReport
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import Dict, Literal, Optional
+from ..schemas.report import DailyReport, WeeklyReport, Trends, daily_report_payload
 from ..services.report_service import report_service
+from ..services.stats_service import stats_service
+from ..core.config import settings
 from ..core.database import get_db
+from ..core.http_cache import cache_headers, is_not_modified, make_etag, not_modified, version_token
+from ..core.serialization import dumps_json, render_payload
 from .auth import get_current_user
 from ..models.models import UserModel
 
@@ -11,14 +17,112 @@ router = APIRouter(prefix="/reports", tags=["reports"])
 
 @router.get("/daily/{target_date}", response_model=DailyReport)
 async def get_daily_report(
+    request: Request,
     target_date: date,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
     """
     获取指定日期的每日报告。如果报告不存在且有记录，则触发 AI 生成。
+    响应带 ETag / Last-Modified，客户端携带 If-None-Match 且报告未变化时返回 304。
     """
+    # 报告已存在且无需刷新时，条件 GET 只做一次索引查询，不加载 ORM 对象
+    version = await report_service.get_report_version(db, target_date, current_user.id)
+    if version is not None and not version.is_stale:
+        headers = _report_cache_headers(request, target_date, version.id, version.updated_at)
+        if is_not_modified(request, headers["ETag"], version.updated_at):
+            return not_modified(headers)
+
     report = await report_service.get_or_generate_daily_report(db, target_date, current_user.id)
     if not report:
         raise HTTPException(status_code=404, detail="该日期没有记录，无法生成报告")
-    return report
+    headers = _report_cache_headers(request, target_date, report.id, report.updated_at)
+    if is_not_modified(request, headers["ETag"], report.updated_at):
+        return not_modified(headers)
+    return await render_payload(request, daily_report_payload(report), headers=headers)
+
+def _report_cache_headers(request: Request, target_date: date, report_id: str, updated_at: datetime) -> Dict[str, str]:
+    # 当天的报告随新记录刷新，每次都需重新验证；过去日期的报告很少变化，允许客户端缓存更久
+    if target_date < date.today():
+        cache_control = f"private, max-age={settings.REPORT_PAST_CACHE_SECONDS}"
+    else:
+        cache_control = "private, no-cache"
+    return cache_headers(make_etag(request, report_id, version_token(updated_at)), cache_control, updated_at)
+
+@router.get("/daily/{target_date}/stream")
+async def stream_daily_report(
+    target_date: date,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    以 Server-Sent Events 流式返回每日报告：先推送本地计算的评分 (scores)，
+    再逐个推送模型生成的文字字段 (field)，最后推送完整报告 (done)，报告与非流式接口一样落库
+    """
+    events = report_service.stream_daily_report(target_date, current_user.id)
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=404, detail="该日期没有记录，无法生成报告")
+
+    def format_event(name: str, data) -> str:
+        if name == "done":
+            data = daily_report_payload(data)
+        return f"event: {name}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+    async def event_stream():
+        try:
+            yield format_event(*first)
+            async for event in events:
+                yield format_event(*event)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+TREND_RANGES = {"7d": 7, "30d": 30, "90d": 90, "365d": 365}
+
+@router.get("/weekly", response_model=WeeklyReport)
+async def get_weekly_report(
+    start_date: Optional[date] = Query(None, description="周起始日期，缺省为本周一"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    获取周报，趋势为每天的平均情绪 (0-100)，直接读取每日统计汇总
+    """
+    if start_date is None:
+        today = date.today()
+        start_date = today - timedelta(days=today.weekday())
+    end_date = start_date + timedelta(days=6)
+    points = await stats_service.get_daily_stats(db, current_user.id, start_date, end_date)
+
+    total = sum(p["record_count"] for p in points)
+    scored = [p["avg_emotion"] for p in points if p["avg_emotion"] is not None]
+    if total:
+        summary = f"本周共记录 {total} 件事，平均情绪 {int(sum(scored) / len(scored) * 100) if scored else 0} 分。"
+    else:
+        summary = "本周还没有记录。"
+    return WeeklyReport(
+        start_date=start_date,
+        end_date=end_date,
+        summary=summary,
+        trends=[int(p["avg_emotion"] * 100) if p["avg_emotion"] is not None else 0 for p in points],
+    )
+
+@router.get("/trends", response_model=Trends)
+async def get_trends(
+    range: Literal["7d", "30d", "90d", "365d"] = Query("30d", description="统计区间，截止到今天"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    获取最近一段时间的每日趋势 (记录数、情绪均值/最值、分类直方图)
+    """
+    end_date = date.today()
+    start_date = end_date - timedelta(days=TREND_RANGES[range] - 1)
+    points = await stats_service.get_daily_stats(db, current_user.id, start_date, end_date)
+    return Trends(start_date=start_date, end_date=end_date, points=points)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..schemas.sync import SyncRequest, SyncResponse, sync_record_payload
+from ..services.sync_service import sync_service
+from ..core.compression import decompress_body
+from ..core.database import get_db
+from ..core.config import settings
+from ..core.serialization import loads_body, render_payload
+from .auth import get_current_user
+from ..models.models import UserModel
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.post("/", response_model=SyncResponse, openapi_extra={
+    "requestBody": {"content": {"application/json": {"schema": SyncRequest.model_json_schema()}}, "required": True}
+})
+async def sync(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    本地优先客户端的双向增量同步：上传本地变更 (新建/修改/删除)，按最后写入优先合并，
+    并返回 since 之后服务端发生的变更 (含墓碑) 与新的 watermark。
+    请求体可以是 JSON 或 MessagePack (Content-Type: application/msgpack)，可用 Content-Encoding 压缩；
+    响应按 Accept 协商格式，在 Accept-Encoding 允许时压缩。
+    """
+    try:
+        body = decompress_body(await request.body(), request.headers.get("content-encoding"))
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    try:
+        sync_in = SyncRequest.model_validate(loads_body(body or b"{}", request.headers.get("content-type")))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"无效的请求体: {e}")
+    if len(sync_in.changes) > settings.SYNC_PUSH_MAX_CHANGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"单次最多上传 {settings.SYNC_PUSH_MAX_CHANGES} 条变更"
+        )
+
+    result = await sync_service.sync(db, current_user.id, sync_in.since, sync_in.changes, sync_in.limit)
+    result["changes"] = [sync_record_payload(r) for r in result["changes"]]
+    return await render_payload(request, result)
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .config import settings
+from .metrics import MetricFamily
+
+def normalize_content(content: str) -> str:
+    """
+    归一化文本：全角/半角统一 (NFKC)，去掉首尾空白并合并连续空白
+    """
+    return " ".join(unicodedata.normalize("NFKC", content).split())
+
+def content_key(namespace: str, parts: Iterable[str], model: str, prompt_version: str) -> str:
+    """
+    内容寻址缓存键：sha256(归一化内容 + 模型名 + prompt 版本)
+    """
+    digest = hashlib.sha256()
+    for value in (model, prompt_version):
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\x00")
+    for part in parts:
+        digest.update(normalize_content(part).encode("utf-8"))
+        digest.update(b"\x1e")
+    return f"{namespace}:{digest.hexdigest()}"
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class LRUCache:
+    """
+    有界的进程内 LRU 缓存，条目可带过期时间
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class RedisCacheTier:
+    """
+    Redis 二级缓存，依赖 Redis 自身的 TTL 过期
+    """
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(key)
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._redis.set(key, json.dumps(value, ensure_ascii=False), ex=self.ttl_seconds)
+
+class SQLiteCacheTier:
+    """
+    SQLite 文件二级缓存，适合单机多 worker 共享；读写放到线程中执行，避免阻塞事件循环。
+    过期条目读取时被忽略，每写入 purge_every 次顺带删除一次，文件不会无限增长
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, purge_every: int = 1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = max(1, purge_every)
+        self.stats = CacheStats()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, raw: str, purge: bool) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, raw, now + self.ttl_seconds)
+            )
+            if purge:
+                conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await asyncio.to_thread(self._get, key)
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:
+        self._writes += 1
+        purge = self._writes % self.purge_every == 0
+        await asyncio.to_thread(self._set, key, json.dumps(value, ensure_ascii=False), purge)
+
+class TieredCache:
+    """
+    两级缓存：进程内 LRU + 可选的 Redis/SQLite 共享层。共享层命中会回填到 LRU
+    """
+
+    def __init__(self, memory: LRUCache, shared=None):
+        self.memory = memory
+        self.shared = shared
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            value = await self.shared.get(key)
+        except Exception as e:
+            print(f"Cache Read Error: {e}")
+            return None
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value)
+            except Exception as e:
+                print(f"Cache Write Error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        result = {"memory": {**self.memory.stats.as_dict(), "size": len(self.memory)}}
+        if self.shared is not None:
+            result["shared"] = self.shared.stats.as_dict()
+        return result
+
+def cache_metric_families(stats: Dict[str, CacheStats], sizes: Dict[str, int]) -> List[MetricFamily]:
+    """
+    stats 为 {缓存名: 命中统计}，sizes 为进程内缓存的当前条目数
+    """
+    return [
+        MetricFamily("jifou_cache_hits_total", "counter", "Cache hits", [("", {"cache": n}, s.hits) for n, s in stats.items()]),
+        MetricFamily("jifou_cache_misses_total", "counter", "Cache misses", [("", {"cache": n}, s.misses) for n, s in stats.items()]),
+        MetricFamily("jifou_cache_evictions_total", "counter", "Entries evicted by the LRU bound", [("", {"cache": n}, s.evictions) for n, s in stats.items()]),
+        MetricFamily("jifou_cache_entries", "gauge", "Entries held in process-local caches", [("", {"cache": n}, size) for n, size in sizes.items()]),
+    ]
+
+def create_ai_cache() -> TieredCache:
+    memory = LRUCache(settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_TTL_SECONDS)
+    shared = None
+    if settings.AI_CACHE_BACKEND == "redis":
+        shared = RedisCacheTier(settings.REDIS_URL, settings.AI_CACHE_TTL_SECONDS)
+    elif settings.AI_CACHE_BACKEND == "sqlite":
+        shared = SQLiteCacheTier(settings.AI_CACHE_SQLITE_PATH, settings.AI_CACHE_TTL_SECONDS, settings.AI_CACHE_SQLITE_PURGE_EVERY)
+    elif settings.AI_CACHE_BACKEND:
+        raise ValueError(f"Unknown AI cache backend: {settings.AI_CACHE_BACKEND}")
+    return TieredCache(memory, shared)
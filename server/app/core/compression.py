@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import zlib
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 超过该大小的压缩放到线程中执行，避免阻塞事件循环 (zlib / brotli 压缩时释放 GIL)
+THREAD_COMPRESS_MIN_BYTES = 256 * 1024
+# brotli 质量 4 的压缩率已优于 gzip 6，耗时相近；更高质量只适合静态资源
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+def decompress_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    按 Content-Encoding 解压请求体，不支持的编码抛出 ValueError
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    try:
+        if encoding == "gzip":
+            return gzip.decompress(body)
+        if encoding == "deflate":
+            return zlib.decompress(body)
+        if encoding == "br" and brotli is not None:
+            return brotli.decompress(body)
+    except Exception as e:
+        # gzip / zlib / brotli 各自抛出不同的异常类型
+        raise ValueError(f"invalid {encoding} body") from e
+    raise ValueError(f"unsupported content encoding {encoding}")
+
+def header_accepts(header: Optional[str], value: str, wildcards: Iterable[str] = ()) -> bool:
+    """
+    Accept / Accept-Encoding 类请求头是否接受 value (q=0 视为拒绝)，wildcards 为可匹配的通配项
+    """
+    names = {value, *wildcards}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() not in names:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    按客户端 Accept-Encoding 选择响应压缩方式，优先 brotli
+    """
+    if brotli is not None and header_accepts(accept_encoding, "br", ("*",)):
+        return "br"
+    if header_accepts(accept_encoding, "gzip", ("*",)):
+        return "gzip"
+    return None
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(content, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"unsupported content encoding {encoding}")
+
+async def compress_async(content: bytes, encoding: str) -> bytes:
+    if len(content) >= THREAD_COMPRESS_MIN_BYTES:
+        return await asyncio.to_thread(compress, content, encoding)
+    return compress(content, encoding)
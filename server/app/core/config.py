@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Any, Dict, List, Optional
+import os
 
 class Settings(BaseSettings):
     # App Settings
@@ -8,11 +9,75 @@ class Settings(BaseSettings):
     
     # Database Settings
     DATABASE_URL: str = "sqlite:///./jifou.db"
-    
+    # 异步驱动 URL，留空时由 DATABASE_URL 推导 (sqlite -> aiosqlite, postgresql -> asyncpg)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # 连接池 (SQLite 内存库不使用连接池参数)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLite 调优：连接建立时设置 WAL、同步级别、忙等待与 mmap
+    SQLITE_TUNED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+
     # AI Settings
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_API_BASE: str = "https://api.openai.com/v1"
     AI_MODEL: str = "gpt-3.5-turbo"
+    # 按任务选择模型：单条分析用便宜快速的模型，日报可用更强的模型；留空沿用 AI_MODEL
+    AI_ANALYZE_MODEL: Optional[str] = None
+    AI_REPORT_MODEL: Optional[str] = None
+    # 多服务商路由，JSON 列表，例如:
+    # [{"name": "openai", "api_key": "...", "base_url": "https://api.openai.com/v1",
+    #   "models": {"analyze": "gpt-4o-mini", "report": "gpt-4o"}}]
+    # 留空时由 OPENROUTER_* / OPENAI_* 配置推导
+    LLM_PROVIDERS: List[Dict[str, Any]] = []
+    # LLM 调用：单次请求超时、整个调用 (含重试) 的截止时间、全局在途上限、退避重试与熔断
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 20
+    LLM_CALL_DEADLINE_SECONDS: float = 45
+    LLM_MAX_IN_FLIGHT: int = 16
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 8
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30
+    # 路由：单个服务商的时间预算 (超时后切换到下一个)、近期窗口大小、错误率惩罚 (秒)
+    LLM_PROVIDER_DEADLINE_SECONDS: float = 15
+    LLM_ROUTER_WINDOW: int = 100
+    LLM_ROUTER_ERROR_PENALTY_SECONDS: float = 10
+    # 批量分析：每个 prompt 打包的记录数及并发 prompt 数
+    AI_BATCH_PACK_SIZE: int = 20
+    AI_BATCH_CONCURRENCY: int = 4
+    # prompt 模板目录 (留空为 server/prompt)；单次调用的 prompt token 预算及单条记录的 token 上限
+    PROMPT_DIR: Optional[str] = None
+    AI_ANALYZE_MAX_PROMPT_TOKENS: int = 4000
+    AI_REPORT_MAX_PROMPT_TOKENS: int = 6000
+    AI_RECORD_MAX_TOKENS: int = 400
+    # LLM 用量：按天聚合的落库间隔；每日 token 配额 (0 为不限)，用尽后降级到本地分类器/模板报告
+    LLM_USAGE_FLUSH_SECONDS: float = 10
+    LLM_USER_DAILY_TOKEN_QUOTA: int = 200000
+    LLM_DAILY_TOKEN_QUOTA: int = 0
+    # 模型单价 (美元/百万 token)，用于估算花费，例如 {"gpt-4o-mini": {"prompt": 0.15, "completion": 0.6}}
+    LLM_MODEL_PRICES: Dict[str, Dict[str, float]] = {}
+    # 分析/报告结果缓存：进程内 LRU + 可选共享层 (redis | sqlite)
+    AI_CACHE_MAX_ENTRIES: int = 10000
+    AI_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7  # 7 days
+    AI_CACHE_BACKEND: Optional[str] = None
+    AI_CACHE_SQLITE_PATH: str = "./ai_cache.db"
+    AI_CACHE_SQLITE_PURGE_EVERY: int = 1000  # SQLite 缓存每写入该次数删除一次过期条目
+    # 本地分类器：fallback 为仅在未配置 LLM 或调用失败时使用；primary 为优先本地打分，置信度不足时才调用 LLM
+    LOCAL_CLASSIFIER_MODE: str = "fallback"  # fallback | primary
+    LOCAL_CLASSIFIER_MODEL_PATH: Optional[str] = "./classifier.npz"
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.5
+    # 报告增量刷新：新增记录占比或平均情绪变化超过阈值时才重新生成文字解读
+    REPORT_REFRESH_MIN_NEW_RATIO: float = 0.25
+    REPORT_REFRESH_MIN_EMOTION_DELTA: float = 0.1
+    # 过去日期报告的客户端缓存时间；离线补录仍可能改变旧报告，过期后按 ETag 重新验证
+    REPORT_PAST_CACHE_SECONDS: int = 86400
     
     # OpenRouter Settings (Optional)
     OPENROUTER_API_KEY: Optional[str] = None
@@ -24,7 +89,80 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-for-jwt-change-it-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    # 可访问 /admin 接口的手机号
+    ADMIN_PHONE_NUMBERS: List[str] = []
+    # 鉴权用户缓存：停用/修改在本进程内立即生效，其他进程最多延迟 TTL
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60
+    # 密码哈希：bcrypt cost (每 +1 耗时翻倍) 及哈希线程池大小
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = min(4, os.cpu_count() or 1)
+    # 验证码：memory 仅限单 worker，多 worker 部署需使用 redis
+    OTP_BACKEND: str = "memory"  # memory | redis
+    OTP_TTL_SECONDS: int = 300
+    OTP_MAX_ATTEMPTS: int = 5
+    OTP_MAX_ENTRIES: int = 100000
+    # 发送验证码限流 (令牌桶)：容量为突发上限，每 REFILL_SECONDS 恢复一次
+    OTP_PHONE_BUCKET_CAPACITY: int = 3
+    OTP_PHONE_REFILL_SECONDS: float = 60
+    OTP_IP_BUCKET_CAPACITY: int = 20
+    OTP_IP_REFILL_SECONDS: float = 6
+
+    # Records Settings
+    RECORD_BATCH_MAX_SIZE: int = 500
+    RECORD_PAGE_MAX_SIZE: int = 100
+    RECORD_STREAM_CHUNK_SIZE: int = 500
+
+    # Search Settings
+    SEARCH_VECTOR_CACHE_USERS: int = 16  # 内存中保留向量索引的用户数 (LRU)
+    SEARCH_HYBRID_CANDIDATES: int = 100  # hybrid 模式下关键词与向量各取的候选数
+    SEARCH_SEMANTIC_MIN_SCORE: float = 0.1  # 余弦相似度低于该值的结果视为不相关
+
+    # Report Pregeneration Settings
+    # 每位用户本地时间过了 REPORT_PREGEN_LOCAL_HOUR 点后，预生成其前一天有记录的日报
+    REPORT_PREGEN_ENABLED: bool = True
+    REPORT_PREGEN_LOCAL_HOUR: int = 3
+    REPORT_PREGEN_DEFAULT_TIMEZONE: Optional[str] = None  # 用户未设置时区时使用，留空为服务器本地时区
+    REPORT_PREGEN_INTERVAL_SECONDS: float = 300  # 扫描与认领任务的间隔
+    REPORT_PREGEN_CONCURRENCY: int = 4  # 本进程同时生成的报告数
+    REPORT_PREGEN_RATE_PER_MINUTE: float = 30  # 需要刷新的报告每分钟最多生成数 (跨 worker 共享令牌桶)
+    REPORT_PREGEN_MAX_ATTEMPTS: int = 3
+    REPORT_PREGEN_LEASE_SECONDS: int = 600  # 认领后超过该时间未完成视为 worker 已退出，任务可被重新认领
+
+    # Sync Settings
+    SYNC_PUSH_MAX_CHANGES: int = 500
+    SYNC_PULL_MAX_CHANGES: int = 500
+
+    # Response Settings
+    RESPONSE_COMPRESS_MIN_BYTES: int = 1024  # 响应体小于该值时不压缩
+
+    # Task Queue Settings
+    TASK_QUEUE_BACKEND: str = "memory"  # memory | redis
+    REDIS_URL: str = "redis://localhost:6379/0"
+    ANALYSIS_WORKERS: int = 4
+    ANALYSIS_CLAIM_TIMEOUT_SECONDS: int = 300  # 认领后超过该时间未完成的记录可被重新认领，也是运行期间清扫过期认领的间隔
+
+    # Lock Settings (跨 worker 互斥，留空为单进程模式)
+    LOCK_BACKEND: Optional[str] = None  # local | redis
+    LOCK_TIMEOUT_SECONDS: int = 120
+    LOCK_WAIT_SECONDS: int = 60
     
+    # 就绪探针中每项依赖检查的超时
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2
+
     model_config = SettingsConfigDict(env_file=".env")
 
+    @property
+    def async_database_url(self) -> str:
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        url = self.DATABASE_URL
+        if url.startswith("sqlite:"):
+            return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+        if url.startswith("postgresql+psycopg2:"):
+            return url.replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+        if url.startswith("postgresql:") or url.startswith("postgres:"):
+            return "postgresql+asyncpg:" + url.split(":", 1)[1]
+        return url
+
 settings = Settings()
@@ -1,21 +1,65 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .metrics import instrument_engine
+
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
 
 # 根据数据库类型决定是否需要 check_same_thread
 connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
+if is_sqlite:
     connect_args = {"check_same_thread": False}
 
+def _pool_kwargs(url: str) -> dict:
+    # SQLite 内存库使用单连接池，不接受连接池大小参数
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+# 同步引擎：供 Alembic、建表以及离线脚本使用
 engine = create_engine(
-    settings.DATABASE_URL, connect_args=connect_args
+    settings.DATABASE_URL, connect_args=connect_args, **_pool_kwargs(settings.DATABASE_URL)
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎：供请求处理路径使用，避免阻塞事件循环
+async_engine = create_async_engine(
+    settings.async_database_url, **_pool_kwargs(settings.async_database_url)
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+if is_sqlite and settings.SQLITE_TUNED:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 Base = declarative_base()
 
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+from .serialization import wants_msgpack
+
+# render_payload 压缩响应时在 ETag 末尾追加的编码后缀，比较时忽略
+ENCODING_SUFFIXES = ("+gzip", "+br")
+
+def make_etag(request: Request, *parts: object) -> str:
+    """
+    强 ETag：由资源版本 (parts) 与协商出的表示格式组成，JSON 与 MessagePack 的表示不会互相命中
+    """
+    fmt = "msgpack" if wants_msgpack(request.headers.get("accept")) else "json"
+    return '"' + "-".join(str(p) for p in parts) + f".{fmt}" + '"'
+
+def version_token(moment: datetime) -> str:
+    """
+    将时间戳编码为紧凑的版本号 (微秒，十六进制)
+    """
+    return format(int(moment.timestamp() * 1_000_000), "x")
+
+def http_date(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        # 数据库中存的是服务器本地时间
+        moment = moment.astimezone()
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+def _strip_etag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    条件 GET：有 If-None-Match 时只比较 ETag (忽略压缩编码后缀)，否则比较 If-Modified-Since (秒级精度)
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _strip_etag(etag) in {_strip_etag(tag) for tag in if_none_match.split(",")}
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified if last_modified.tzinfo else last_modified.astimezone()
+        return int(modified.timestamp()) <= int(since.timestamp())
+    return False
+
+def cache_headers(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """
+    304 响应，带上与 200 响应相同的缓存相关头
+    """
+    return Response(status_code=304, headers={**headers, "Vary": "Accept, Accept-Encoding"})
@@ -0,0 +1,232 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional
+import openai
+from openai import AsyncOpenAI
+from .config import settings
+from .metrics import LatencyHistogram
+
+class LLMUnavailableError(Exception):
+    """
+    服务商不可用 (熔断中、重试耗尽、超过截止时间或密钥/模型配置错误)，调用方应切换服务商或进入降级逻辑
+    """
+
+class LLMCompletion(NamedTuple):
+    content: str
+    # 服务商未返回 usage 时为 None
+    prompt_tokens: Optional[int]
+    completion_tokens: Optional[int]
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后熔断 (open)，冷却期内直接拒绝；冷却结束后放行一个探测请求 (half-open)，
+    探测成功则恢复，失败则重新计时
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        # 探测请求被取消时没有结论，允许下一个请求继续探测
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+# 所有服务商共享的在途请求上限
+_in_flight = asyncio.Semaphore(max(1, settings.LLM_MAX_IN_FLIGHT))
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+# 密钥失效、无权限、模型不存在或不被该服务商接受：重试无用，但换一个服务商可能成功
+_PROVIDER_FAULT_STATUSES = (401, 403, 404, 422)
+
+def _is_provider_fault(error: Exception) -> bool:
+    return isinstance(error, openai.APIStatusError) and error.status_code in _PROVIDER_FAULT_STATUSES
+
+class ResilientLLMClient:
+    """
+    OpenAI 兼容接口的调用封装：单次调用截止时间、全局并发上限、
+    429/5xx 指数退避重试、熔断，以及按服务商统计的延迟直方图
+    """
+
+    def __init__(self, name: str, api_key: str, base_url: str, default_headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        # 重试与超时由本类统一控制，关闭 SDK 自带的重试
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            default_headers=default_headers,
+            max_retries=0,
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+        )
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS)
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        # 熔断期间被直接拒绝、未发出请求的调用
+        self.rejected = 0
+        # 最近若干次调用的 (耗时, 是否成功)，供路由按近期表现选择服务商
+        self.recent: deque = deque(maxlen=max(1, settings.LLM_ROUTER_WINDOW))
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], deadline_seconds: Optional[float] = None, **kwargs) -> LLMCompletion:
+        """
+        返回首条 choice 的文本内容及服务商报告的 token 用量；失败时抛出 LLMUnavailableError
+        """
+        response = await self._call(
+            lambda: self.client.chat.completions.create(model=model, messages=messages, **kwargs),
+            deadline_seconds,
+        )
+        usage = getattr(response, "usage", None)
+        return LLMCompletion(
+            response.choices[0].message.content,
+            getattr(usage, "prompt_tokens", None),
+            getattr(usage, "completion_tokens", None),
+        )
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], deadline_seconds: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        流式返回文本增量。建立连接阶段按 complete 的策略重试；开始输出后不再重试，
+        相邻两个分片间隔超过 LLM_REQUEST_TIMEOUT_SECONDS 视为服务商故障
+        """
+        # 整个流期间占用一个在途名额
+        async with _in_flight:
+            response = await self._call(
+                lambda: self.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs),
+                deadline_seconds,
+                acquire_slot=False,
+            )
+            chunks = response.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS)
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self.errors += 1
+                        self.breaker.record_failure()
+                        raise LLMUnavailableError(f"{self.name}: stream interrupted: {type(e).__name__}: {e}") from e
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await response.close()
+
+    async def _call(self, request: Callable[[], Awaitable[Any]], deadline_seconds: Optional[float], acquire_slot: bool = True) -> Any:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LLMUnavailableError(f"{self.name}: circuit open")
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + (deadline_seconds or settings.LLM_CALL_DEADLINE_SECONDS)
+        self.calls += 1
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                response = await asyncio.wait_for(self._attempt(request, acquire_slot), timeout=remaining)
+                self.breaker.record_success()
+                self.recent.append((loop.time() - started, True))
+                return response
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                retryable = _is_retryable(e)
+                delay = min(settings.LLM_BACKOFF_MAX_SECONDS, settings.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                # full jitter，避免大量调用同时重试
+                delay = random.uniform(0, delay)
+                if retryable and attempt < settings.LLM_MAX_RETRIES and loop.time() + delay < deadline:
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+                self.errors += 1
+                if retryable or _is_provider_fault(e):
+                    # 服务商侧的故障计入熔断与近期错误率，路由据此切换并降低其排名
+                    self.breaker.record_failure()
+                    self.recent.append((loop.time() - started, False))
+                    raise LLMUnavailableError(f"{self.name}: {type(e).__name__}: {e}") from e
+                # 400 等请求本身的问题说明服务商仍有响应，不计入熔断，换服务商也无济于事
+                self.breaker.record_success()
+                raise
+
+    async def _attempt(self, request: Callable[[], Awaitable[Any]], acquire_slot: bool) -> Any:
+        if acquire_slot:
+            async with _in_flight:
+                return await self._timed(request)
+        return await self._timed(request)
+
+    async def _timed(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await request()
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+
+    def recent_p95(self) -> Optional[float]:
+        if not self.recent:
+            return None
+        latencies = sorted(latency for latency, _ in self.recent)
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def recent_error_rate(self) -> float:
+        if not self.recent:
+            return 0.0
+        return sum(1 for _, ok in self.recent if not ok) / len(self.recent)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+            "latency": self.latency.as_dict(),
+            "recent_p95": self.recent_p95(),
+            "recent_error_rate": self.recent_error_rate(),
+        }
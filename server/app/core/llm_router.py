@@ -0,0 +1,217 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+from .config import settings
+from .llm_client import CircuitBreaker, LLMUnavailableError, ResilientLLMClient
+from .metrics import MetricFamily, histogram_samples
+from .prompts import count_tokens
+from .usage import usage_tracker
+
+class LLMProvider:
+    """
+    一个服务商及其按任务配置的模型
+    """
+
+    def __init__(self, client: ResilientLLMClient, models: Optional[Dict[str, str]] = None):
+        self.client = client
+        self.models = models or {}
+
+    @property
+    def name(self) -> str:
+        return self.client.name
+
+    def model_for(self, task: str) -> str:
+        return self.models.get(task) or task_model(task)
+
+    def score(self) -> float:
+        """
+        路由得分，越低越优先：近期 p95 延迟 + 错误率惩罚。没有样本的服务商得 0，保证会被尝试
+        """
+        p95 = self.client.recent_p95() or 0.0
+        return p95 + self.client.recent_error_rate() * settings.LLM_ROUTER_ERROR_PENALTY_SECONDS
+
+    def is_open(self) -> bool:
+        return self.client.breaker.state == CircuitBreaker.OPEN
+
+def task_model(task: str) -> str:
+    if task == "analyze":
+        return settings.AI_ANALYZE_MODEL or settings.AI_MODEL
+    if task == "report":
+        return settings.AI_REPORT_MODEL or settings.AI_MODEL
+    return settings.AI_MODEL
+
+def _messages_tokens(messages: List[Dict[str, str]]) -> int:
+    # 每条消息另计约 4 个 token 的角色与格式开销
+    return sum(count_tokens(m.get("content") or "") + 4 for m in messages)
+
+class LLMRouter:
+    """
+    多服务商路由：每次调用按近期表现排序，熔断中的服务商排在最后；
+    当前服务商超时或不可用时切换到下一个
+    """
+
+    def __init__(self, providers: List[LLMProvider]):
+        self.providers = providers
+        self.routes: Dict[str, Dict[str, int]] = {}
+        self.failovers = 0
+        self.decisions: deque = deque(maxlen=50)
+
+    def rank(self) -> List[LLMProvider]:
+        # sorted 是稳定排序，得分相同时保持配置顺序
+        return sorted(self.providers, key=lambda p: (p.is_open(), p.score()))
+
+    async def complete(self, task: str, messages: List[Dict[str, str]], **kwargs) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LLM_CALL_DEADLINE_SECONDS
+        ranked = self.rank()
+        tried = []
+        last_error: Optional[Exception] = None
+        for i, provider in enumerate(ranked):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            # 最后一个服务商可以用完剩余时间，其他服务商只分到单独的预算
+            budget = remaining if i == len(ranked) - 1 else min(remaining, settings.LLM_PROVIDER_DEADLINE_SECONDS)
+            tried.append(provider.name)
+            model = provider.model_for(task)
+            started = loop.time()
+            try:
+                completion = await provider.client.complete(model, messages, deadline_seconds=budget, **kwargs)
+            except LLMUnavailableError as e:
+                last_error = e
+                if i < len(ranked) - 1:
+                    self.failovers += 1
+                continue
+            self._record_route(task, tried, provider.name)
+            local_prompt_tokens = _messages_tokens(messages)
+            estimated = completion.prompt_tokens is None or completion.completion_tokens is None
+            usage_tracker.record(
+                task, provider.name, model,
+                completion.prompt_tokens if completion.prompt_tokens is not None else local_prompt_tokens,
+                completion.completion_tokens if completion.completion_tokens is not None else count_tokens(completion.content or ""),
+                estimated=estimated,
+                local_prompt_tokens=local_prompt_tokens,
+                latency=loop.time() - started,
+            )
+            return completion.content
+
+        self.decisions.append({"task": task, "tried": tried, "served_by": None})
+        raise LLMUnavailableError(f"all providers failed for {task}: {last_error}")
+
+    async def stream(self, task: str, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        流式版本：只在收到第一个分片之前切换服务商，已经开始输出后出错直接抛出
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LLM_CALL_DEADLINE_SECONDS
+        ranked = self.rank()
+        tried = []
+        last_error: Optional[Exception] = None
+        for i, provider in enumerate(ranked):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            budget = remaining if i == len(ranked) - 1 else min(remaining, settings.LLM_PROVIDER_DEADLINE_SECONDS)
+            tried.append(provider.name)
+            model = provider.model_for(task)
+            started = loop.time()
+            streaming = False
+            output: List[str] = []
+            try:
+                async for delta in provider.client.stream(model, messages, deadline_seconds=budget, **kwargs):
+                    streaming = True
+                    output.append(delta)
+                    yield delta
+            except LLMUnavailableError as e:
+                if streaming:
+                    self.decisions.append({"task": task, "tried": tried, "served_by": None})
+                    raise
+                last_error = e
+                if i < len(ranked) - 1:
+                    self.failovers += 1
+                continue
+            self._record_route(task, tried, provider.name)
+            # 流式响应不带 usage，按本地计数记录
+            local_prompt_tokens = _messages_tokens(messages)
+            usage_tracker.record(
+                task, provider.name, model, local_prompt_tokens, count_tokens("".join(output)),
+                estimated=True,
+                local_prompt_tokens=local_prompt_tokens,
+                latency=loop.time() - started,
+            )
+            return
+
+        self.decisions.append({"task": task, "tried": tried, "served_by": None})
+        raise LLMUnavailableError(f"all providers failed for {task}: {last_error}")
+
+    def _record_route(self, task: str, tried: List[str], served_by: str) -> None:
+        task_routes = self.routes.setdefault(task, {})
+        task_routes[served_by] = task_routes.get(served_by, 0) + 1
+        self.decisions.append({"task": task, "tried": tried, "served_by": served_by})
+
+    def metric_families(self) -> List[MetricFamily]:
+        calls, retries, latency, circuit = [], [], [], []
+        for p in self.providers:
+            client = p.client
+            labels = {"provider": p.name}
+            calls.append(("", {**labels, "outcome": "ok"}, client.calls - client.errors))
+            calls.append(("", {**labels, "outcome": "error"}, client.errors))
+            calls.append(("", {**labels, "outcome": "rejected"}, client.rejected))
+            retries.append(("", labels, client.retries))
+            latency.extend(histogram_samples(client.latency, labels))
+            circuit.append(("", labels, _CIRCUIT_STATES.get(client.breaker.state, 0)))
+        return [
+            MetricFamily("jifou_llm_calls_total", "counter", "LLM calls by provider and outcome (rejected: circuit open)", calls),
+            MetricFamily("jifou_llm_retries_total", "counter", "LLM request retries", retries),
+            MetricFamily("jifou_llm_attempt_duration_seconds", "histogram", "Latency of individual LLM request attempts", latency),
+            MetricFamily("jifou_llm_circuit_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)", circuit),
+            MetricFamily("jifou_llm_failovers_total", "counter", "Calls moved to the next provider", [("", {}, self.failovers)]),
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": {
+                p.name: {**p.client.stats(), "score": p.score(), "models": {t: p.model_for(t) for t in ("analyze", "report")}}
+                for p in self.providers
+            },
+            "ranking": [p.name for p in self.rank()],
+            "routes": self.routes,
+            "failovers": self.failovers,
+            "recent_decisions": list(self.decisions),
+        }
+
+_CIRCUIT_STATES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+def create_llm_router() -> Optional[LLMRouter]:
+    providers = []
+    for config in settings.LLM_PROVIDERS:
+        providers.append(LLMProvider(
+            ResilientLLMClient(
+                config["name"],
+                api_key=config["api_key"],
+                base_url=config["base_url"],
+                default_headers=config.get("headers"),
+            ),
+            config.get("models"),
+        ))
+
+    if not providers:
+        # 兼容只配置了 OpenRouter / OpenAI 密钥的部署，两者都配置时 OpenRouter 优先
+        if settings.OPENROUTER_API_KEY:
+            providers.append(LLMProvider(ResilientLLMClient(
+                "openrouter",
+                api_key=settings.OPENROUTER_API_KEY,
+                base_url=settings.OPENROUTER_BASE_URL,
+                default_headers={
+                    "HTTP-Referer": settings.SITE_URL,
+                    "X-Title": settings.SITE_NAME,
+                }
+            )))
+        if settings.OPENAI_API_KEY:
+            providers.append(LLMProvider(ResilientLLMClient(
+                "openai",
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_API_BASE
+            )))
+
+    return LLMRouter(providers) if providers else None
@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from .config import settings
+
+class SingleFlight:
+    """
+    进程内单飞：同一 key 的并发调用只执行一次，其余调用者等待同一结果。
+    任务独立于发起者运行，发起请求被取消不会打断其他等待者。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+class LocalLockBackend:
+    """
+    单进程部署时的进程内按 key 互斥锁。流式与非流式生成走不同的入口，
+    SingleFlight 只能合并同一入口的调用，两者之间靠该锁互斥。
+    无人持有或等待的 key 会被移除，锁表不随 key 数量增长
+    """
+
+    def __init__(self):
+        # key -> [锁, 持有与等待者数量]
+        self._locks: Dict[str, list] = {}
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+class RedisLockBackend:
+    """
+    基于 Redis 的跨 worker 互斥锁。等锁超时则放行，由数据库唯一约束兜底
+    """
+
+    def __init__(self, url: str, timeout: int, blocking_timeout: int):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.timeout = timeout
+        self.blocking_timeout = blocking_timeout
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        from redis.exceptions import LockError
+
+        lock = self._redis.lock(f"jifou:lock:{key}", timeout=self.timeout, blocking_timeout=self.blocking_timeout)
+        acquired = False
+        try:
+            acquired = await lock.acquire()
+        except LockError as e:
+            print(f"Lock Acquire Error: {e}")
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError as e:
+                    # 持锁超时已被自动释放
+                    print(f"Lock Release Error: {e}")
+
+def create_lock_backend(backend: Optional[str] = None):
+    backend = backend or settings.LOCK_BACKEND
+    if backend == "redis":
+        return RedisLockBackend(settings.REDIS_URL, settings.LOCK_TIMEOUT_SECONDS, settings.LOCK_WAIT_SECONDS)
+    if backend in (None, "", "local"):
+        return LocalLockBackend()
+    raise ValueError(f"Unknown lock backend: {backend}")
+
+lock_backend = create_lock_backend()
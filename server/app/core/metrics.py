@@ -0,0 +1,260 @@
+import asyncio
+import bisect
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 默认延迟分桶 (秒)，覆盖从本地调用到慢速 LLM 请求的范围
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+class LatencyHistogram:
+    """
+    固定分桶的延迟直方图，内存占用恒定；分位数按桶内线性插值估算
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets: List[float] = sorted(buckets)
+        # 最后一个桶收纳超过上界的样本
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+# 事件循环延迟分桶 (秒)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str  # counter | gauge | histogram
+    help: str
+    # (名称后缀, 标签, 值)，后缀用于直方图的 _bucket/_sum/_count
+    samples: List[Tuple[str, Dict[str, str], float]]
+
+def histogram_samples(histogram: LatencyHistogram, labels: Dict[str, str]) -> List[Tuple[str, Dict[str, str], float]]:
+    """
+    把 LatencyHistogram 展开为 Prometheus 的累计分桶样本
+    """
+    samples = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        samples.append(("_bucket", {**labels, "le": repr(float(bound))}, cumulative))
+    samples.append(("_bucket", {**labels, "le": "+Inf"}, histogram.count))
+    samples.append(("_sum", labels, histogram.sum))
+    samples.append(("_count", labels, histogram.count))
+    return samples
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        # 0.0.4 文本格式中 TYPE 行的名称与样本名一致，计数器统一带 _total 后缀
+        return MetricFamily(f"{self.name}_total", "counter", self.help, [
+            ("", dict(zip(self.labelnames, labels)), value) for labels, value in self.values.items()
+        ])
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.values: Dict[Tuple[str, ...], LatencyHistogram] = {}
+
+    def observe(self, seconds: float, *labels: str) -> None:
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = self.values[labels] = LatencyHistogram(self.buckets)
+        histogram.observe(seconds)
+
+    def collect(self) -> MetricFamily:
+        samples = []
+        for labels, histogram in self.values.items():
+            samples.extend(histogram_samples(histogram, dict(zip(self.labelnames, labels))))
+        return MetricFamily(self.name, "histogram", self.help, samples)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class MetricsRegistry:
+    """
+    Prometheus 文本格式的指标注册表。请求路径上只做字典查找与计数；
+    各组件已有的统计 (缓存、LLM 客户端等) 通过 collector 在抓取时读取，不增加热路径开销
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        counter = Counter(name, help, labelnames)
+        self._metrics.append(counter)
+        return counter
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> List[MetricFamily]:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                print(f"Metrics Collector Error: {e}")
+        return families
+
+    def render(self) -> str:
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for suffix, labels, value in family.samples:
+                name = family.name + suffix
+                if labels:
+                    label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {float(value)!r}")
+                else:
+                    lines.append(f"{name} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter("jifou_http_requests", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_duration = metrics.histogram("jifou_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+db_queries = metrics.counter("jifou_db_queries", "SQL statements executed", ("engine", "operation"))
+db_query_duration = metrics.histogram("jifou_db_query_duration_seconds", "SQL statement latency", ("engine", "operation"))
+db_errors = metrics.counter("jifou_db_errors", "SQL statements that raised", ("engine",))
+loop_lag = metrics.histogram("jifou_event_loop_lag_seconds", "Event loop scheduling delay", buckets=LOOP_LAG_BUCKETS)
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件：按路由模板 (而非实际路径) 统计请求数与延迟，未匹配的路径归为 unmatched，
+    避免标签基数失控。流式响应的耗时包含整个输出过程
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, route, str(status))
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    通过 SQLAlchemy 引擎事件统计 SQL 语句数、耗时与错误，异步引擎传入其 sync_engine
+    """
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip()[:6].upper()
+        operation = operation if operation in _OPERATIONS else "OTHER"
+        db_queries.inc(name, operation)
+        db_query_duration.observe(time.perf_counter() - started, name, operation)
+
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+        db_errors.inc(name)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+class LoopLagMonitor:
+    """
+    周期性睡眠并测量实际唤醒比预期晚了多久，反映事件循环被阻塞的程度
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, loop.time() - expected)
+            loop_lag.observe(self.last)
+
+    def collect(self) -> List[MetricFamily]:
+        return [MetricFamily("jifou_event_loop_lag_last_seconds", "gauge", "Most recent event loop lag sample", [("", {}, self.last)])]
+
+loop_lag_monitor = LoopLagMonitor()
+metrics.register_collector(loop_lag_monitor.collect)
@@ -0,0 +1,200 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from .config import settings
+
+class OTPStore:
+    """
+    验证码存储基类：验证码带过期时间，并限制校验次数
+    """
+
+    async def save(self, phone_number: str, code: str) -> None:
+        raise NotImplementedError
+
+    async def verify(self, phone_number: str, code: str) -> bool:
+        raise NotImplementedError
+
+    async def discard(self, phone_number: str) -> None:
+        raise NotImplementedError
+
+class RateLimiter:
+    """
+    令牌桶限流基类：capacity 为突发上限，每 refill_seconds 恢复一个令牌
+    """
+
+    async def acquire(self, key: str, capacity: int, refill_seconds: float) -> Tuple[bool, float]:
+        """
+        尝试消耗一个令牌，返回 (是否允许, 建议重试等待秒数)
+        """
+        raise NotImplementedError
+
+class InMemoryOTPStore(OTPStore):
+    """
+    进程内实现，条目数有上限 (超出时淘汰最早写入的)，单 worker 部署或测试使用
+    """
+
+    def __init__(self, ttl_seconds: int, max_attempts: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+        self.max_entries = max(1, max_entries)
+        # phone_number -> (code, expires_at, attempts)
+        self._codes: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+
+    async def save(self, phone_number: str, code: str) -> None:
+        self._codes.pop(phone_number, None)
+        self._codes[phone_number] = (code, time.monotonic() + self.ttl_seconds, 0)
+        self._purge()
+
+    async def verify(self, phone_number: str, code: str) -> bool:
+        entry = self._codes.get(phone_number)
+        if entry is None:
+            return False
+        stored_code, expires_at, attempts = entry
+        if expires_at < time.monotonic():
+            del self._codes[phone_number]
+            return False
+        if stored_code == code:
+            del self._codes[phone_number]
+            return True
+        attempts += 1
+        if attempts >= self.max_attempts:
+            del self._codes[phone_number]
+        else:
+            self._codes[phone_number] = (stored_code, expires_at, attempts)
+        return False
+
+    async def discard(self, phone_number: str) -> None:
+        self._codes.pop(phone_number, None)
+
+    def _purge(self) -> None:
+        # 按写入顺序，过期条目都在队首
+        now = time.monotonic()
+        while self._codes:
+            _, expires_at, _ = next(iter(self._codes.values()))
+            if expires_at >= now and len(self._codes) <= self.max_entries:
+                break
+            self._codes.popitem(last=False)
+
+class InMemoryRateLimiter(RateLimiter):
+    """
+    进程内令牌桶，桶的数量有上限，按最近使用淘汰 (被淘汰的桶视为已回满)
+    """
+
+    def __init__(self, max_buckets: int):
+        self.max_buckets = max(1, max_buckets)
+        # key -> (tokens, updated_at)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, capacity: int, refill_seconds: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (float(capacity), now))
+        tokens = min(float(capacity), tokens + (now - updated_at) / refill_seconds)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) * refill_seconds
+
+class RedisOTPStore(OTPStore):
+    """
+    Redis 实现：多个 worker 共享，过期交给 Redis TTL
+    """
+
+    # 校验、累加错误次数与删除在一个脚本内完成：键在两步之间过期时不会被 HINCRBY 重建成没有 TTL 的残留键，
+    # 同一验证码被并发使用时也只有一方通过
+    VERIFY_SCRIPT = """
+    local stored = redis.call('HGET', KEYS[1], 'code')
+    if not stored then
+        return 0
+    end
+    if stored == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return 1
+    end
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    if attempts >= tonumber(ARGV[2]) then
+        redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, ttl_seconds: int, max_attempts: int):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._verify = self._redis.register_script(self.VERIFY_SCRIPT)
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _key(phone_number: str) -> str:
+        return f"jifou:otp:{phone_number}"
+
+    async def save(self, phone_number: str, code: str) -> None:
+        key = self._key(phone_number)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"code": code, "attempts": 0})
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+
+    async def verify(self, phone_number: str, code: str) -> bool:
+        return bool(int(await self._verify(keys=[self._key(phone_number)], args=[code, self.max_attempts])))
+
+    async def discard(self, phone_number: str) -> None:
+        await self._redis.delete(self._key(phone_number))
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Redis 令牌桶，用 Lua 脚本保证读-改-写原子性
+    """
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local refill_seconds = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) / refill_seconds)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity * refill_seconds))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def acquire(self, key: str, capacity: int, refill_seconds: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[f"jifou:ratelimit:{key}"], args=[capacity, refill_seconds, time.time()])
+        allowed = bool(int(allowed))
+        return allowed, 0.0 if allowed else (1 - float(tokens)) * refill_seconds
+
+def create_otp_store(backend: Optional[str] = None) -> OTPStore:
+    backend = backend or settings.OTP_BACKEND
+    if backend == "redis":
+        return RedisOTPStore(settings.REDIS_URL, settings.OTP_TTL_SECONDS, settings.OTP_MAX_ATTEMPTS)
+    if backend == "memory":
+        return InMemoryOTPStore(settings.OTP_TTL_SECONDS, settings.OTP_MAX_ATTEMPTS, settings.OTP_MAX_ENTRIES)
+    raise ValueError(f"Unknown OTP backend: {backend}")
+
+def create_rate_limiter(backend: Optional[str] = None) -> RateLimiter:
+    backend = backend or settings.OTP_BACKEND
+    if backend == "redis":
+        return RedisRateLimiter(settings.REDIS_URL)
+    if backend == "memory":
+        return InMemoryRateLimiter(settings.OTP_MAX_ENTRIES)
+    raise ValueError(f"Unknown rate limiter backend: {backend}")
+
+otp_store = create_otp_store()
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,139 @@
+import hashlib
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from .config import settings
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖，未安装时按字符估算
+    tiktoken = None
+
+# 默认模板目录：server/prompt
+DEFAULT_PROMPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "prompt"))
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_CJK = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # 编码表需要首次下载，离线环境退回估算
+        print(f"Tokenizer Load Error: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    本地计算 token 数：安装了 tiktoken 时精确计算；否则按经验值估算，
+    中日韩字符约 1.5 token/字，其余约 4 字符/token，整体偏保守
+    """
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = len(_CJK.findall(text))
+    return math.ceil(cjk * 1.5) + math.ceil((len(text) - cjk) / 4)
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    截断到不超过 max_tokens，被截断的文本以省略号结尾
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    # token 数随前缀长度单调不减，二分查找最长可保留前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle] + "…") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + "…"
+
+class PromptTemplate:
+    """
+    预编译的 prompt 模板：{{name}} 占位符在加载时拆分为片段，渲染只做拼接；
+    版本号取模板内容的哈希，内容变更后依赖它的缓存自然失效
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.version = f"{name}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+        # (是否为占位符, 字面量或占位符名)
+        self._segments: List[Tuple[bool, str]] = []
+        pos = 0
+        for match in _PLACEHOLDER.finditer(text):
+            if match.start() > pos:
+                self._segments.append((False, text[pos:match.start()]))
+            self._segments.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(text):
+            self._segments.append((False, text[pos:]))
+        self.fields = tuple(dict.fromkeys(value for is_field, value in self._segments if is_field))
+        # 模板固定部分的 token 数，预算扣除后即为可变内容的额度
+        self.static_tokens = count_tokens("".join(value for is_field, value in self._segments if not is_field))
+
+    def render(self, **values: Any) -> str:
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"prompt {self.name} missing values for {', '.join(missing)}")
+        return "".join(str(values[value]) if is_field else value for is_field, value in self._segments)
+
+class PromptRegistry:
+    """
+    启动时一次性加载模板目录下的 *.txt，文件名 (不含扩展名) 即模板名
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.templates: Dict[str, PromptTemplate] = {}
+        self.load()
+
+    def load(self) -> None:
+        templates = {}
+        if os.path.isdir(self.directory):
+            for filename in sorted(os.listdir(self.directory)):
+                if not filename.endswith(".txt"):
+                    continue
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                    name = filename[:-len(".txt")]
+                    templates[name] = PromptTemplate(name, f.read().strip())
+        self.templates = templates
+
+    def get(self, name: str) -> PromptTemplate:
+        template = self.templates.get(name)
+        if template is None:
+            raise KeyError(f"prompt template {name} not found in {self.directory}")
+        return template
+
+    def render(self, name: str, **values: Any) -> str:
+        return self.get(name).render(**values)
+
+    def version(self, *names: str) -> str:
+        """
+        一个或多个模板的组合版本，用作缓存键的一部分
+        """
+        return "+".join(self.get(name).version for name in names)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "tokenizer": "tiktoken" if _encoding() is not None else "estimate",
+            "templates": {
+                name: {"version": t.version, "fields": list(t.fields), "static_tokens": t.static_tokens}
+                for name, t in self.templates.items()
+            },
+        }
+
+def create_prompt_registry(directory: Optional[str] = None) -> PromptRegistry:
+    return PromptRegistry(directory or settings.PROMPT_DIR or DEFAULT_PROMPT_DIR)
+
+prompt_registry = create_prompt_registry()
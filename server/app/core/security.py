@@ -1,24 +1,39 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Dict, Optional, Tuple, Union
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
+# bcrypt 计算时会释放 GIL，放到有界线程池中执行既不阻塞事件循环，也能利用多核
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None, claims: Optional[Dict[str, Any]] = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def _run_in_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_pool(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await _run_in_pool(pwd_context.hash, password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    校验密码；若哈希的 cost 与当前 BCRYPT_ROUNDS 不一致，同时返回按新 cost 重算的哈希，
+    调用方应在登录成功后写回 hashed_password
+    """
+    return await _run_in_pool(pwd_context.verify_and_update, plain_password, hashed_password)
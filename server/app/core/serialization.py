@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from pydantic import BaseModel
+import orjson
+from .compression import choose_encoding, compress_async, header_accepts
+from .config import settings
+
+try:
+    import ormsgpack
+except ImportError:  # 可选依赖，未安装时只返回 JSON
+    ormsgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+def dumps_json(payload: Any) -> bytes:
+    """
+    orjson 序列化：datetime / date / Enum 原生输出，与 Pydantic 的 JSON 输出一致
+    """
+    return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def dumps_msgpack(payload: Any) -> bytes:
+    return ormsgpack.packb(payload, default=_default, option=ormsgpack.OPT_NON_STR_KEYS)
+
+def is_msgpack(media_type: Optional[str]) -> bool:
+    return (media_type or "").split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    客户端显式声明接受 MessagePack 时才使用，*/* 仍返回 JSON
+    """
+    return ormsgpack is not None and any(header_accepts(accept, media_type) for media_type in MSGPACK_MEDIA_TYPES)
+
+def loads_body(body: bytes, content_type: Optional[str]) -> Any:
+    """
+    按 Content-Type 解析 JSON 或 MessagePack 请求体，格式错误抛出 ValueError
+    """
+    if is_msgpack(content_type):
+        if ormsgpack is None:
+            raise ValueError("MessagePack is not supported")
+        return ormsgpack.unpackb(body)
+    return orjson.loads(body)
+
+async def render_payload(request: Request, payload: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    按 Accept 协商 JSON / MessagePack，按 Accept-Encoding 压缩较大的响应体。
+    payload 应为已组装好的 dict / list (如 record_payload 的结果)，不经过 response_model 的二次校验
+    """
+    if wants_msgpack(request.headers.get("accept")):
+        media_type, content = MSGPACK_MEDIA_TYPE, dumps_msgpack(payload)
+    else:
+        media_type, content = JSON_MEDIA_TYPE, dumps_json(payload)
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    if len(content) >= settings.RESPONSE_COMPRESS_MIN_BYTES:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            content = await compress_async(content, encoding)
+            headers["Content-Encoding"] = encoding
+            etag = headers.get("ETag")
+            if etag:
+                # 压缩后的字节不同，强 ETag 需要区分编码 (条件 GET 比较时会去掉该后缀)
+                headers["ETag"] = f'{etag[:-1]}+{encoding}"'
+    return Response(content=content, status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+from .config import settings
+
+class TaskQueue:
+    """
+    任务队列后端基类：负责任务投递/领取，以及按频道广播事件
+    """
+
+    async def enqueue(self, payload: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def dequeue(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def ping(self) -> None:
+        """
+        连通性检查，不可用时抛出异常
+        """
+
+    async def close(self) -> None:
+        pass
+
+class InMemoryTaskQueue(TaskQueue):
+    """
+    进程内 asyncio 队列，适用于测试和单节点部署
+    """
+
+    def __init__(self, subscriber_buffer: int = 100):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._subscriber_buffer = subscriber_buffer
+
+    async def enqueue(self, payload: Dict[str, Any]) -> None:
+        await self._queue.put(payload)
+
+    async def dequeue(self) -> Dict[str, Any]:
+        return await self._queue.get()
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        for subscriber in list(self._subscribers.get(channel, ())):
+            if subscriber.full():
+                # 慢消费者丢弃最旧的事件，避免拖慢发布方
+                subscriber.get_nowait()
+            subscriber.put_nowait(event)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=self._subscriber_buffer)
+        self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            while True:
+                yield await subscriber.get()
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+class RedisTaskQueue(TaskQueue):
+    """
+    基于 Redis 列表 + Pub/Sub 的队列，多个 worker 进程/节点可共享
+    """
+
+    def __init__(self, url: str, queue_key: str = "jifou:tasks"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._queue_key = queue_key
+
+    async def enqueue(self, payload: Dict[str, Any]) -> None:
+        await self._redis.lpush(self._queue_key, json.dumps(payload))
+
+    async def dequeue(self) -> Dict[str, Any]:
+        while True:
+            item = await self._redis.brpop(self._queue_key, timeout=5)
+            if item is not None:
+                return json.loads(item[1])
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        await self._redis.publish(f"{self._queue_key}:{channel}", json.dumps(event))
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(f"{self._queue_key}:{channel}")
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def ping(self) -> None:
+        await self._redis.ping()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+class WorkerPool:
+    """
+    固定数量的协程 worker，从队列领取任务并交给 handler 处理
+    """
+
+    def __init__(self, queue: TaskQueue, handler: Callable[[Dict[str, Any]], Awaitable[None]], concurrency: int):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _run(self) -> None:
+        while True:
+            payload = await self.queue.dequeue()
+            try:
+                await self.handler(payload)
+            except Exception as e:
+                print(f"Task Worker Error: {e}")
+
+def create_task_queue(backend: Optional[str] = None) -> TaskQueue:
+    backend = backend or settings.TASK_QUEUE_BACKEND
+    if backend == "redis":
+        return RedisTaskQueue(settings.REDIS_URL)
+    if backend == "memory":
+        return InMemoryTaskQueue()
+    raise ValueError(f"Unknown task queue backend: {backend}")
+
+task_queue = create_task_queue()
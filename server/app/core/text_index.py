@@ -0,0 +1,46 @@
+import hashlib
+import re
+from typing import List, Tuple
+from .cache import normalize_content
+
+# 中日韩文字连续片段，或小写字母数字组成的单词；其余字符 (标点、空白、符号) 作为分隔
+_TOKEN = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[0-9a-z]+")
+
+def _runs(text: str) -> List[str]:
+    return _TOKEN.findall(normalize_content(text).lower())
+
+def user_namespace(user_id: str) -> str:
+    """
+    词项的用户前缀：每个用户的词项独立成倒排表，查询只读取本人的倒排表，
+    代价与该用户的记录数相关而与全库规模无关。前缀碰撞只会多出候选，查询时仍按 user_id 过滤
+    """
+    return hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:8]
+
+def index_terms(text: str, namespace: str = "") -> str:
+    """
+    倒排索引词项 (空格分隔，去重)：中文按单字与相邻二字 (bigram) 切分，无需分词器；英文与数字按单词。
+    结果写入 records.search_terms，由 SQLite FTS5 / Postgres tsvector 建索引
+    """
+    terms = []
+    for run in _runs(text):
+        if run.isascii():
+            terms.append(run)
+            continue
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return " ".join(namespace + term for term in dict.fromkeys(terms))
+
+def query_terms(text: str) -> List[Tuple[str, bool]]:
+    """
+    查询词项：(词项, 是否前缀匹配)。两字以上的中文片段只用 bigram (全部命中即覆盖整个片段)，
+    单字用单字索引；英文单词按前缀匹配，run 可命中 running
+    """
+    terms = []
+    for run in _runs(text):
+        if run.isascii():
+            terms.append((run, True))
+        elif len(run) == 1:
+            terms.append((run, False))
+        else:
+            terms.extend((run[i:i + 2], False) for i in range(len(run) - 1))
+    return list(dict.fromkeys(terms))
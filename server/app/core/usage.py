@@ -0,0 +1,111 @@
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from .metrics import MetricFamily
+
+# 当前 LLM 调用归属的 (用户, 接口)。请求内由鉴权依赖设置，后台任务按任务载荷恢复
+_scope: ContextVar[Tuple[Optional[str], Optional[str]]] = ContextVar("llm_usage_scope", default=(None, None))
+
+def set_usage_scope(user_id: Optional[str], endpoint: Optional[str]) -> None:
+    _scope.set((user_id, endpoint))
+
+def current_usage_scope() -> Tuple[Optional[str], Optional[str]]:
+    return _scope.get()
+
+# 持久化聚合的维度：(日期, 用户, 接口, 任务, 服务商, 模型)，未归属的调用用空字符串
+UsageKey = Tuple[date, str, str, str, str, str]
+
+def _empty_counts() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_calls": 0, "latency_sum": 0.0}
+
+class UsageTracker:
+    """
+    记录每次 LLM 调用的 token 用量与耗时：最近若干次调用明细、按 (任务, 服务商, 模型) 的进程累计，
+    以及尚未落库的按天聚合 (由 usage_service 定期取走写入数据库)。
+    服务商未返回 usage (如流式输出) 时使用本地计数，并标记为估算
+    """
+
+    def __init__(self, max_recent: int = 200):
+        self.recent: deque = deque(maxlen=max_recent)
+        self.totals: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.pending: Dict[UsageKey, Dict[str, Any]] = {}
+
+    def record(self, task: str, provider: str, model: str, prompt_tokens: int, completion_tokens: int,
+               estimated: bool = False, local_prompt_tokens: Optional[int] = None, latency: float = 0.0) -> None:
+        user_id, endpoint = current_usage_scope()
+        self.recent.append({
+            "at": time.time(),
+            "user_id": user_id,
+            "endpoint": endpoint,
+            "task": task,
+            "provider": provider,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated": estimated,
+            # 本地计数，与服务商返回的数值对照可看出估算偏差
+            "local_prompt_tokens": local_prompt_tokens,
+            "latency": round(latency, 4),
+        })
+        for counts in (
+            self.totals.setdefault((task, provider, model), _empty_counts()),
+            self.pending.setdefault((date.today(), user_id or "", endpoint or "", task, provider, model), _empty_counts()),
+        ):
+            counts["calls"] += 1
+            counts["prompt_tokens"] += prompt_tokens
+            counts["completion_tokens"] += completion_tokens
+            counts["latency_sum"] += latency
+            if estimated:
+                counts["estimated_calls"] += 1
+
+    def drain(self) -> Dict[UsageKey, Dict[str, Any]]:
+        """
+        取走尚未落库的聚合
+        """
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def restore(self, pending: Dict[UsageKey, Dict[str, Any]]) -> None:
+        """
+        落库失败时把取走的聚合合并回去，下次重试
+        """
+        for key, counts in pending.items():
+            merged = self.pending.setdefault(key, _empty_counts())
+            for name, value in counts.items():
+                merged[name] += value
+
+    def pending_tokens(self, day: date, user_id: Optional[str] = None) -> int:
+        """
+        尚未落库的 token 数，user_id 为空时统计所有用户
+        """
+        return sum(
+            counts["prompt_tokens"] + counts["completion_tokens"]
+            for key, counts in self.pending.items()
+            if key[0] == day and (user_id is None or key[1] == user_id)
+        )
+
+    def metric_families(self) -> List[MetricFamily]:
+        calls, tokens = [], []
+        for (task, provider, model), counts in self.totals.items():
+            labels = {"task": task, "provider": provider, "model": model}
+            calls.append(("", labels, counts["calls"]))
+            tokens.append(("", {**labels, "kind": "prompt"}, counts["prompt_tokens"]))
+            tokens.append(("", {**labels, "kind": "completion"}, counts["completion_tokens"]))
+        return [
+            MetricFamily("jifou_llm_task_calls_total", "counter", "Successful LLM calls by task and model", calls),
+            MetricFamily("jifou_llm_tokens_total", "counter", "LLM tokens by task, model and kind", tokens),
+        ]
+
+    def stats(self, recent: int = 20) -> Dict[str, Any]:
+        return {
+            "totals": [
+                {"task": task, "provider": provider, "model": model, **counts}
+                for (task, provider, model), counts in self.totals.items()
+            ],
+            "pending_keys": len(self.pending),
+            "recent": list(self.recent)[-recent:],
+        }
+
+usage_tracker = UsageTracker()
@@ -1,16 +1,45 @@
+import asyncio
+import traceback
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from .api import records, reports, auth
-from .core.database import engine, Base
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+from .api import records, reports, sync, auth, admin
+from .core.cache import cache_metric_families
+from .core.config import settings
+from .core.database import engine, Base, AsyncSessionLocal
+from .core.metrics import MetricsMiddleware, loop_lag_monitor, metrics
+from .core.task_queue import task_queue
+from .services.ai_service import ai_service
+from .services.analysis_service import analysis_service
+from .services.report_scheduler import report_scheduler
+from .services.usage_service import usage_service
+from .services.user_service import user_service
 
 # 创建数据库表 (MVP 阶段简单处理，生产环境建议使用 Alembic)
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动记录分析 worker 池，并补投递上次遗留的 pending 任务
+    await analysis_service.start()
+    await usage_service.start()
+    loop_lag_monitor.start()
+    # 日报夜间预生成调度，从 report_jobs 中未完成的任务继续
+    await report_scheduler.start()
+    yield
+    await report_scheduler.stop()
+    await loop_lag_monitor.stop()
+    await analysis_service.stop()
+    await usage_service.stop()
+    await task_queue.close()
+
 app = FastAPI(
     title="记否 API",
     description=" MVP 后端",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 配置 CORS
@@ -21,9 +50,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+unhandled_errors = metrics.counter("jifou_unhandled_exceptions", "Exceptions that reached the global handler", ("route", "exception"))
+
+def _collect_component_metrics():
+    cache = ai_service.cache
+    stats = {"ai_memory": cache.memory.stats, "auth_user": user_service.cache.stats}
+    if cache.shared is not None:
+        stats["ai_shared"] = cache.shared.stats
+    families = cache_metric_families(stats, {"ai_memory": len(cache.memory), "auth_user": len(user_service.cache)})
+    if ai_service.router:
+        families += ai_service.router.metric_families()
+    return families + usage_service.metric_families() + report_scheduler.metric_families()
+
+metrics.register_collector(_collect_component_metrics)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    # 记录堆栈与计数，不再静默吞掉
+    route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+    unhandled_errors.inc(route, type(exc).__name__)
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
     return JSONResponse(
         status_code=500,
         content={"message": "服务器内部错误", "detail": str(exc)},
@@ -37,13 +85,47 @@ async def root():
         "version": "1.0.0"
     }
 
+async def _check_database() -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT 1"))
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """
+    就绪探针：数据库与任务队列均可连通时返回 200，否则 503
+    """
+    checks = {}
+    for name, check in (("database", _check_database), ("queue", task_queue.ping)):
+        try:
+            await asyncio.wait_for(check(), timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+            checks[name] = "ok"
+        except Exception as e:
+            checks[name] = f"error: {type(e).__name__}: {e}"
+    healthy = all(result == "ok" for result in checks.values())
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={"status": "healthy" if healthy else "unhealthy", "checks": checks},
+    )
+
+@app.get("/health/live")
+async def liveness_check():
+    # 存活探针：进程能处理请求即可，不检查依赖
+    return {"status": "alive"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/ai")
+async def ai_health_check():
+    # LLM 路由排序、各服务商近期延迟/错误率/熔断状态以及缓存命中情况
+    return ai_service.stats()
 
 app.include_router(auth.router)
 app.include_router(records.router)
 app.include_router(reports.router)
+app.include_router(sync.router)
+app.include_router(admin.router)
 
 if __name__ == "__main__":
     import uvicorn
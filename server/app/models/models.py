@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Float, DateTime, JSON, Integer, Date, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Float, DateTime, JSON, Integer, Date, ForeignKey, Boolean, UniqueConstraint, Index, Text, LargeBinary, DDL, event
+from sqlalchemy.orm import deferred, relationship
 from ..core.database import Base
 import uuid
 from datetime import datetime
@@ -13,6 +13,8 @@ class UserModel(Base):
     full_name = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.now)
+    change_seq = Column(Integer, default=0, nullable=False) # 最近分配给该用户记录的变更序号
+    timezone = Column(String, nullable=True) # IANA 时区名，决定日报夜间预生成的时间，留空使用服务器默认时区
 
     records = relationship("RecordModel", back_populates="owner")
     reports = relationship("DailyReportModel", back_populates="owner")
@@ -27,9 +29,53 @@ class RecordModel(Base):
     created_at = Column(DateTime, default=datetime.now)
     emotion_score = Column(Float)
     categories = Column(JSON) # 存储为 JSON 列表
+    idempotency_key = Column(String, nullable=True) # 客户端生成，用于同步重试去重
+    analysis_status = Column(String, default="pending", nullable=False) # pending | done | failed
+    analysis_source = Column(String, nullable=True) # llm | local | fallback，本地分类器只用 llm 标注训练
+    analysis_claimed_at = Column(DateTime, nullable=True) # 分析 worker 认领 pending 记录的时间，超过 ANALYSIS_CLAIM_TIMEOUT_SECONDS 视为 worker 已退出
+    updated_at = Column(DateTime, default=datetime.now) # 内容最后修改时间 (客户端时钟)，同步冲突按它最后写入优先，分析结果回写不更新
+    deleted_at = Column(DateTime, nullable=True) # 删除墓碑：保留行以便同步给其他设备，内容清空
+    change_seq = Column(Integer, default=0, nullable=False) # 用户内单调递增的变更序号，增量同步的水位
+    # 搜索：带用户前缀的单字 + bigram 词项 (FTS5 / tsvector 的索引源) 与本地文本向量 (float32 字节)，只在搜索时读取
+    search_terms = deferred(Column(Text, nullable=True))
+    embedding = deferred(Column(LargeBinary, nullable=True))
 
     owner = relationship("UserModel", back_populates="records")
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_records_user_idempotency_key"),
+        # 服务于按用户的时间倒序列表和按天范围扫描
+        Index("ix_records_user_id_created_at", "user_id", "created_at"),
+        # 增量同步按变更序号拉取
+        Index("ix_records_user_id_change_seq", "user_id", "change_seq"),
+    )
+
+    @property
+    def deleted(self) -> bool:
+        return self.deleted_at is not None
+
+# 全文索引不在 ORM 元数据中，create_all / drop_all 时按数据库创建。
+# SQLite 使用外部内容 FTS5 表，按 rowid 对应 records，由触发器同步；
+# VACUUM 或重建 records 表 (batch 迁移) 会改变 rowid，之后需执行 scripts/backfill_search.py --rebuild-fts
+RECORDS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(search_terms, content='records', content_rowid='rowid', detail='none')",
+    "CREATE TRIGGER IF NOT EXISTS records_fts_ai AFTER INSERT ON records BEGIN "
+    "INSERT INTO records_fts(rowid, search_terms) VALUES (new.rowid, new.search_terms); END",
+    "CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON records BEGIN "
+    "INSERT INTO records_fts(records_fts, rowid, search_terms) VALUES ('delete', old.rowid, old.search_terms); END",
+    "CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF search_terms ON records BEGIN "
+    "INSERT INTO records_fts(records_fts, rowid, search_terms) VALUES ('delete', old.rowid, old.search_terms); "
+    "INSERT INTO records_fts(rowid, search_terms) VALUES (new.rowid, new.search_terms); END",
+]
+RECORDS_TSVECTOR_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_records_search_terms ON records USING gin (to_tsvector('simple', coalesce(search_terms, '')))",
+]
+for statement in RECORDS_FTS_DDL:
+    event.listen(RecordModel.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in RECORDS_TSVECTOR_DDL:
+    event.listen(RecordModel.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+event.listen(RecordModel.__table__, "before_drop", DDL("DROP TABLE IF EXISTS records_fts").execute_if(dialect="sqlite"))
+
 class DailyReportModel(Base):
     __tablename__ = "daily_reports"
 
@@ -45,5 +91,99 @@ class DailyReportModel(Base):
     risk_warning = Column(String)
     advice = Column(String)
     created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # 覆盖范围与增量聚合，用于新记录到达后的增量刷新
+    record_count = Column(Integer, default=0, nullable=False)
+    last_record_at = Column(DateTime, nullable=True)
+    emotion_sum = Column(Float, default=0.0, nullable=False)
+    scored_count = Column(Integer, default=0, nullable=False)
+    category_counts = Column(JSON) # {"health": 2, ...}
+    narrative_record_count = Column(Integer, default=0, nullable=False) # 生成文字解读时覆盖的记录数
+    narrative_avg_emotion = Column(Float, nullable=True)
+    is_stale = Column(Boolean, default=False, nullable=False)
 
     owner = relationship("UserModel", back_populates="reports")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_daily_reports_user_date"),
+    )
+
+# 按 (用户, 日期) 预聚合的记录统计，随记录分析完成增量更新
+class DailyStatModel(Base):
+    __tablename__ = "daily_stats"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    record_count = Column(Integer, default=0, nullable=False)
+    scored_count = Column(Integer, default=0, nullable=False)
+    emotion_sum = Column(Float, default=0.0, nullable=False)
+    emotion_min = Column(Float, nullable=True)
+    emotion_max = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_daily_stats_user_date"),
+    )
+
+# 每日分类直方图：按 (用户, 日期, 分类) 计数
+class DailyCategoryStatModel(Base):
+    __tablename__ = "daily_category_stats"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    category = Column(String, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", "category", name="uq_daily_category_stats_user_date_category"),
+    )
+
+# 日报预生成任务：每个 (用户, 日期) 一行，重复入队被唯一约束忽略。
+# worker 以乐观更新认领任务并持有租约，进程退出后租约过期的任务会被重新认领
+class ReportJobModel(Base):
+    __tablename__ = "report_jobs"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    status = Column(String, default="pending", nullable=False) # pending | running | done | empty | failed
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_report_jobs_user_date"),
+        # 认领时按状态找待处理任务，进度按 (日期, 状态) 计数
+        Index("ix_report_jobs_status_date", "status", "date"),
+    )
+
+# LLM 用量按 (日期, 用户, 接口, 任务, 服务商, 模型) 聚合，每次落库原子累加，不按调用逐条记录。
+# 未归属到用户/接口的调用 (如后台恢复任务) 对应列为空字符串，保证唯一约束生效
+class LLMUsageDailyModel(Base):
+    __tablename__ = "llm_usage_daily"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    date = Column(Date, nullable=False)
+    user_id = Column(String, nullable=False, default="")
+    endpoint = Column(String, nullable=False, default="")
+    task = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    calls = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    estimated_calls = Column(Integer, default=0, nullable=False) # 用本地计数代替服务商 usage 的调用数
+    latency_sum = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("date", "user_id", "endpoint", "task", "provider", "model", name="uq_llm_usage_daily_key"),
+        # 配额检查按 (日期, 用户) 求和
+        Index("ix_llm_usage_daily_date_user_id", "date", "user_id"),
+    )
@@ -1,12 +1,26 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from enum import Enum
 
 class RecordType(str, Enum):
     TEXT = "text"
     VOICE = "voice"
 
+class AnalysisStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+def to_server_time(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    时间列统一存储为服务器本地时区的 naive 时间 (与 datetime.now() 写入的值一致)。
+    客户端带时区偏移 (如 Z、+08:00) 的时间先换算到服务器时区再去掉时区；不带偏移的按原样视为服务器本地时间
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
 class RecordBase(BaseModel):
     content: str = Field(..., description="记录内容")
     record_type: RecordType = Field(default=RecordType.TEXT, description="记录类型")
@@ -17,8 +31,44 @@ class RecordCreate(RecordBase):
 class Record(RecordBase):
     id: str
     created_at: datetime
-    emotion_score: float = Field(..., ge=0, le=1, description="情绪评分 0-1")
+    emotion_score: Optional[float] = Field(default=None, ge=0, le=1, description="情绪评分 0-1，分析完成前为空")
     categories: List[str] = Field(default_factory=list, description="分类标签，如 health, wealth")
+    analysis_status: AnalysisStatus = Field(default=AnalysisStatus.DONE, description="AI 分析状态")
 
     class Config:
         from_attributes = True
+
+def record_payload(record: Any) -> Dict[str, Any]:
+    """
+    直接从 ORM 行组装 Record 的响应字典，跳过 Pydantic 的校验与 jsonable_encoder。
+    字段与顺序须与 Record 保持一致 (scripts/bench_serialization.py 校验输出逐字节相同)
+    """
+    return {
+        "content": record.content,
+        "record_type": record.record_type,
+        "id": record.id,
+        "created_at": record.created_at,
+        "emotion_score": record.emotion_score,
+        "categories": record.categories or [],
+        "analysis_status": record.analysis_status,
+    }
+
+class RecordSearchHit(Record):
+    score: float = Field(..., description="相关度，越大越相关；不同 mode 的得分不可比较")
+
+class RecordBatchItem(RecordCreate):
+    idempotency_key: Optional[str] = Field(default=None, max_length=128, description="客户端生成的幂等键，重试同步时不会重复创建")
+    created_at: Optional[datetime] = Field(default=None, description="客户端本地创建时间，缺省为服务器时间")
+
+    _normalize_created_at = field_validator("created_at")(to_server_time)
+
+class RecordBatchCreate(BaseModel):
+    records: List[RecordBatchItem] = Field(..., min_length=1, description="待上传的记录列表")
+
+class RecordBatchItemResult(BaseModel):
+    idempotency_key: Optional[str] = None
+    created: bool = Field(..., description="是否为本次新建；False 表示命中已存在的幂等键")
+    record: Record
+
+class RecordBatchResult(BaseModel):
+    results: List[RecordBatchItemResult] = Field(..., description="与请求顺序一一对应")
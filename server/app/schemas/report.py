@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from datetime import date
-from typing import List, Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional
 
 class DailyReport(BaseModel):
     date: date
@@ -16,9 +17,73 @@ class DailyReport(BaseModel):
     class Config:
         from_attributes = True
 
+def daily_report_payload(report: Any) -> Dict[str, Any]:
+    """
+    直接从 ORM 行组装 DailyReport 的响应字典，字段与顺序须与 DailyReport 保持一致
+    """
+    return {
+        "date": report.date,
+        "life_index": report.life_index,
+        "health_score": report.health_score,
+        "wealth_score": report.wealth_score,
+        "happiness_score": report.happiness_score,
+        "summary": report.summary,
+        "analysis": report.analysis,
+        "risk_warning": report.risk_warning,
+        "advice": report.advice,
+    }
+
 class WeeklyReport(BaseModel):
     start_date: date
     end_date: date
     summary: str
     trends: List[int]
     is_locked: bool = True
+
+class TrendPoint(BaseModel):
+    date: date
+    record_count: int = Field(..., description="当日记录数")
+    avg_emotion: Optional[float] = Field(default=None, description="平均情绪评分，无评分时为空")
+    min_emotion: Optional[float] = None
+    max_emotion: Optional[float] = None
+    categories: Dict[str, int] = Field(default_factory=dict, description="分类直方图")
+
+class Trends(BaseModel):
+    start_date: date
+    end_date: date
+    points: List[TrendPoint]
+
+class ReportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    EMPTY = "empty"  # 该日期已没有记录 (例如全部被删除)，无需生成
+    FAILED = "failed"
+
+class ReportJobDateProgress(BaseModel):
+    date: date
+    total: int
+    pending: int = 0
+    running: int = 0
+    done: int = 0
+    empty: int = 0
+    failed: int = Field(default=0, description="已失败的任务，未达最大尝试次数的会在下次扫描时重试")
+
+class ReportJobFailure(BaseModel):
+    user_id: str
+    date: date
+    attempts: int
+    error: Optional[str] = None
+
+class ReportJobProgress(BaseModel):
+    start_date: date
+    end_date: date
+    enabled: bool = Field(..., description="本进程是否运行预生成调度")
+    dates: List[ReportJobDateProgress]
+    failures: List[ReportJobFailure] = Field(..., description="最近失败的任务")
+    processed: Dict[str, int] = Field(..., description="本进程启动以来按结果统计的已处理任务数")
+    active: int = Field(..., description="本进程正在生成的报告数")
+
+class ReportJobEnqueueResult(BaseModel):
+    date: date
+    enqueued: int = Field(..., description="新建的任务数，已存在的 (用户, 日期) 不会重复入队")
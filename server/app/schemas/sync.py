@@ -0,0 +1,61 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from .record import Record, RecordType, record_payload, to_server_time
+
+class SyncChange(BaseModel):
+    id: Optional[str] = Field(default=None, description="服务端记录 ID，已同步过的记录携带")
+    idempotency_key: Optional[str] = Field(default=None, max_length=128, description="客户端本地记录 ID，尚无服务端 ID 时用于识别")
+    content: Optional[str] = Field(default=None, description="记录内容，删除时可省略")
+    record_type: RecordType = Field(default=RecordType.TEXT)
+    created_at: Optional[datetime] = Field(default=None, description="客户端本地创建时间，缺省为服务器时间")
+    updated_at: datetime = Field(..., description="客户端本地最后修改时间，冲突时较新的一方生效")
+    deleted: bool = Field(default=False, description="为 True 表示删除")
+
+    # 最后写入优先比较的是各设备时钟给出的 updated_at 与服务端写入时的 datetime.now()，
+    # 两者统一换算为服务器本地时区的 naive 时间后再比较与落库
+    _normalize_times = field_validator("created_at", "updated_at")(to_server_time)
+
+    @model_validator(mode="after")
+    def check_identity(self) -> "SyncChange":
+        if not self.id and not self.idempotency_key:
+            raise ValueError("id 与 idempotency_key 至少提供一个")
+        if not self.deleted and self.content is None:
+            raise ValueError("未删除的记录必须提供 content")
+        return self
+
+class SyncRequest(BaseModel):
+    since: int = Field(default=0, ge=0, description="上次同步返回的 watermark，首次同步为 0")
+    changes: List[SyncChange] = Field(default_factory=list, description="本地尚未上传的变更，按发生顺序")
+    limit: Optional[int] = Field(default=None, ge=1, description="本次最多拉取的变更数")
+
+class SyncRecord(Record):
+    idempotency_key: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    change_seq: int
+    deleted: bool = Field(default=False, description="墓碑：客户端应删除本地副本")
+
+def sync_record_payload(record: Any) -> Dict[str, Any]:
+    """
+    直接从 ORM 行组装 SyncRecord 的响应字典，字段与顺序须与 SyncRecord 保持一致
+    """
+    return {
+        **record_payload(record),
+        "idempotency_key": record.idempotency_key,
+        "updated_at": record.updated_at,
+        "change_seq": record.change_seq,
+        "deleted": record.deleted_at is not None,
+    }
+
+class SyncChangeResult(BaseModel):
+    id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    status: Literal["created", "updated", "deleted", "conflict", "ignored"] = Field(
+        ..., description="conflict 表示服务端版本更新，本地变更未生效；ignored 表示删除了不存在的记录"
+    )
+
+class SyncResponse(BaseModel):
+    results: List[SyncChangeResult] = Field(..., description="与 changes 顺序一一对应")
+    changes: List[SyncRecord] = Field(..., description="since 之后发生变更的记录 (含墓碑)，按 change_seq 升序")
+    watermark: int = Field(..., description="下次同步时作为 since 传回")
+    has_more: bool = Field(..., description="为 True 时应立即以新的 watermark 继续拉取")
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import List, Optional
+
+class UsageGroup(BaseModel):
+    group: str = Field(..., description="分组值：用户 ID、接口、服务商/模型、任务或日期")
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    estimated_calls: int = Field(..., description="按本地计数记录 token 的调用数")
+    avg_latency: Optional[float] = Field(default=None, description="平均耗时 (秒)")
+    cost: float = Field(..., description="按 LLM_MODEL_PRICES 估算的花费 (美元)")
+    unpriced_tokens: int = Field(..., description="未配置单价的模型消耗的 token 数，不计入 cost")
+
+class UsageSummary(BaseModel):
+    start_date: date
+    end_date: date
+    group_by: str
+    total: UsageGroup
+    groups: List[UsageGroup]
+    quota_downgrades: int = Field(..., description="本进程启动以来因配额用尽而降级的调用数")
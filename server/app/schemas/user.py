@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 class UserBase(BaseModel):
     phone_number: str
@@ -12,10 +13,25 @@ class UserCreate(UserBase):
 class UserUpdate(UserBase):
     pass
 
+class UserSettingsUpdate(BaseModel):
+    full_name: Optional[str] = None
+    timezone: Optional[str] = Field(default=None, description="IANA 时区名，如 Asia/Shanghai，用于安排日报预生成")
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            try:
+                ZoneInfo(value)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError("无效的时区")
+        return value
+
 class User(UserBase):
     id: str
     is_active: bool
     created_at: datetime
+    timezone: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -26,6 +42,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     phone_number: Optional[str] = None
+    user_id: Optional[str] = None
 
 class OTPRequest(BaseModel):
     phone_number: str
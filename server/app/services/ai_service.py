@@ -1,124 +1,425 @@
+import asyncio
 import json
-import random
-from typing import List, Dict, Any
-from openai import AsyncOpenAI
+import math
+import re
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Tuple
 from ..schemas.record import RecordCreate
 from ..models.models import RecordModel
 from ..core.config import settings
+from ..core.cache import content_key, create_ai_cache
+from ..core.llm_router import create_llm_router, task_model
+from ..core.prompts import count_tokens, prompt_registry, truncate_tokens
+from ..core.usage import current_usage_scope, usage_tracker
+from .local_classifier import CATEGORIES, local_classifier
+from .usage_service import usage_service
+
+class JSONFieldStream:
+    """
+    增量解析流式输出的 JSON 对象，每个顶层字段的值完整到达后立即返回；
+    嵌套的数组/对象会被跳过，不会阻塞后续字段
+    """
+
+    _KEY = re.compile(r'[\s{,]*"(\w+)"\s*:\s*')
+    _STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+    _SCALAR = re.compile(r'(?:-?\d[\d.eE+-]*|true|false|null)(?=\s*[,}])')
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = list(fields)
+        self.buffer = ""
+        self.pos = 0
+        self.seen: set = set()
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self.buffer += text
+        found = []
+        while True:
+            # 只在上一个字段结束处锚定匹配，避免误把字符串值内部的内容当作字段
+            key = self._KEY.match(self.buffer, self.pos)
+            if key is None:
+                break
+            end = self._value_end(key.end())
+            if end is None:
+                break
+            self.pos = end
+            name = key.group(1)
+            if name in self.fields and name not in self.seen:
+                self.seen.add(name)
+                found.append((name, json.loads(self.buffer[key.end():end])))
+        return found
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        """
+        输出结束后整体解析一次，补齐增量解析没能识别的字段
+        """
+        try:
+            result = json.loads(self.buffer)
+        except ValueError:
+            return []
+        if not isinstance(result, dict):
+            return []
+        found = [(name, result[name]) for name in self.fields if name in result and name not in self.seen]
+        self.seen.update(name for name, _ in found)
+        return found
+
+    def _value_end(self, start: int) -> Optional[int]:
+        """
+        返回从 start 开始的完整 JSON 值的结束位置，值尚未完整到达时返回 None
+        """
+        if start >= len(self.buffer):
+            return None
+        if self.buffer[start] not in "[{":
+            match = self._STRING.match(self.buffer, start) or self._SCALAR.match(self.buffer, start)
+            return match.end() if match else None
+        depth = 0
+        i = start
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if char == '"':
+                match = self._STRING.match(self.buffer, i)
+                if match is None:
+                    return None
+                i = match.end()
+                continue
+            if char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return None
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def parse_analysis(item: Any) -> Dict[str, Any]:
+    """
+    校验模型返回的单条分析结果：emotion_score 须为数字并截断到 [0, 1]，categories 须为列表且只保留已知分类。
+    只返回通过校验的字段，缺失或类型错误的字段由调用方降级补齐
+    """
+    parsed: Dict[str, Any] = {}
+    if not isinstance(item, dict):
+        return parsed
+    score = item.get("emotion_score")
+    if _is_number(score):
+        parsed["emotion_score"] = min(1.0, max(0.0, float(score)))
+    categories = item.get("categories")
+    if isinstance(categories, list):
+        names = (c.strip().lower() for c in categories if isinstance(c, str))
+        parsed["categories"] = list(dict.fromkeys(c for c in names if c in CATEGORIES))
+    return parsed
 
 class AIService:
     """
     AI 服务类，负责与 LLM 交互进行情绪分析和分类
     """
+
+    # 报告中由模型生成的文字字段，流式输出按此顺序
+    REPORT_TEXT_FIELDS = ("summary", "analysis", "risk_warning", "advice")
+    ANALYSIS_FIELDS = ("emotion_score", "categories")
     
     def __init__(self):
-        if settings.OPENROUTER_API_KEY:
-            self.client = AsyncOpenAI(
-                api_key=settings.OPENROUTER_API_KEY,
-                base_url=settings.OPENROUTER_BASE_URL,
-                default_headers={
-                    "HTTP-Referer": settings.SITE_URL,
-                    "X-Title": settings.SITE_NAME,
-                }
-            )
-        elif settings.OPENAI_API_KEY:
-            self.client = AsyncOpenAI(
-                api_key=settings.OPENAI_API_KEY,
-                base_url=settings.OPENAI_API_BASE
-            )
-        else:
-            self.client = None
+        self.cache = create_ai_cache()
+        self.router = create_llm_router()
+        self.classifier = local_classifier
+        self.prompts = prompt_registry
 
     async def analyze_record(self, content: str) -> Dict[str, Any]:
         """
         分析记录内容，返回情绪评分和分类
         """
-        if not self.client:
-            return self._mock_analyze_record(content)
+        return (await self.analyze_records([content]))[0]
+
+    async def analyze_records(self, contents: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量分析多条记录，按输入顺序返回结果，每条结果的 source 标明来源 (llm | local | fallback)。
+        先查缓存；primary 模式下本地分类器置信度足够的直接采用；其余内容去重后每 AI_BATCH_PACK_SIZE 条打包为一个 prompt，
+        且 prompt 不超过 AI_ANALYZE_MAX_PROMPT_TOKENS，并发数受 AI_BATCH_CONCURRENCY 限制。
+        未配置 LLM 时全部由本地分类器打分，当日 token 配额用尽时降级到本地分类器
+        """
+        if not contents:
+            return []
+
+        if not self.router:
+            return [{**r, "source": "local"} for r in self._local_analyze(contents)]
+
+        results: Dict[str, Dict[str, Any]] = {}
+        misses: Dict[str, str] = {}
+        for content in contents:
+            cache_key = self._analysis_cache_key(content)
+            if cache_key in results or cache_key in misses:
+                continue
+            cached = await self.cache.get(cache_key)
+            # 校验缓存命中，旧版本写入的不完整结果按未命中处理
+            cached = parse_analysis(cached) if cached is not None else {}
+            if len(cached) == len(self.ANALYSIS_FIELDS):
+                results[cache_key] = {"source": "llm", **cached}
+            else:
+                misses[cache_key] = content
+
+        if misses and settings.LOCAL_CLASSIFIER_MODE == "primary":
+            # 本地打分足够可信的不再调用 LLM，也不写缓存 (本地计算比查缓存还便宜)
+            for cache_key, local in zip(list(misses), self.classifier.predict(list(misses.values()))):
+                if local["confidence"] >= settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+                    results[cache_key] = {"emotion_score": local["emotion_score"], "categories": local["categories"], "source": "local"}
+                    del misses[cache_key]
+
+        if misses and not await usage_service.allow(current_usage_scope()[0]):
+            for cache_key, local in zip(misses, self._local_analyze(list(misses.values()))):
+                results[cache_key] = {**local, "source": "fallback"}
+            misses = {}
+
+        semaphore = asyncio.Semaphore(max(1, settings.AI_BATCH_CONCURRENCY))
+        chunks = self._pack_chunks(misses)
 
+        async def run_chunk(chunk: List[str]) -> None:
+            async with semaphore:
+                chunk_contents = [misses[k] for k in chunk]
+                if len(chunk) == 1:
+                    analyzed = [await self._analyze_single(chunk_contents[0])]
+                else:
+                    analyzed = await self._analyze_packed(chunk_contents)
+            parsed = [parse_analysis(result) for result in analyzed]
+            incomplete = [content for content, result in zip(chunk_contents, parsed) if len(result) < len(self.ANALYSIS_FIELDS)]
+            fallback = iter(self._local_analyze(incomplete))
+            for cache_key, result in zip(chunk, parsed):
+                if len(result) < len(self.ANALYSIS_FIELDS):
+                    # 模型失败、漏掉的条目以及缺失或无效的字段单独降级到本地分类器，不完整的结果不写缓存
+                    results[cache_key] = {**next(fallback), **result, "source": "fallback"}
+                else:
+                    results[cache_key] = {**result, "source": "llm"}
+                    await self.cache.set(cache_key, result)
+
+        await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return [results[self._analysis_cache_key(c)] for c in contents]
+
+    def _pack_chunks(self, misses: Dict[str, str]) -> List[List[str]]:
+        """
+        按条数上限和 token 预算切分待分析内容，单条超出预算的内容由截断保证放得下
+        """
+        pack_size = max(1, settings.AI_BATCH_PACK_SIZE)
+        budget = settings.AI_ANALYZE_MAX_PROMPT_TOKENS - self.prompts.get("analyze_batch").static_tokens
+        chunks: List[List[str]] = []
+        chunk: List[str] = []
+        used = 0
+        for cache_key, content in misses.items():
+            # 编号、引号与换行约占 4 个 token
+            cost = count_tokens(self._clip(content)) + 4
+            if chunk and (len(chunk) >= pack_size or used + cost > budget):
+                chunks.append(chunk)
+                chunk, used = [], 0
+            chunk.append(cache_key)
+            used += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def _clip(content: str) -> str:
+        return truncate_tokens(content, settings.AI_RECORD_MAX_TOKENS)
+
+    def _local_analyze(self, contents: List[str]) -> List[Dict[str, Any]]:
+        return [
+            {"emotion_score": r["emotion_score"], "categories": r["categories"]}
+            for r in self.classifier.predict(contents)
+        ]
+
+    async def _analyze_single(self, content: str) -> Optional[Any]:
+        """
+        返回模型输出的原始结果，由 parse_analysis 校验
+        """
         try:
-            prompt = f"""
-            分析以下用户记录，给出 0-1 的情绪评分（0为极度负面，1为极度正面），并从 [health, wealth, happiness] 中选择一个或多个分类。
-            请以 JSON 格式返回，例如: {{"emotion_score": 0.8, "categories": ["happiness"]}}
-            
-            用户记录: "{content}"
-            """
-            
-            response = await self.client.chat.completions.create(
-                model=settings.AI_MODEL,
-                messages=[{{"role": "user", "content": prompt}}],
-                response_format={{"type": "json_object"}}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            return {{
-                "emotion_score": result.get("emotion_score", 0.5),
-                "categories": result.get("categories", ["happiness"])
-            }}
+            prompt = self.prompts.render("analyze", content=self._clip(content))
+            return await self._chat_json("analyze", prompt)
         except Exception as e:
             print(f"AI Analysis Error: {e}")
-            return self._mock_analyze_record(content)
+            return None
+
+    async def _analyze_packed(self, contents: List[str]) -> List[Optional[Any]]:
+        try:
+            numbered = "\n".join(f"{i}. {json.dumps(self._clip(c), ensure_ascii=False)}" for i, c in enumerate(contents))
+            prompt = self.prompts.render("analyze_batch", count=len(contents), records=numbered)
+            result = await self._chat_json("analyze", prompt)
+            by_index = {
+                item.get("index"): item
+                for item in result.get("results", [])
+                if isinstance(item, dict)
+            }
+        except Exception as e:
+            print(f"AI Batch Analysis Error: {e}")
+            by_index = {}
+
+        return [by_index.get(i) for i in range(len(contents))]
+
+    async def _chat_json(self, task: str, prompt: str) -> Dict[str, Any]:
+        content = await self.router.complete(
+            task,
+            [{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+        return json.loads(content)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        LLM 调用、token 用量与配额降级、缓存与 prompt 模板的运行统计
+        """
+        return {
+            "llm": self.router.stats() if self.router else {},
+            "usage": {**usage_tracker.stats(), **usage_service.stats()},
+            "cache": self.cache.stats(),
+            "prompts": self.prompts.stats(),
+        }
+
+    def _analysis_cache_key(self, content: str) -> str:
+        return content_key("analysis", [content], task_model("analyze"), self.prompts.version("analyze", "analyze_batch"))
 
     async def generate_daily_report(self, records: List[RecordModel]) -> Dict[str, Any]:
         """
-        聚合全天记录生成人生报告
+        聚合全天记录生成报告的文字解读 (REPORT_TEXT_FIELDS)。数值评分由 ReportService 根据已有情绪评分
+        在本地计算，与流式路径一致；缓存只保存文字字段，两条路径共用同一缓存条目
         """
         if not records:
             return None
 
-        if not self.client:
-            return self._mock_generate_daily_report(records)
+        if not self.router:
+            return self._mock_narrative(records)
+
+        cache_key = self._report_cache_key(records)
+        cached = self._parse_report(await self.cache.get(cache_key))
+        if len(cached) == len(self.REPORT_TEXT_FIELDS):
+            return cached
+
+        if not await usage_service.allow(current_usage_scope()[0]):
+            return self._mock_narrative(records)
 
         try:
-            combined_content = "\n".join([f"- {r.content}" for r in records])
-            prompt = f"""
-            以下是用户今天的记录：
-            {combined_content}
-            
-            请生成一份人生报告，包含以下字段的 JSON 格式：
-            - life_index: 人生指数 (0-100)
-            - health_score: 健康评分 (0-100)
-            - wealth_score: 财富评分 (0-100)
-            - happiness_score: 幸福评分 (0-100)
-            - summary: 今日总结 (一句话)
-            - analysis: 深度解析 (一段话)
-            - risk_warning: 风险提示 (一句话)
-            - advice: 明日建议 (一句话)
-            """
-            
-            response = await self.client.chat.completions.create(
-                model=settings.AI_MODEL,
-                messages=[{{"role": "user", "content": prompt}}],
-                response_format={{"type": "json_object"}}
-            )
-            
-            return json.loads(response.choices[0].message.content)
+            template = self.prompts.get("report")
+            prompt = template.render(records=self._fit_records(records, template.static_tokens))
+            report = self._parse_report(await self._chat_json("report", prompt))
         except Exception as e:
             print(f"AI Report Generation Error: {e}")
-            return self._mock_generate_daily_report(records)
-
-    def _mock_analyze_record(self, content: str) -> Dict[str, Any]:
-        emotion_score = 0.5 + (random.random() * 0.5) if "好" in content or "棒" in content else 0.3 + (random.random() * 0.4)
-        categories = []
-        if any(word in content for word in ["钱", "工作", "加班", "项目", "财富"]):
-            categories.append("wealth")
-        if any(word in content for word in ["健身", "累", "舒服", "病", "健康", "跑"]):
-            categories.append("health")
-        if not categories:
-            categories.append("happiness")
+            return self._mock_narrative(records)
+
+        if len(report) < len(self.REPORT_TEXT_FIELDS):
+            # 缺失或无效的字段用降级内容补齐，不完整的结果不写缓存
+            return {**self._mock_narrative(records), **report}
+        await self.cache.set(cache_key, report)
+        return report
+
+    def _report_cache_key(self, records: List[RecordModel]) -> str:
+        return content_key("report", [r.content for r in records], task_model("report"), self.prompts.version("report", "report_stream"))
+
+    @classmethod
+    def _parse_report(cls, report: Any) -> Dict[str, str]:
+        """
+        校验模型返回 (或缓存中) 的报告文字字段，只返回非空字符串的字段
+        """
+        if not isinstance(report, dict):
+            return {}
         return {
-            "emotion_score": round(emotion_score, 2),
-            "categories": categories
+            name: report[name]
+            for name in cls.REPORT_TEXT_FIELDS
+            if isinstance(report.get(name), str) and report[name].strip()
         }
 
-    def _mock_generate_daily_report(self, records: List[RecordModel]) -> Dict[str, Any]:
-        avg_emotion = sum([r.emotion_score for r in records]) / len(records)
-        life_index = int(avg_emotion * 100)
+    async def stream_daily_report(self, records: List[RecordModel]) -> AsyncIterator[Tuple[str, str]]:
+        """
+        流式生成报告的文字字段，每个字段解析完成即产出 (字段名, 内容)，与 generate_daily_report 共用缓存
+        """
+        if not self.router:
+            mock = self._mock_narrative(records)
+            for name in self.REPORT_TEXT_FIELDS:
+                yield name, mock[name]
+            return
+
+        cache_key = self._report_cache_key(records)
+        cached = self._parse_report(await self.cache.get(cache_key))
+        if len(cached) == len(self.REPORT_TEXT_FIELDS):
+            for name in self.REPORT_TEXT_FIELDS:
+                yield name, cached[name]
+            return
+
+        if not await usage_service.allow(current_usage_scope()[0]):
+            mock = self._mock_narrative(records)
+            for name in self.REPORT_TEXT_FIELDS:
+                yield name, mock[name]
+            return
+
+        narrative: Dict[str, str] = {}
+        try:
+            template = self.prompts.get("report_stream")
+            prompt = template.render(records=self._fit_records(records, template.static_tokens))
+            parser = JSONFieldStream(self.REPORT_TEXT_FIELDS)
+            async for delta in self.router.stream(
+                "report",
+                [{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"}
+            ):
+                for name, value in parser.feed(delta):
+                    # 非字符串或空的字段视为缺失，最后用降级内容补齐
+                    if isinstance(value, str) and value.strip():
+                        narrative[name] = value
+                        yield name, value
+            for name, value in parser.finish():
+                if isinstance(value, str) and value.strip():
+                    narrative[name] = value
+                    yield name, value
+        except Exception as e:
+            print(f"AI Report Streaming Error: {e}")
+
+        missing = [name for name in self.REPORT_TEXT_FIELDS if name not in narrative]
+        if missing:
+            # 中途失败或模型漏掉字段时用降级内容补齐，降级结果不写缓存
+            mock = self._mock_narrative(records)
+            for name in missing:
+                yield name, mock[name]
+            return
+        await self.cache.set(cache_key, narrative)
+
+    def _fit_records(self, records: List[RecordModel], static_tokens: int) -> str:
+        """
+        把当天记录放进 AI_REPORT_MAX_PROMPT_TOKENS 预算：单条记录先截断到 AI_RECORD_MAX_TOKENS；
+        总量仍超出时优先保留情绪最强烈的、其次是较新的记录，其余记录在本地汇总为一行统计
+        """
+        budget = settings.AI_REPORT_MAX_PROMPT_TOKENS - static_tokens
+        lines = [f"- {self._clip(r.content)}" for r in records]
+        costs = [count_tokens(line) + 1 for line in lines]
+        if sum(costs) <= budget:
+            return "\n".join(lines)
+
+        # 为汇总行预留额度
+        budget -= 80
+        # records 按创建时间升序，下标越大越新
+        order = sorted(
+            range(len(records)),
+            key=lambda i: (-abs((records[i].emotion_score if records[i].emotion_score is not None else 0.5) - 0.5), -i)
+        )
+        kept = set()
+        used = 0
+        for i in order:
+            if used + costs[i] <= budget:
+                kept.add(i)
+                used += costs[i]
+        omitted = [r for i, r in enumerate(records) if i not in kept]
+        return "\n".join([lines[i] for i in sorted(kept)] + [self._omitted_summary(omitted)])
+
+    @staticmethod
+    def _omitted_summary(records: List[RecordModel]) -> str:
+        summary = f"- （另有 {len(records)} 条记录因篇幅省略"
+        scored = [r.emotion_score for r in records if r.emotion_score is not None]
+        if scored:
+            summary += f"，平均情绪 {sum(scored) / len(scored):.2f}"
+        counts = {}
+        for r in records:
+            for category in r.categories or []:
+                counts[category] = counts.get(category, 0) + 1
+        if counts:
+            summary += "，涉及 " + "、".join(f"{c} {n} 条" for c, n in sorted(counts.items(), key=lambda item: -item[1]))
+        return summary + "）"
+
+    def _mock_narrative(self, records: List[RecordModel]) -> Dict[str, str]:
+        # 未配置 LLM、配额用尽或模型失败时的模板文字
         return {
-            "life_index": life_index,
-            "health_score": 70 + random.randint(0, 20),
-            "wealth_score": 60 + random.randint(0, 30),
-            "happiness_score": 80 + random.randint(0, 15),
             "summary": f"今天你记录了 {len(records)} 件事。整体情绪表现稳定。",
             "analysis": "从记录来看，你的生活节奏把握得不错。",
             "risk_warning": "注意保持规律作息。",
@@ -0,0 +1,189 @@
+import asyncio
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.task_queue import InMemoryTaskQueue, TaskQueue, WorkerPool, task_queue
+from ..core.usage import current_usage_scope, set_usage_scope
+from ..models.models import RecordModel
+from ..schemas.record import AnalysisStatus
+from .ai_service import ai_service
+from .change_log import stamp_changes
+from .stats_service import stats_service
+
+class AnalysisService:
+    """
+    记录 AI 分析的后台调度：记录先以 pending 状态落库，由 worker 池异步补全情绪评分与分类
+    """
+
+    TASK_TYPE = "analyze_records"
+
+    def __init__(self, queue: TaskQueue):
+        self.queue = queue
+        self.pool = WorkerPool(queue, self.process, settings.ANALYSIS_WORKERS)
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def submit(self, record_ids: List[str]) -> None:
+        if record_ids:
+            # 带上发起请求的接口，worker 中的 LLM 用量仍能归属到它
+            _, endpoint = current_usage_scope()
+            await self.queue.enqueue({"type": self.TASK_TYPE, "record_ids": record_ids, "endpoint": endpoint})
+
+    async def process(self, payload: Dict[str, Any]) -> None:
+        if payload.get("type") != self.TASK_TYPE:
+            return
+        record_ids = payload.get("record_ids") or []
+        if not record_ids:
+            return
+
+        claimed_at = datetime.now()
+        finished: List[RecordModel] = []
+        async with AsyncSessionLocal() as db:
+            # 原子认领仍为 pending 且未被认领 (或认领已过期) 的记录，重复投递的任务或多个 worker
+            # 恢复同一批记录时，每条记录只会被一个 worker 分析和计入统计
+            claimed = (await db.execute(
+                update(RecordModel)
+                .where(
+                    RecordModel.id.in_(record_ids),
+                    RecordModel.analysis_status == AnalysisStatus.PENDING.value,
+                    RecordModel.deleted_at.is_(None),
+                    or_(
+                        RecordModel.analysis_claimed_at.is_(None),
+                        RecordModel.analysis_claimed_at < self._claim_expiry(claimed_at)
+                    )
+                )
+                .values(analysis_claimed_at=claimed_at)
+                .returning(RecordModel.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await db.commit()
+            if not claimed:
+                return
+            records = (await db.execute(
+                select(RecordModel).filter(RecordModel.id.in_(claimed))
+            )).scalars().all()
+
+            by_user: Dict[str, List[RecordModel]] = {}
+            for record in records:
+                by_user.setdefault(record.user_id, []).append(record)
+            for user_id, user_records in by_user.items():
+                # 用量与配额按记录所属用户计算；启动时恢复的任务没有来源接口
+                set_usage_scope(user_id, payload.get("endpoint"))
+                try:
+                    ai_results = await ai_service.analyze_records([r.content for r in user_records])
+                except Exception as e:
+                    print(f"Record Analysis Error: {e}")
+                    ai_results = [None] * len(user_records)
+                results = {record.id: ai_result for record, ai_result in zip(user_records, ai_results)}
+                try:
+                    finished.extend(await self._save_results(db, user_id, results, claimed_at))
+                except Exception as e:
+                    # 记录仍处于认领状态，认领过期后由定期清扫重新投递
+                    print(f"Record Analysis Save Error: {e}")
+                    await db.rollback()
+
+        for record in finished:
+            await self.queue.publish(self.channel(record.user_id), {
+                "record_id": record.id,
+                "analysis_status": record.analysis_status,
+                "emotion_score": record.emotion_score,
+                "categories": record.categories or [],
+            })
+
+    async def _save_results(self, db: AsyncSession, user_id: str, results: Dict[str, Optional[Dict[str, Any]]], claimed_at: datetime) -> List[RecordModel]:
+        """
+        回写一个用户的分析结果 (None 表示分析失败) 并单独提交，返回实际回写的记录。
+        LLM 调用期间记录可能被修改、删除或因认领过期被其他 worker 接手，只回写仍由本任务认领的记录
+        """
+        owned = (await db.execute(
+            select(RecordModel).filter(
+                RecordModel.id.in_(list(results)),
+                RecordModel.analysis_claimed_at == claimed_at,
+                RecordModel.analysis_status == AnalysisStatus.PENDING.value,
+                RecordModel.deleted_at.is_(None)
+            ).with_for_update().execution_options(populate_existing=True)
+        )).scalars().all()
+        for record in owned:
+            ai_result = results[record.id]
+            if ai_result is None:
+                record.analysis_status = AnalysisStatus.FAILED.value
+            else:
+                record.emotion_score = ai_result["emotion_score"]
+                record.categories = ai_result["categories"]
+                record.analysis_source = ai_result.get("source")
+                record.analysis_status = AnalysisStatus.DONE.value
+            record.analysis_claimed_at = None
+        # 分析结果回写也是一次变更，同步客户端据此拉取评分与分类；
+        # 分析结果确定后计入每日统计，与状态更新同一事务
+        await stamp_changes(db, user_id, owned)
+        await stats_service.apply_records(db, owned)
+        await db.commit()
+        return list(owned)
+
+    async def recover_pending(self, batch_size: int = 100) -> None:
+        """
+        启动时重新投递认领已过期的 pending 记录 (分析它的 worker 已退出)。
+        进程内队列随上次进程退出而丢失，此时未认领的 pending 记录也需重新投递；
+        redis 队列中的任务仍在，未认领的记录不再重复投递
+        """
+        stale = RecordModel.analysis_claimed_at < self._claim_expiry(datetime.now())
+        if isinstance(self.queue, InMemoryTaskQueue):
+            stale = or_(RecordModel.analysis_claimed_at.is_(None), stale)
+        await self._resubmit(stale, batch_size)
+
+    async def recover_expired_claims(self, batch_size: int = 100) -> None:
+        """
+        运行期间重新投递认领已过期的 pending 记录：回写失败、worker 被取消或其他节点退出后，
+        记录不必等到下次启动才重新分析
+        """
+        await self._resubmit(RecordModel.analysis_claimed_at < self._claim_expiry(datetime.now()), batch_size)
+
+    async def _resubmit(self, stale, batch_size: int) -> None:
+        async with AsyncSessionLocal() as db:
+            record_ids = (await db.execute(
+                select(RecordModel.id).filter(
+                    RecordModel.analysis_status == AnalysisStatus.PENDING.value,
+                    RecordModel.deleted_at.is_(None),
+                    stale
+                )
+            )).scalars().all()
+        for i in range(0, len(record_ids), batch_size):
+            await self.submit(list(record_ids[i:i + batch_size]))
+
+    @staticmethod
+    def _claim_expiry(now: datetime) -> datetime:
+        return now - timedelta(seconds=settings.ANALYSIS_CLAIM_TIMEOUT_SECONDS)
+
+    def subscribe(self, user_id: str) -> AsyncIterator[Dict[str, Any]]:
+        return self.queue.subscribe(self.channel(user_id))
+
+    @staticmethod
+    def channel(user_id: Optional[str]) -> str:
+        return f"analysis:{user_id}"
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ANALYSIS_CLAIM_TIMEOUT_SECONDS)
+            try:
+                await self.recover_expired_claims()
+            except Exception as e:
+                print(f"Record Analysis Recovery Error: {e}")
+
+    async def start(self) -> None:
+        self.pool.start()
+        await self.recover_pending()
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        await self.pool.stop()
+
+analysis_service = AnalysisService(task_queue)
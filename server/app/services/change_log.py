@@ -0,0 +1,31 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable
+from ..models.models import RecordModel, UserModel
+
+async def current_change_seq(db: AsyncSession, user_id: str) -> int:
+    """
+    用户记录的最新变更序号，任何记录新建、修改、删除或分析回写后都会变化
+    """
+    return (await db.execute(
+        select(UserModel.change_seq).where(UserModel.id == user_id)
+    )).scalar_one_or_none() or 0
+
+async def stamp_changes(db: AsyncSession, user_id: str, records: Iterable[RecordModel]) -> None:
+    """
+    为本事务内新建或修改的记录分配该用户单调递增的变更序号，随调用方事务一起提交。
+    计数器在 users 行上原子递增，行锁一直持有到提交，因此序号顺序与提交顺序一致，
+    按水位增量拉取的客户端不会漏掉晚提交的小序号
+    """
+    records = list(records)
+    if not records:
+        return
+    last = (await db.execute(
+        update(UserModel)
+        .where(UserModel.id == user_id)
+        .values(change_seq=UserModel.change_seq + len(records))
+        .returning(UserModel.change_seq)
+        .execution_options(synchronize_session=False)
+    )).scalar_one()
+    for seq, record in enumerate(records, start=last - len(records) + 1):
+        record.change_seq = seq
@@ -0,0 +1,221 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from ..core.cache import normalize_content
+from ..core.config import settings
+
+CATEGORIES = ("health", "wealth", "happiness")
+
+# 输出列：0 为情绪 (正面概率即情绪评分)，其余为各分类的概率
+_OUTPUTS = 1 + len(CATEGORIES)
+
+# 内置先验：常见中文情绪词与分类关键词。未训练时仅靠它打分，训练时作为初始权重
+EMOTION_LEXICON = {
+    4.0: ["开心", "高兴", "快乐", "幸福", "满足", "顺利", "舒服", "不错", "很好", "太好", "棒", "喜欢", "感恩", "轻松", "期待", "成功", "赚", "涨", "爽", "好"],
+    -4.0: ["难过", "伤心", "焦虑", "烦", "累", "糟", "崩溃", "失望", "生气", "郁闷", "压力", "失眠", "痛", "病", "亏", "跌", "不好", "不开心", "后悔", "孤独"],
+}
+CATEGORY_LEXICON = {
+    "health": ["健身", "跑步", "跑", "运动", "睡", "失眠", "病", "医院", "药", "健康", "累", "舒服", "饮食", "体重", "头疼", "锻炼", "瑜伽", "散步"],
+    "wealth": ["钱", "工资", "工作", "加班", "项目", "财富", "投资", "股票", "基金", "赚", "亏", "花", "买", "房", "老板", "升职", "客户", "涨", "跌"],
+    "happiness": ["开心", "快乐", "幸福", "朋友", "家人", "孩子", "电影", "旅行", "聚会", "约会", "音乐", "游戏", "好吃", "礼物", "笑"],
+}
+_CATEGORY_KEYWORD_WEIGHT = 4.0
+_CATEGORY_BIAS = -2.0
+
+_MUL = np.uint64(1000003)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def _ngram_features(texts: Sequence[str], bits: int, max_n: int):
+    """
+    批量提取字符 1..max_n-gram 的哈希特征，全程向量化。
+    返回 (特征桶下标, 所属文本下标)，两者等长
+    """
+    joined = "\x00".join(texts) + "\x00"
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    is_sep = codes == 0
+    # 每个字符所属的文本下标 (分隔符归属前一个文本)
+    doc = np.concatenate(([0], np.cumsum(is_sep[:-1])))
+    shift = np.uint64(64 - bits)
+
+    features, docs = [], []
+    rolling = codes
+    for n in range(1, max_n + 1):
+        if n > 1:
+            if len(codes) < n:
+                break
+            rolling = rolling[:-1] * _MUL + codes[n - 1:]
+        last = n - 1
+        # 窗口跨越分隔符时首尾文本下标不同；窗口末尾落在分隔符上时单独排除
+        valid = (doc[:len(rolling)] == doc[last:]) & ~is_sep[last:]
+        if n == 1:
+            valid &= ~is_sep
+        hashed = ((rolling + np.uint64(n)) * _MIX) >> shift
+        features.append(hashed[valid].astype(np.int64))
+        docs.append(doc[:len(rolling)][valid])
+    return np.concatenate(features), np.concatenate(docs)
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+# 本地文本向量的维度；向量以 float32 字节存入 records.embedding，修改维度后旧向量会被重新计算
+EMBEDDING_DIM = 64
+_SIGN_MIX = np.uint64(0xBF58476D1CE4E5B9)
+
+def embed_texts(contents: Sequence[str], bits: int = 20, max_n: int = 3) -> np.ndarray:
+    """
+    本地文本向量 (float32, 每行 L2 归一化)：字符 1..max_n-gram 哈希特征经带符号的特征哈希
+    投影到 EMBEDDING_DIM 维。只刻画字面相近程度，不依赖外部模型，可在写入时批量计算
+    """
+    size = len(contents)
+    if not size:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    texts = [normalize_content(c).lower() for c in contents]
+    features, docs = _ngram_features(texts, bits, max_n)
+    mixed = features.astype(np.uint64) * _SIGN_MIX
+    dims = ((mixed >> np.uint64(32)) % np.uint64(EMBEDDING_DIM)).astype(np.int64)
+    signs = np.where(mixed >> np.uint64(63), -1.0, 1.0)
+    vectors = np.bincount(docs * EMBEDDING_DIM + dims, weights=signs, minlength=size * EMBEDDING_DIM)
+    vectors = vectors.reshape(size, EMBEDDING_DIM).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+class LocalClassifier:
+    """
+    本地情绪/分类模型：中文词典先验 + 字符 n-gram 哈希特征上的线性模型 (NumPy 向量化)。
+    可用 LLM 已标注的记录训练；输出带置信度，供调用方决定是否交给 LLM
+    """
+
+    def __init__(self, bits: int = 16, max_n: int = 3):
+        self.bits = bits
+        self.max_n = max_n
+        self.weights = np.zeros((1 << bits, _OUTPUTS), dtype=np.float32)
+        self.bias = np.zeros(_OUTPUTS, dtype=np.float32)
+        self.bias[1:] = _CATEGORY_BIAS
+        self.trained_on = 0
+        self._apply_lexicon()
+
+    def _apply_lexicon(self) -> None:
+        for weight, words in EMOTION_LEXICON.items():
+            for word in words:
+                self.weights[self._word_feature(word), 0] += weight
+        for column, category in enumerate(CATEGORIES, start=1):
+            for word in CATEGORY_LEXICON[category]:
+                self.weights[self._word_feature(word), column] += _CATEGORY_KEYWORD_WEIGHT
+
+    def _word_feature(self, word: str) -> int:
+        # 词本身作为 len(word)-gram 的哈希桶
+        features, _ = _ngram_features([word], self.bits, len(word))
+        return int(features[-1])
+
+    def _prepare(self, contents: Sequence[str]):
+        texts = [normalize_content(c).lower() for c in contents]
+        features, docs = _ngram_features(texts, self.bits, self.max_n)
+        counts = np.bincount(docs, minlength=len(texts)).astype(np.float32)
+        # 按 1/sqrt(特征数) 缩放，长短文本的得分量级一致
+        scale = 1.0 / np.sqrt(np.maximum(counts, 1.0))
+        return features, docs, counts, scale
+
+    def _logits(self, features: np.ndarray, docs: np.ndarray, scale: np.ndarray, size: int) -> np.ndarray:
+        gathered = self.weights[features]
+        logits = np.empty((size, _OUTPUTS), dtype=np.float32)
+        for column in range(_OUTPUTS):
+            logits[:, column] = np.bincount(docs, weights=gathered[:, column], minlength=size)
+        return logits * scale[:, None] + self.bias
+
+    def predict(self, contents: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        批量预测，返回与输入顺序一致的 {"emotion_score", "categories", "confidence"}
+        """
+        if not contents:
+            return []
+        size = len(contents)
+        features, docs, counts, scale = self._prepare(contents)
+        probs = _sigmoid(self._logits(features, docs, scale, size))
+
+        # 置信度 = 命中有权重特征的比例 × 分类判定的平均确定程度
+        known = (np.abs(self.weights[features]).max(axis=1) > 1e-6).astype(np.float32)
+        coverage = np.bincount(docs, weights=known, minlength=size) / np.maximum(counts, 1.0)
+        margin = np.abs(probs[:, 1:] * 2 - 1).mean(axis=1)
+        confidence = coverage * margin
+
+        results = []
+        for i in range(size):
+            category_probs = probs[i, 1:]
+            categories = [c for c, p in zip(CATEGORIES, category_probs) if p >= 0.5]
+            if not categories:
+                # 没有明确分类时取概率最高的一个；完全没有信号时与旧逻辑一致归为 happiness
+                best = int(np.argmax(category_probs))
+                no_signal = np.allclose(category_probs, category_probs[best])
+                categories = ["happiness" if no_signal else CATEGORIES[best]]
+            results.append({
+                "emotion_score": round(float(probs[i, 0]), 2),
+                "categories": categories,
+                "confidence": round(float(confidence[i]), 3),
+            })
+        return results
+
+    def fit(self, contents: Sequence[str], emotion_scores: Sequence[float], categories: Sequence[Sequence[str]],
+            epochs: int = 40, learning_rate: float = 0.5, l2: float = 1e-4) -> None:
+        """
+        以当前权重 (词典先验或已加载的模型) 为起点，用全批量 AdaGrad 拟合 LLM 标注。
+        AdaGrad 让低频 n-gram 也能得到足够的步长
+        """
+        size = len(contents)
+        if not size:
+            return
+        targets = np.zeros((size, _OUTPUTS), dtype=np.float32)
+        targets[:, 0] = np.clip(np.asarray(emotion_scores, dtype=np.float32), 0.0, 1.0)
+        for i, labels in enumerate(categories):
+            for column, category in enumerate(CATEGORIES, start=1):
+                targets[i, column] = 1.0 if category in (labels or []) else 0.0
+
+        features, docs, _, scale = self._prepare(contents)
+        # 只更新训练集中出现过的特征桶
+        used, local_features = np.unique(features, return_inverse=True)
+        grad_sq = np.zeros((len(used), _OUTPUTS), dtype=np.float32)
+        bias_grad_sq = np.zeros(_OUTPUTS, dtype=np.float32)
+        for _ in range(epochs):
+            probs = _sigmoid(self._logits(features, docs, scale, size))
+            grad = (probs - targets) / size
+            per_feature = grad[docs] * scale[docs][:, None]
+            weight_grad = np.empty((len(used), _OUTPUTS), dtype=np.float32)
+            for column in range(_OUTPUTS):
+                weight_grad[:, column] = np.bincount(local_features, weights=per_feature[:, column], minlength=len(used))
+            weight_grad += l2 * self.weights[used]
+            grad_sq += weight_grad ** 2
+            self.weights[used] -= learning_rate * weight_grad / (np.sqrt(grad_sq) + 1e-8)
+
+            bias_grad = grad.sum(axis=0)
+            bias_grad_sq += bias_grad ** 2
+            self.bias -= learning_rate * bias_grad / (np.sqrt(bias_grad_sq) + 1e-8)
+        self.trained_on += size
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            bits=self.bits,
+            max_n=self.max_n,
+            trained_on=self.trained_on,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        data = np.load(path)
+        classifier = cls(bits=int(data["bits"]), max_n=int(data["max_n"]))
+        classifier.weights = data["weights"].astype(np.float32)
+        classifier.bias = data["bias"].astype(np.float32)
+        classifier.trained_on = int(data["trained_on"])
+        return classifier
+
+def create_local_classifier(path: Optional[str] = None) -> LocalClassifier:
+    path = path or settings.LOCAL_CLASSIFIER_MODEL_PATH
+    if path and os.path.exists(path):
+        try:
+            return LocalClassifier.load(path)
+        except Exception as e:
+            print(f"Local Classifier Load Error: {e}")
+    return LocalClassifier()
+
+local_classifier = create_local_classifier()
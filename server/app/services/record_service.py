@@ -1,34 +1,233 @@
-from sqlalchemy.orm import Session
-from typing import List
-from ..schemas.record import RecordCreate
+from sqlalchemy import select, and_, or_, text, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..schemas.record import RecordCreate, RecordBatchItem, AnalysisStatus
 from ..models.models import RecordModel
-from .ai_service import ai_service
+from .analysis_service import analysis_service
+from .change_log import stamp_changes
+from .report_service import report_service
+from .search_index import apply_search_fields
+import base64
+import json
+import uuid
+
+def encode_cursor(record: RecordModel) -> str:
+    """
+    将 (created_at, id) 编码为不透明游标
+    """
+    raw = json.dumps([record.created_at.isoformat(), record.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(record_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def category_filter(dialect: str, category: str):
+    # categories 是 JSON 列表，各数据库的包含判断写法不同
+    if dialect == "sqlite":
+        return text(
+            "EXISTS (SELECT 1 FROM json_each(records.categories) WHERE json_each.value = :category)"
+        ).bindparams(category=category)
+    if dialect == "postgresql":
+        return RecordModel.categories.cast(JSONB).contains([category])
+    return RecordModel.categories.cast(String).like(f'%"{category}"%')
 
 class RecordService:
     """
     记录业务逻辑类 (数据库持久化版)
     """
-    
-    async def create_record(self, db: Session, record_in: RecordCreate, user_id: str) -> RecordModel:
-        # 1. 调用 AI 服务分析内容
-        ai_result = await ai_service.analyze_record(record_in.content)
-        
-        # 2. 组装数据库模型
+
+    async def create_record(self, db: AsyncSession, record_in: RecordCreate, user_id: str) -> RecordModel:
+        # 1. 组装数据库模型，AI 分析结果稍后由后台 worker 补全
+        now = datetime.now()
         db_record = RecordModel(
             user_id=user_id,
             content=record_in.content,
             record_type=record_in.record_type,
-            emotion_score=ai_result["emotion_score"],
-            categories=ai_result["categories"]
+            created_at=now,
+            updated_at=now,
+            categories=[],
+            analysis_status=AnalysisStatus.PENDING.value
         )
-        
-        # 3. 保存到数据库
+
+        # 2. 保存到数据库，并使当天报告过期
+        apply_search_fields([db_record])
         db.add(db_record)
-        db.commit()
-        db.refresh(db_record)
+        await stamp_changes(db, user_id, [db_record])
+        await report_service.mark_stale(db, user_id, [db_record.created_at.date()])
+        await db.commit()
+        await db.refresh(db_record)
+
+        # 3. 投递分析任务
+        await analysis_service.submit([db_record.id])
         return db_record
 
-    async def get_recent_records(self, db: Session, user_id: str, limit: int = 10) -> List[RecordModel]:
-        return db.query(RecordModel).filter(RecordModel.user_id == user_id).order_by(RecordModel.created_at.desc()).limit(limit).all()
+    async def create_records_batch(self, db: AsyncSession, items: List[RecordBatchItem], user_id: str) -> List[Tuple[RecordModel, bool]]:
+        """
+        批量创建记录，返回与输入顺序一致的 (记录, 是否新建) 列表。
+        已存在的幂等键直接返回原记录；同一批次内重复的幂等键只创建一次。
+        """
+        try:
+            return await self._create_records_batch(db, items, user_id)
+        except IntegrityError:
+            # 并发的重试请求抢先写入了相同幂等键，回滚后重新按已存在处理
+            await db.rollback()
+            return await self._create_records_batch(db, items, user_id)
+
+    async def _create_records_batch(self, db: AsyncSession, items: List[RecordBatchItem], user_id: str) -> List[Tuple[RecordModel, bool]]:
+        # 1. 查询已存在的幂等键
+        keys = {item.idempotency_key for item in items if item.idempotency_key}
+        existing: Dict[str, RecordModel] = {}
+        if keys:
+            rows = (await db.execute(
+                select(RecordModel).filter(
+                    RecordModel.user_id == user_id,
+                    RecordModel.idempotency_key.in_(keys)
+                )
+            )).scalars().all()
+            existing = {r.idempotency_key: r for r in rows}
+
+        # 2. 筛出需要新建的条目 (批内重复键只保留第一条)
+        to_create: List[RecordBatchItem] = []
+        seen = set(existing)
+        for item in items:
+            if item.idempotency_key:
+                if item.idempotency_key in seen:
+                    continue
+                seen.add(item.idempotency_key)
+            to_create.append(item)
+
+        # 3. 一个事务内批量插入
+        now = datetime.now()
+        created: Dict[int, RecordModel] = {}
+        new_records = []
+        for item in to_create:
+            db_record = RecordModel(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                content=item.content,
+                record_type=item.record_type,
+                created_at=item.created_at or now,
+                updated_at=item.created_at or now,
+                categories=[],
+                analysis_status=AnalysisStatus.PENDING.value,
+                idempotency_key=item.idempotency_key
+            )
+            created[id(item)] = db_record
+            new_records.append(db_record)
+            if item.idempotency_key:
+                existing[item.idempotency_key] = db_record
+
+        if new_records:
+            apply_search_fields(new_records)
+            db.add_all(new_records)
+            await stamp_changes(db, user_id, new_records)
+            await report_service.mark_stale(db, user_id, {r.created_at.date() for r in new_records})
+            await db.commit()
+            # 4. 整批投递分析任务，worker 会按打包 prompt 批量分析
+            await analysis_service.submit([r.id for r in new_records])
+
+        # 5. 按输入顺序组装结果
+        results = []
+        for item in items:
+            if id(item) in created:
+                results.append((created[id(item)], True))
+            else:
+                results.append((existing[item.idempotency_key], False))
+        return results
+
+    async def get_record(self, db: AsyncSession, record_id: str, user_id: str) -> Optional[RecordModel]:
+        return (await db.execute(
+            select(RecordModel).filter(
+                RecordModel.id == record_id,
+                RecordModel.user_id == user_id,
+                RecordModel.deleted_at.is_(None)
+            )
+        )).scalars().first()
+
+    async def get_recent_records(self, db: AsyncSession, user_id: str, limit: int = 10) -> List[RecordModel]:
+        result = await db.execute(
+            select(RecordModel).filter(
+                RecordModel.user_id == user_id,
+                RecordModel.deleted_at.is_(None)
+            ).order_by(RecordModel.created_at.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def list_records(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category: Optional[str] = None,
+    ) -> Tuple[List[RecordModel], Optional[str]]:
+        """
+        按 (created_at, id) 倒序的游标分页，返回本页记录与下一页游标 (没有更多时为 None)
+        """
+        query = self._records_query(db.bind.dialect.name, user_id, cursor, start_date, end_date, category)
+        rows = list((await db.execute(query.limit(limit + 1))).scalars().all())
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+
+    async def stream_records(
+        self,
+        user_id: str,
+        cursor: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category: Optional[str] = None,
+    ) -> AsyncIterator[RecordModel]:
+        """
+        全量导出：服务端游标按 RECORD_STREAM_CHUNK_SIZE 分块拉取，内存占用与历史总量无关。
+        使用独立会话，生命周期跟随响应流而不是请求依赖。
+        """
+        async with AsyncSessionLocal() as db:
+            query = self._records_query(db.bind.dialect.name, user_id, cursor, start_date, end_date, category)
+            result = await db.stream(
+                query.execution_options(yield_per=settings.RECORD_STREAM_CHUNK_SIZE)
+            )
+            async for record in result.scalars():
+                yield record
+                # 已输出的对象不再需要，避免 identity map 随导出增长
+                db.expunge(record)
+
+    def _records_query(
+        self,
+        dialect: str,
+        user_id: str,
+        cursor: Optional[str],
+        start_date: Optional[date],
+        end_date: Optional[date],
+        category: Optional[str],
+    ):
+        # 已删除的墓碑只通过同步接口下发
+        query = select(RecordModel).filter(RecordModel.user_id == user_id, RecordModel.deleted_at.is_(None))
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                RecordModel.created_at < cursor_created_at,
+                and_(RecordModel.created_at == cursor_created_at, RecordModel.id < cursor_id)
+            ))
+        if start_date:
+            query = query.filter(RecordModel.created_at >= datetime.combine(start_date, time.min))
+        if end_date:
+            query = query.filter(RecordModel.created_at <= datetime.combine(end_date, time.max))
+        if category:
+            query = query.filter(category_filter(dialect, category))
+        return query.order_by(RecordModel.created_at.desc(), RecordModel.id.desc())
 
 record_service = RecordService()
@@ -0,0 +1,331 @@
+import asyncio
+import uuid
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import MetricFamily
+from ..core.otp import rate_limiter
+from ..core.usage import set_usage_scope
+from ..models.models import RecordModel, ReportJobModel, UserModel
+from ..schemas.report import ReportJobStatus
+from .report_service import report_service
+
+def resolve_timezone(name: Optional[str]) -> Optional[tzinfo]:
+    """
+    解析 IANA 时区名，留空或无效时回退到 REPORT_PREGEN_DEFAULT_TIMEZONE；返回 None 表示服务器本地时区
+    """
+    for candidate in (name, settings.REPORT_PREGEN_DEFAULT_TIMEZONE):
+        if candidate:
+            try:
+                return ZoneInfo(candidate)
+            except (ZoneInfoNotFoundError, ValueError):
+                continue
+    return None
+
+def due_report_date(now: datetime, tz: Optional[tzinfo]) -> Optional[date]:
+    """
+    now (带时区) 在 tz 中已过 REPORT_PREGEN_LOCAL_HOUR 点时返回前一天，否则返回 None
+    """
+    local = now.astimezone(tz)
+    if local.hour < settings.REPORT_PREGEN_LOCAL_HOUR:
+        return None
+    return local.date() - timedelta(days=1)
+
+def insert_jobs_statement(dialect: str, target_date: date, user_ids: List[str]):
+    """
+    批量入队，(用户, 日期) 已有任务时忽略，重复扫描是幂等的
+    """
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    now = datetime.now()
+    stmt = insert(ReportJobModel.__table__).values([
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "date": target_date,
+            "status": ReportJobStatus.PENDING.value,
+            "attempts": 0,
+            "created_at": now,
+        }
+        for user_id in user_ids
+    ])
+    return stmt.on_conflict_do_nothing(index_elements=["user_id", "date"])
+
+class ReportScheduler:
+    """
+    日报夜间预生成：定期扫描本地时间已过预生成时刻的用户，为其前一天有记录的日期创建任务，
+    再以有限并发认领任务并调用 ReportService 生成，与用户打开报告时的结果完全一致。
+    任务状态保存在 report_jobs 表中，多个 worker 可同时运行，进程重启后从未完成的任务继续
+    """
+
+    ENDPOINT = "report_pregen"
+    RATE_KEY = "report_pregen:generate"
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.processed: Dict[str, int] = {}
+        self.active = 0
+
+    async def start(self) -> None:
+        if settings.REPORT_PREGEN_ENABLED:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """
+        立即开始下一轮扫描 (例如手动入队后)，不等待 REPORT_PREGEN_INTERVAL_SECONDS
+        """
+        self._wake.set()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Report Pregeneration Error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.REPORT_PREGEN_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def run_once(self, now: Optional[datetime] = None) -> None:
+        await self.enqueue_due(now)
+        await self._recover_jobs()
+        await self.drain()
+
+    async def enqueue_due(self, now: Optional[datetime] = None) -> int:
+        """
+        按用户时区找出已到预生成时刻的用户，为其前一天有记录的日期入队，返回新建任务数
+        """
+        now = now or datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            zones = (await db.execute(
+                select(UserModel.timezone).filter(UserModel.is_active.is_(True)).distinct()
+            )).scalars().all()
+
+        # 同一目标日期的时区合并为一次查询
+        due: Dict[date, List[Optional[str]]] = {}
+        for zone in zones:
+            target_date = due_report_date(now, resolve_timezone(zone))
+            if target_date is not None:
+                due.setdefault(target_date, []).append(zone)
+
+        enqueued = 0
+        for target_date, due_zones in due.items():
+            enqueued += await self.enqueue(target_date, due_zones)
+        return enqueued
+
+    async def enqueue(self, target_date: date, zones: Optional[Iterable[Optional[str]]] = None) -> int:
+        """
+        为 target_date 有记录的活跃用户入队，zones 非空时只包括这些时区 (None 为未设置时区) 的用户
+        """
+        start_of_day = datetime.combine(target_date, time.min)
+        end_of_day = datetime.combine(target_date, time.max)
+        query = select(RecordModel.user_id).join(UserModel, UserModel.id == RecordModel.user_id).filter(
+            UserModel.is_active.is_(True),
+            RecordModel.created_at >= start_of_day,
+            RecordModel.created_at <= end_of_day,
+            RecordModel.deleted_at.is_(None)
+        ).distinct()
+        if zones is not None:
+            zones = list(zones)
+            named = [z for z in zones if z is not None]
+            conditions = [UserModel.timezone.in_(named)] if named else []
+            if None in zones:
+                conditions.append(UserModel.timezone.is_(None))
+            query = query.filter(or_(*conditions))
+
+        enqueued = 0
+        async with AsyncSessionLocal() as db:
+            user_ids = list((await db.execute(query)).scalars().all())
+            dialect = db.bind.dialect.name
+            for i in range(0, len(user_ids), 500):
+                result = await db.execute(insert_jobs_statement(dialect, target_date, user_ids[i:i + 500]))
+                enqueued += max(result.rowcount or 0, 0)
+            await db.commit()
+        return enqueued
+
+    async def _recover_jobs(self) -> None:
+        async with AsyncSessionLocal() as db:
+            # 最后一次尝试时 worker 退出的任务不会再被认领，租约过期后标记为失败
+            await db.execute(
+                update(ReportJobModel)
+                .where(
+                    ReportJobModel.status == ReportJobStatus.RUNNING.value,
+                    ReportJobModel.lease_expires_at < datetime.now(),
+                    ReportJobModel.attempts >= settings.REPORT_PREGEN_MAX_ATTEMPTS
+                )
+                .values(status=ReportJobStatus.FAILED.value, error="lease expired", finished_at=datetime.now(), lease_expires_at=None)
+            )
+            # 失败的任务每轮扫描重试一次，直到达到最大尝试次数
+            await db.execute(
+                update(ReportJobModel)
+                .where(
+                    ReportJobModel.status == ReportJobStatus.FAILED.value,
+                    ReportJobModel.attempts < settings.REPORT_PREGEN_MAX_ATTEMPTS
+                )
+                .values(status=ReportJobStatus.PENDING.value)
+            )
+            await db.commit()
+
+    async def drain(self) -> None:
+        """
+        以 REPORT_PREGEN_CONCURRENCY 个协程处理任务，直到没有可认领的任务
+        """
+        await asyncio.gather(*(self._worker() for _ in range(max(1, settings.REPORT_PREGEN_CONCURRENCY))))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._claim()
+            if job is None:
+                return
+            await self._run(*job)
+
+    async def _claim(self) -> Optional[Tuple[str, str, date, datetime]]:
+        """
+        认领一个待处理或租约已过期的任务，较新的日期优先，返回 (任务 ID, 用户, 日期, 认领时间)。
+        以 (状态, 尝试次数) 作为版本号乐观更新，并发的 worker 不会认领到同一任务；
+        认领时间作为本次认领的标识，回写结果时据此确认任务仍归本 worker 所有
+        """
+        while True:
+            now = datetime.now()
+            async with AsyncSessionLocal() as db:
+                candidates = (await db.execute(
+                    select(ReportJobModel.id, ReportJobModel.user_id, ReportJobModel.date, ReportJobModel.status, ReportJobModel.attempts).filter(
+                        or_(
+                            ReportJobModel.status == ReportJobStatus.PENDING.value,
+                            and_(
+                                ReportJobModel.status == ReportJobStatus.RUNNING.value,
+                                ReportJobModel.lease_expires_at < now
+                            )
+                        ),
+                        ReportJobModel.attempts < settings.REPORT_PREGEN_MAX_ATTEMPTS
+                    ).order_by(ReportJobModel.date.desc(), ReportJobModel.created_at)
+                    .limit(max(1, settings.REPORT_PREGEN_CONCURRENCY) * 2)
+                )).all()
+                if not candidates:
+                    return None
+                for job_id, user_id, target_date, status, attempts in candidates:
+                    result = await db.execute(
+                        update(ReportJobModel)
+                        .where(
+                            ReportJobModel.id == job_id,
+                            ReportJobModel.status == status,
+                            ReportJobModel.attempts == attempts
+                        )
+                        .values(
+                            status=ReportJobStatus.RUNNING.value,
+                            attempts=attempts + 1,
+                            started_at=now,
+                            lease_expires_at=now + timedelta(seconds=settings.REPORT_PREGEN_LEASE_SECONDS),
+                        )
+                    )
+                    await db.commit()
+                    if result.rowcount == 1:
+                        return job_id, user_id, target_date, now
+            # 候选任务都被其他 worker 抢先认领，重新查询
+
+    async def _run(self, job_id: str, user_id: str, target_date: date, claimed_at: datetime) -> None:
+        # 预生成的 LLM 用量与配额同样记在用户名下
+        set_usage_scope(user_id, self.ENDPOINT)
+        self.active += 1
+        try:
+            async with AsyncSessionLocal() as db:
+                version = await report_service.get_report_version(db, target_date, user_id)
+                if version is None or version.is_stale:
+                    # 只有需要生成或刷新的报告才占用限流额度
+                    await self._throttle()
+                report = await report_service.get_or_generate_daily_report(db, target_date, user_id)
+            status = ReportJobStatus.DONE if report else ReportJobStatus.EMPTY
+            error = None
+        except Exception as e:
+            print(f"Report Pregeneration Error: {e}")
+            status = ReportJobStatus.FAILED
+            error = f"{type(e).__name__}: {e}"[:500]
+        finally:
+            self.active -= 1
+
+        self.processed[status.value] = self.processed.get(status.value, 0) + 1
+        async with AsyncSessionLocal() as db:
+            # 生成超过租约时任务可能已被其他 worker 重新认领，此时结果以新的认领者为准
+            await db.execute(
+                update(ReportJobModel)
+                .where(
+                    ReportJobModel.id == job_id,
+                    ReportJobModel.status == ReportJobStatus.RUNNING.value,
+                    ReportJobModel.started_at == claimed_at
+                )
+                .values(status=status.value, error=error, finished_at=datetime.now(), lease_expires_at=None)
+            )
+            await db.commit()
+
+    async def _throttle(self) -> None:
+        """
+        令牌桶限流：容量为 REPORT_PREGEN_CONCURRENCY，每分钟恢复 REPORT_PREGEN_RATE_PER_MINUTE 个；
+        使用 redis 限流后端时在所有 worker 间共享
+        """
+        refill_seconds = 60.0 / settings.REPORT_PREGEN_RATE_PER_MINUTE
+        capacity = max(1, settings.REPORT_PREGEN_CONCURRENCY)
+        while True:
+            allowed, retry_after = await rate_limiter.acquire(self.RATE_KEY, capacity, refill_seconds)
+            if allowed:
+                return
+            await asyncio.sleep(retry_after)
+
+    async def progress(self, start_date: date, end_date: date, failures: int = 20) -> Dict[str, Any]:
+        """
+        [start_date, end_date] 内各日期按状态统计的任务数以及最近失败的任务
+        """
+        in_range = and_(ReportJobModel.date >= start_date, ReportJobModel.date <= end_date)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(ReportJobModel.date, ReportJobModel.status, func.count())
+                .filter(in_range)
+                .group_by(ReportJobModel.date, ReportJobModel.status)
+            )).all()
+            failed = (await db.execute(
+                select(ReportJobModel.user_id, ReportJobModel.date, ReportJobModel.attempts, ReportJobModel.error)
+                .filter(in_range, ReportJobModel.status == ReportJobStatus.FAILED.value)
+                .order_by(ReportJobModel.finished_at.desc())
+                .limit(failures)
+            )).all()
+
+        dates: Dict[date, Dict[str, Any]] = {}
+        for day, status, count in rows:
+            entry = dates.setdefault(day, {"date": day, "total": 0})
+            entry[status] = count
+            entry["total"] += count
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "enabled": self._task is not None,
+            "dates": [dates[day] for day in sorted(dates)],
+            "failures": [
+                {"user_id": user_id, "date": day, "attempts": attempts, "error": error}
+                for user_id, day, attempts, error in failed
+            ],
+            "processed": dict(self.processed),
+            "active": self.active,
+        }
+
+    def metric_families(self) -> List[MetricFamily]:
+        return [
+            MetricFamily("jifou_report_pregen_jobs_total", "counter", "Pre-generation jobs processed by outcome",
+                         [("", {"status": status}, count) for status, count in self.processed.items()]),
+            MetricFamily("jifou_report_pregen_active", "gauge", "Reports currently being pre-generated", [("", {}, self.active)]),
+        ]
+
+report_scheduler = ReportScheduler()
@@ -1,56 +1,324 @@
-from sqlalchemy.orm import Session
+import asyncio
+from sqlalchemy import select, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, datetime, time
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.locks import SingleFlight, lock_backend
 from ..models.models import DailyReportModel, RecordModel
+from ..schemas.record import AnalysisStatus
 from .ai_service import ai_service
 
 class ReportService:
     """
     报告业务逻辑类
     """
-    
-    async def get_or_generate_daily_report(self, db: Session, target_date: date, user_id: str) -> Optional[DailyReportModel]:
-        # 1. 检查是否已存在报告
-        existing_report = db.query(DailyReportModel).filter(
-            DailyReportModel.date == target_date,
-            DailyReportModel.user_id == user_id
-        ).first()
-        if existing_report:
+
+    def __init__(self):
+        self._flight = SingleFlight()
+        # 客户端断开后仍在运行的流式生成任务 (持有引用，避免被回收)
+        self._streams: set = set()
+
+    async def get_or_generate_daily_report(self, db: AsyncSession, target_date: date, user_id: str) -> Optional[DailyReportModel]:
+        # 1. 检查是否已存在且未过期的报告
+        existing_report = await self._get_report(db, target_date, user_id)
+        if existing_report and not existing_report.is_stale:
             return existing_report
-            
-        # 2. 获取该日期的所有记录
+
+        # 2. 同一 (用户, 日期) 的并发请求合并为一次生成/刷新
+        key = f"daily_report:{user_id}:{target_date.isoformat()}"
+        return await self._flight.do(key, lambda: self._generate_daily_report(key, target_date, user_id))
+
+    async def get_report_version(self, db: AsyncSession, target_date: date, user_id: str):
+        """
+        只读取报告的 (id, updated_at, is_stale)，命中 (user_id, date) 唯一索引，用于条件 GET
+        """
+        return (await db.execute(
+            select(DailyReportModel.id, DailyReportModel.updated_at, DailyReportModel.is_stale).filter(
+                DailyReportModel.user_id == user_id,
+                DailyReportModel.date == target_date
+            ).limit(1)
+        )).first()
+
+    async def mark_stale(self, db: AsyncSession, user_id: str, days: Iterable[date], reset_coverage: bool = False) -> None:
+        """
+        新记录写入时将对应日期的报告标记为过期，随调用方事务一起提交。
+        已覆盖的记录被修改或删除时传 reset_coverage，下次刷新从头重建聚合
+        """
+        days = set(days)
+        if not days:
+            return
+        values = {"is_stale": True}
+        if reset_coverage:
+            values.update(record_count=0, emotion_sum=0.0, scored_count=0, category_counts={}, last_record_at=None)
+        await db.execute(
+            update(DailyReportModel)
+            .where(DailyReportModel.user_id == user_id, DailyReportModel.date.in_(days))
+            .values(**values)
+        )
+
+    async def stream_daily_report(self, target_date: date, user_id: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式生成日报，依次产出 ("scores", 评分)、若干 ("field", {"name", "value"})、最后 ("done", 报告)。
+        评分由已有情绪评分在本地计算，查询完成即可返回；文字字段随模型输出逐个产出。
+        最终报告与非流式路径同样落库；该日期没有记录时不产出任何事件。
+        生成在独立任务中进行，客户端中途断开时仍会完成并落库，已消耗的 token 不会白费
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._produce_stream(target_date, user_id, queue))
+        self._streams.add(task)
+        task.add_done_callback(self._stream_done)
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        # 生成任务的异常在此抛给调用方
+        await task
+
+    async def _produce_stream(self, target_date: date, user_id: str, queue: asyncio.Queue) -> None:
+        try:
+            async for event in self._stream_events(target_date, user_id):
+                queue.put_nowait(event)
+        finally:
+            queue.put_nowait(None)
+
+    def _stream_done(self, task: asyncio.Task) -> None:
+        self._streams.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Report Streaming Error: {task.exception()}")
+
+    async def _stream_events(self, target_date: date, user_id: str) -> AsyncIterator[Tuple[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            report = await self._get_report(db, target_date, user_id)
+        if report and not report.is_stale:
+            async for event in self._replay_report(report):
+                yield event
+            return
+
+        key = f"daily_report:{user_id}:{target_date.isoformat()}"
+        async with lock_backend.lock(key), AsyncSessionLocal() as db:
+            # 拿到锁后复查，同进程的另一请求或其他 worker 可能已经生成或刷新
+            report = await self._get_report(db, target_date, user_id)
+            if report and not report.is_stale:
+                async for event in self._replay_report(report):
+                    yield event
+                return
+
+            report = await self._refresh_report(db, report, target_date, user_id)
+            if report is None:
+                return
+            if not self._needs_narrative(report):
+                saved = await self._save_report(db, report, target_date, user_id)
+                async for event in self._replay_report(saved):
+                    yield event
+                return
+
+            records = await self._get_day_records(db, target_date, user_id)
+            scores = self.local_scores(records)
+            yield "scores", scores
+            narrative = {}
+            async for name, value in ai_service.stream_daily_report(records):
+                narrative[name] = value
+                yield "field", {"name": name, "value": value}
+
+            self._apply_narrative(report, {**scores, **narrative})
+            yield "done", await self._save_report(db, report, target_date, user_id)
+
+    @staticmethod
+    def local_scores(records: List[RecordModel]) -> Dict[str, int]:
+        """
+        根据已有情绪评分在本地计算报告评分：人生指数为全天平均情绪，
+        各维度为该分类下记录的平均情绪 (没有该分类的记录时取人生指数)
+        """
+        def score(items: List[RecordModel], default: int) -> int:
+            values = [r.emotion_score for r in items if r.emotion_score is not None]
+            if not values:
+                return default
+            return max(0, min(100, int(round(sum(values) / len(values) * 100))))
+
+        life_index = score(records, 50)
+        return {
+            "life_index": life_index,
+            "health_score": score([r for r in records if "health" in (r.categories or [])], life_index),
+            "wealth_score": score([r for r in records if "wealth" in (r.categories or [])], life_index),
+            "happiness_score": score([r for r in records if "happiness" in (r.categories or [])], life_index),
+        }
+
+    async def _replay_report(self, report: DailyReportModel) -> AsyncIterator[Tuple[str, Any]]:
+        yield "scores", {
+            "life_index": report.life_index,
+            "health_score": report.health_score,
+            "wealth_score": report.wealth_score,
+            "happiness_score": report.happiness_score,
+        }
+        for name in ai_service.REPORT_TEXT_FIELDS:
+            yield "field", {"name": name, "value": getattr(report, name)}
+        yield "done", report
+
+    async def _generate_daily_report(self, key: str, target_date: date, user_id: str) -> Optional[DailyReportModel]:
+        # 生成任务可能比发起请求活得更久，因此使用独立会话
+        async with lock_backend.lock(key), AsyncSessionLocal() as db:
+            # 1. 拿到锁后复查，同进程的另一请求或其他 worker 可能已经生成或刷新
+            report = await self._get_report(db, target_date, user_id)
+            if report and not report.is_stale:
+                return report
+
+            # 2. 只处理报告尚未覆盖的新记录，更新增量聚合
+            report = await self._refresh_report(db, report, target_date, user_id)
+            if report is None:
+                # 该日期没有任何记录
+                return None
+
+            # 3. 内容变化足够大时才重新调用 AI 生成文字解读
+            if self._needs_narrative(report):
+                records = await self._get_day_records(db, target_date, user_id)
+                # 评分与流式路径一样在本地计算，模型只生成文字解读
+                narrative = await ai_service.generate_daily_report(records)
+                self._apply_narrative(report, {**narrative, **self.local_scores(records)})
+
+            # 4. 保存报告到数据库
+            return await self._save_report(db, report, target_date, user_id)
+
+    async def _refresh_report(self, db: AsyncSession, report: Optional[DailyReportModel], target_date: date, user_id: str) -> Optional[DailyReportModel]:
+        """
+        将新记录计入报告聚合 (报告不存在时新建)，返回待保存的报告；该日期没有任何记录时返回 None
+        """
+        if report is None:
+            report = DailyReportModel(
+                user_id=user_id,
+                date=target_date,
+                record_count=0,
+                emotion_sum=0.0,
+                scored_count=0,
+                category_counts={},
+                narrative_record_count=0,
+            )
+
+        new_records = await self._apply_new_records(db, report, target_date, user_id)
+        if report.id is None and not new_records:
+            return None
+        return report
+
+    def _apply_narrative(self, report: DailyReportModel, ai_report: Dict[str, Any]) -> None:
+        report.life_index = ai_report["life_index"]
+        report.health_score = ai_report["health_score"]
+        report.wealth_score = ai_report["wealth_score"]
+        report.happiness_score = ai_report["happiness_score"]
+        report.summary = ai_report["summary"]
+        report.analysis = ai_report["analysis"]
+        report.risk_warning = ai_report["risk_warning"]
+        report.advice = ai_report["advice"]
+        report.narrative_record_count = report.record_count
+        report.narrative_avg_emotion = self._avg_emotion(report)
+
+    async def _save_report(self, db: AsyncSession, report: DailyReportModel, target_date: date, user_id: str) -> Optional[DailyReportModel]:
+        db.add(report)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # (user_id, date) 唯一约束：并发插入时以先写入的报告为准
+            await db.rollback()
+            return await self._get_report(db, target_date, user_id)
+        await db.refresh(report)
+        return report
+
+    async def _apply_new_records(self, db: AsyncSession, report: DailyReportModel, target_date: date, user_id: str) -> List[RecordModel]:
+        """
+        将报告尚未覆盖的记录计入聚合，返回本次发现的全部新记录 (含仍在分析中、暂未计入的)
+        """
         start_of_day = datetime.combine(target_date, time.min)
         end_of_day = datetime.combine(target_date, time.max)
-        
-        records = db.query(RecordModel).filter(
+
+        # 已覆盖区间内的记录数与报告记录数不一致，说明有晚到的旧记录 (例如离线同步)，重建聚合
+        if report.last_record_at is not None:
+            covered = (await db.execute(
+                select(func.count()).select_from(RecordModel).filter(
+                    RecordModel.user_id == user_id,
+                    RecordModel.created_at >= start_of_day,
+                    RecordModel.created_at <= report.last_record_at,
+                    RecordModel.deleted_at.is_(None)
+                )
+            )).scalar_one()
+            if covered != report.record_count:
+                report.record_count = 0
+                report.emotion_sum = 0.0
+                report.scored_count = 0
+                report.category_counts = {}
+                report.last_record_at = None
+
+        query = select(RecordModel).filter(
             RecordModel.user_id == user_id,
             RecordModel.created_at >= start_of_day,
-            RecordModel.created_at <= end_of_day
-        ).all()
-        
-        if not records:
-            return None
-            
-        # 3. 调用 AI 生成报告内容
-        ai_report = await ai_service.generate_daily_report(records)
-        
-        # 4. 保存报告到数据库
-        new_report = DailyReportModel(
-            user_id=user_id,
-            date=target_date,
-            life_index=ai_report["life_index"],
-            health_score=ai_report["health_score"],
-            wealth_score=ai_report["wealth_score"],
-            happiness_score=ai_report["happiness_score"],
-            summary=ai_report["summary"],
-            analysis=ai_report["analysis"],
-            risk_warning=ai_report["risk_warning"],
-            advice=ai_report["advice"]
+            RecordModel.created_at <= end_of_day,
+            RecordModel.deleted_at.is_(None)
         )
-        
-        db.add(new_report)
-        db.commit()
-        db.refresh(new_report)
-        return new_report
+        if report.last_record_at is not None:
+            query = query.filter(RecordModel.created_at > report.last_record_at)
+        candidates = (await db.execute(
+            query.order_by(RecordModel.created_at, RecordModel.id)
+        )).scalars().all()
+
+        # 只吸收到第一条仍在分析中的记录为止，之后的记录留待下次刷新，保证聚合不遗漏评分
+        applied = []
+        for record in candidates:
+            if record.analysis_status == AnalysisStatus.PENDING.value:
+                break
+            applied.append(record)
+
+        category_counts = dict(report.category_counts or {})
+        for record in applied:
+            report.record_count += 1
+            if record.emotion_score is not None:
+                report.emotion_sum += record.emotion_score
+                report.scored_count += 1
+            for category in record.categories or []:
+                category_counts[category] = category_counts.get(category, 0) + 1
+        report.category_counts = category_counts
+        if applied:
+            report.last_record_at = applied[-1].created_at
+        report.is_stale = len(applied) < len(candidates)
+        return list(candidates)
+
+    def _needs_narrative(self, report: DailyReportModel) -> bool:
+        if report.summary is None:
+            return True
+        new_count = report.record_count - report.narrative_record_count
+        if new_count <= 0:
+            return False
+        if new_count / max(report.narrative_record_count, 1) >= settings.REPORT_REFRESH_MIN_NEW_RATIO:
+            return True
+        avg_emotion = self._avg_emotion(report)
+        if avg_emotion is None or report.narrative_avg_emotion is None:
+            return avg_emotion != report.narrative_avg_emotion
+        return abs(avg_emotion - report.narrative_avg_emotion) >= settings.REPORT_REFRESH_MIN_EMOTION_DELTA
+
+    @staticmethod
+    def _avg_emotion(report: DailyReportModel) -> Optional[float]:
+        if not report.scored_count:
+            return None
+        return report.emotion_sum / report.scored_count
+
+    async def _get_day_records(self, db: AsyncSession, target_date: date, user_id: str) -> List[RecordModel]:
+        start_of_day = datetime.combine(target_date, time.min)
+        end_of_day = datetime.combine(target_date, time.max)
+        return list((await db.execute(
+            select(RecordModel).filter(
+                RecordModel.user_id == user_id,
+                RecordModel.created_at >= start_of_day,
+                RecordModel.created_at <= end_of_day,
+                RecordModel.deleted_at.is_(None)
+            ).order_by(RecordModel.created_at)
+        )).scalars().all())
+
+    async def _get_report(self, db: AsyncSession, target_date: date, user_id: str) -> Optional[DailyReportModel]:
+        return (await db.execute(
+            select(DailyReportModel).filter(
+                DailyReportModel.date == target_date,
+                DailyReportModel.user_id == user_id
+            ).limit(1)
+        )).scalars().first()
 
 report_service = ReportService()
@@ -0,0 +1,210 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.text_index import index_terms, user_namespace
+from ..models.models import RecordModel
+from .change_log import current_change_seq
+from .local_classifier import EMBEDDING_DIM, embed_texts
+
+# 情绪区间 [下限, 上限)：negative < 0.4 <= neutral < 0.6 <= positive
+EMOTION_BANDS = {"negative": (None, 0.4), "neutral": (0.4, 0.6), "positive": (0.6, None)}
+
+# 分类位图的位数；超出的分类共用最后一位，过滤时只作粗筛，取回记录时再由 SQL 精确过滤
+_CATEGORY_BITS = 64
+
+def apply_search_fields(records: Sequence[RecordModel]) -> None:
+    """
+    内容写入或修改时计算搜索词项与本地向量，随记录一起提交。墓碑清空两者
+    """
+    live = [r for r in records if r.deleted_at is None and r.content]
+    for record in records:
+        if record.deleted_at is not None or not record.content:
+            record.search_terms = None
+            record.embedding = None
+    vectors = embed_texts([r.content for r in live])
+    for record, vector in zip(live, vectors):
+        record.search_terms = index_terms(record.content, user_namespace(record.user_id))
+        record.embedding = vector.tobytes()
+
+def emotion_band_bounds(band: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    return EMOTION_BANDS[band] if band else (None, None)
+
+class UserVectorIndex:
+    """
+    单个用户的内存向量索引：float32 矩阵 + 并列的过滤列 (创建时间、情绪、分类位图)。
+    按用户的 change_seq 增量追平，删除只打标记，失效行过多时压缩
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.size = 0
+        self.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.created = np.zeros(0, dtype=np.float64)
+        self.emotion = np.zeros(0, dtype=np.float32)
+        self.category_bits = np.zeros(0, dtype=np.uint64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.category_vocab: Dict[str, int] = {}
+
+    @property
+    def live_count(self) -> int:
+        return int(self.alive[:self.size].sum())
+
+    def _category_bit(self, category: str, create: bool) -> Optional[int]:
+        bit = self.category_vocab.get(category)
+        if bit is None:
+            if not create:
+                return _CATEGORY_BITS - 1 if len(self.category_vocab) >= _CATEGORY_BITS - 1 else None
+            bit = min(len(self.category_vocab), _CATEGORY_BITS - 1)
+            if bit < _CATEGORY_BITS - 1:
+                self.category_vocab[category] = bit
+        return bit
+
+    def _reserve(self, extra: int) -> None:
+        capacity = len(self.created)
+        if self.size + extra <= capacity:
+            return
+        capacity = max(self.size + extra, capacity * 2, 256)
+        for name in ("vectors", "created", "emotion", "category_bits", "alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def apply(self, rows: Iterable[Tuple]) -> None:
+        """
+        rows: (id, content, created_at, emotion_score, categories, embedding, deleted_at, change_seq)，按 change_seq 升序
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        # 旧数据没有存向量时现算
+        missing = [row for row in rows if row[6] is None and (row[5] is None or len(row[5]) != EMBEDDING_DIM * 4)]
+        computed = dict(zip((row[0] for row in missing), embed_texts([row[1] or "" for row in missing])))
+        self._reserve(len(rows))
+        for record_id, _, created_at, emotion_score, categories, embedding, deleted_at, change_seq in rows:
+            self.seq = max(self.seq, change_seq)
+            position = self.positions.get(record_id)
+            if deleted_at is not None:
+                if position is not None:
+                    self.alive[position] = False
+                continue
+            if position is None:
+                position = self.size
+                self.size += 1
+                self.ids.append(record_id)
+                self.positions[record_id] = position
+            vector = computed.get(record_id)
+            self.vectors[position] = vector if vector is not None else np.frombuffer(embedding, dtype=np.float32)
+            self.created[position] = created_at.timestamp() if created_at else 0.0
+            self.emotion[position] = np.nan if emotion_score is None else emotion_score
+            bits = 0
+            for category in categories or []:
+                bits |= 1 << self._category_bit(category, create=True)
+            self.category_bits[position] = bits
+            self.alive[position] = True
+        if self.size > 1024 and self.live_count < self.size * 0.75:
+            self._compact()
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self.alive[:self.size])
+        self.ids = [self.ids[i] for i in keep]
+        self.positions = {record_id: i for i, record_id in enumerate(self.ids)}
+        for name in ("vectors", "created", "emotion", "category_bits", "alive"):
+            setattr(self, name, getattr(self, name)[keep].copy())
+        self.size = len(keep)
+
+    def search(self, query: np.ndarray, k: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               category: Optional[str] = None, emotion_band: Optional[str] = None, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        余弦相似度 top-k (向量已归一化，即点积)，先按过滤列生成掩码再计算，低于 min_score 的结果丢弃
+        """
+        size = self.size
+        mask = self.alive[:size].copy()
+        if start is not None:
+            mask &= self.created[:size] >= start.timestamp()
+        if end is not None:
+            mask &= self.created[:size] <= end.timestamp()
+        if category:
+            bit = self._category_bit(category, create=False)
+            if bit is None:
+                return []
+            mask &= (self.category_bits[:size] & np.uint64(1 << bit)) != 0
+        low, high = emotion_band_bounds(emotion_band)
+        # 未评分的记录为 NaN，与任何区间比较都为 False
+        if low is not None:
+            mask &= self.emotion[:size] >= low
+        if high is not None:
+            mask &= self.emotion[:size] < high
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        scores = self.vectors[candidates] @ query
+        relevant = scores >= min_score
+        candidates, scores = candidates[relevant], scores[relevant]
+        if not len(candidates):
+            return []
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in top]
+
+class VectorIndexCache:
+    """
+    按用户缓存向量索引 (LRU，最多 SEARCH_VECTOR_CACHE_USERS 个用户)。
+    每次搜索先读取用户的 change_seq，落后时只拉取变更的记录增量追平
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[str, UserVectorIndex]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.builds = 0
+        self.refreshes = 0
+
+    async def get(self, db: AsyncSession, user_id: str) -> UserVectorIndex:
+        seq = await current_change_seq(db, user_id)
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = UserVectorIndex()
+                self.builds += 1
+            if index.seq < seq:
+                result = await db.stream(
+                    select(
+                        RecordModel.id, RecordModel.content, RecordModel.created_at, RecordModel.emotion_score,
+                        RecordModel.categories, RecordModel.embedding, RecordModel.deleted_at, RecordModel.change_seq
+                    ).filter(
+                        RecordModel.user_id == user_id,
+                        RecordModel.change_seq > index.seq
+                    ).order_by(RecordModel.change_seq).execution_options(yield_per=settings.RECORD_STREAM_CHUNK_SIZE)
+                )
+                async for rows in result.partitions():
+                    index.apply(rows)
+                index.seq = max(index.seq, seq)
+                self.refreshes += 1
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._locks.pop(evicted, None)
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._indexes),
+            "vectors": sum(index.live_count for index in self._indexes.values()),
+            "builds": self.builds,
+            "refreshes": self.refreshes,
+        }
+
+vector_index_cache = VectorIndexCache(settings.SEARCH_VECTOR_CACHE_USERS)
@@ -0,0 +1,148 @@
+from sqlalchemy import Integer, column, literal_column, select, text, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.text_index import query_terms, user_namespace
+from ..models.models import RecordModel
+from .local_classifier import embed_texts
+from .record_service import category_filter
+from .search_index import emotion_band_bounds, vector_index_cache
+
+# 倒数排名融合 (RRF) 的平滑常数
+_RRF_K = 60
+# 关键词命中数达到该值时改为沿时间索引扫描
+_DENSE_MATCHES = 2000
+
+class SearchService:
+    """
+    记录搜索：keyword 走数据库倒排索引 (SQLite FTS5 / Postgres tsvector，中文按 bigram)，
+    semantic 走内存中的本地向量索引，hybrid 按倒数排名融合两者 (关键词侧按时间倒序)
+    """
+
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        q: str,
+        mode: str = "keyword",
+        limit: int = 20,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category: Optional[str] = None,
+        emotion: Optional[str] = None,
+        candidates: int = 100,
+    ) -> List[Tuple[RecordModel, float]]:
+        """
+        返回 (记录, 得分) 列表，按得分降序
+        """
+        filters = dict(start_date=start_date, end_date=end_date, category=category, emotion=emotion)
+        if mode == "keyword":
+            return await self._keyword(db, user_id, q, limit, **filters)
+        if mode == "semantic":
+            hits = await self._semantic(db, user_id, q, limit, **filters)
+            return await self._fetch(db, user_id, hits, limit, **filters)
+
+        depth = max(candidates, limit)
+        keyword_hits = await self._keyword(db, user_id, q, depth, **filters)
+        semantic_hits = await self._semantic(db, user_id, q, depth, **filters)
+        fused: Dict[str, float] = {}
+        for rank, (record, _) in enumerate(keyword_hits):
+            fused[record.id] = fused.get(record.id, 0.0) + 1.0 / (_RRF_K + rank + 1)
+        for rank, (record_id, _) in enumerate(semantic_hits):
+            fused[record_id] = fused.get(record_id, 0.0) + 1.0 / (_RRF_K + rank + 1)
+        ranked = sorted(fused.items(), key=lambda item: -item[1])[:limit]
+        known = {record.id: record for record, _ in keyword_hits}
+        return await self._fetch(db, user_id, ranked, limit, known=known, **filters)
+
+    async def _keyword(self, db: AsyncSession, user_id: str, q: str, limit: int, **filters) -> List[Tuple[RecordModel, float]]:
+        """
+        所有词项都命中的记录，按时间倒序 (得分恒为 1.0)。记录内容很短，词项去重存储，
+        BM25 的区分度有限，却要对全部命中计算，时间倒序更符合日记的查找习惯
+        """
+        terms = query_terms(q)
+        if not terms:
+            return []
+        dialect = db.bind.dialect.name
+        namespace = user_namespace(user_id)
+        query = select(RecordModel).filter(*self._filters(dialect, user_id, **filters))
+        if dialect == "sqlite":
+            match = " AND ".join(f'"{namespace}{term}"' + ("*" if prefix else "") for term, prefix in terms)
+            matched = text("SELECT rowid FROM records_fts WHERE records_fts MATCH :match").bindparams(match=match)
+            # 命中多时沿 (user_id, created_at) 索引倒序扫描、逐行判断是否命中，凑满 limit 即停；
+            # 命中少时按 rowid 取回再排序。一元加号阻止 SQLite 把 rowid IN 当作索引条件
+            dense = (await db.execute(
+                text(f"SELECT count(*) FROM ({matched.text} LIMIT :cap)"),
+                {"match": match, "cap": _DENSE_MATCHES}
+            )).scalar_one() >= _DENSE_MATCHES
+            rowid = literal_column("+records.rowid" if dense else "records.rowid")
+            query = query.filter(rowid.in_(matched.columns(column("rowid", Integer))))
+        elif dialect == "postgresql":
+            query = query.filter(
+                func.to_tsvector("simple", func.coalesce(RecordModel.search_terms, "")).op("@@")(
+                    func.to_tsquery("simple", " & ".join(
+                        f"'{namespace}{term}'" + (":*" if prefix else "") for term, prefix in terms
+                    ))
+                )
+            )
+        else:
+            # 没有全文索引的数据库退回逐条扫描
+            for term, _ in terms:
+                query = query.filter(RecordModel.content.contains(term))
+
+        rows = (await db.execute(
+            query.order_by(RecordModel.created_at.desc(), RecordModel.id.desc()).limit(limit)
+        )).scalars().all()
+        return [(record, 1.0) for record in rows]
+
+    async def _semantic(self, db: AsyncSession, user_id: str, q: str, limit: int, start_date: Optional[date] = None,
+                        end_date: Optional[date] = None, category: Optional[str] = None,
+                        emotion: Optional[str] = None) -> List[Tuple[str, float]]:
+        if not q.strip():
+            return []
+        index = await vector_index_cache.get(db, user_id)
+        return index.search(
+            embed_texts([q])[0],
+            limit,
+            start=datetime.combine(start_date, time.min) if start_date else None,
+            end=datetime.combine(end_date, time.max) if end_date else None,
+            category=category,
+            emotion_band=emotion,
+            min_score=settings.SEARCH_SEMANTIC_MIN_SCORE,
+        )
+
+    async def _fetch(self, db: AsyncSession, user_id: str, hits: List[Tuple[str, float]], limit: int,
+                     known: Optional[Dict[str, RecordModel]] = None, **filters) -> List[Tuple[RecordModel, float]]:
+        """
+        按 id 取回记录并保持得分顺序；过滤条件在 SQL 中再精确应用一次 (向量索引可能略微落后)
+        """
+        known = dict(known or {})
+        missing = [record_id for record_id, _ in hits if record_id not in known]
+        if missing:
+            rows = (await db.execute(
+                select(RecordModel).filter(
+                    RecordModel.id.in_(missing),
+                    *self._filters(db.bind.dialect.name, user_id, **filters)
+                )
+            )).scalars().all()
+            known.update((record.id, record) for record in rows)
+        return [(known[record_id], score) for record_id, score in hits if record_id in known][:limit]
+
+    @staticmethod
+    def _filters(dialect: str, user_id: str, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                 category: Optional[str] = None, emotion: Optional[str] = None) -> list:
+        conditions = [RecordModel.user_id == user_id, RecordModel.deleted_at.is_(None)]
+        if start_date:
+            conditions.append(RecordModel.created_at >= datetime.combine(start_date, time.min))
+        if end_date:
+            conditions.append(RecordModel.created_at <= datetime.combine(end_date, time.max))
+        if category:
+            conditions.append(category_filter(dialect, category))
+        low, high = emotion_band_bounds(emotion)
+        if low is not None:
+            conditions.append(RecordModel.emotion_score >= low)
+        if high is not None:
+            conditions.append(RecordModel.emotion_score < high)
+        return conditions
+
+search_service = SearchService()
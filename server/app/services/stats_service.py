@@ -0,0 +1,160 @@
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..models.models import DailyStatModel, DailyCategoryStatModel, RecordModel
+from ..schemas.record import AnalysisStatus
+import uuid
+
+class DayAggregate:
+    """
+    单个 (用户, 日期) 的增量，可由任意条记录累加
+    """
+
+    def __init__(self):
+        self.record_count = 0
+        self.scored_count = 0
+        self.emotion_sum = 0.0
+        self.emotion_min: Optional[float] = None
+        self.emotion_max: Optional[float] = None
+        self.categories: Dict[str, int] = {}
+
+    def add(self, record: RecordModel) -> None:
+        self.record_count += 1
+        score = record.emotion_score
+        if score is not None:
+            self.scored_count += 1
+            self.emotion_sum += score
+            self.emotion_min = score if self.emotion_min is None else min(self.emotion_min, score)
+            self.emotion_max = score if self.emotion_max is None else max(self.emotion_max, score)
+        for category in record.categories or []:
+            self.categories[category] = self.categories.get(category, 0) + 1
+
+def aggregate_records(records: Iterable[RecordModel]) -> Dict[Tuple[str, date], DayAggregate]:
+    aggregates: Dict[Tuple[str, date], DayAggregate] = {}
+    for record in records:
+        key = (record.user_id, record.created_at.date())
+        aggregates.setdefault(key, DayAggregate()).add(record)
+    return aggregates
+
+def upsert_statements(dialect: str, user_id: str, day: date, agg: DayAggregate) -> list:
+    """
+    生成原子累加的 upsert 语句：同一天的并发写入不会丢失更新
+    """
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    least = func.least if dialect == "postgresql" else func.min
+    greatest = func.greatest if dialect == "postgresql" else func.max
+
+    stats = DailyStatModel.__table__
+    stmt = insert(stats).values(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        date=day,
+        record_count=agg.record_count,
+        scored_count=agg.scored_count,
+        emotion_sum=agg.emotion_sum,
+        emotion_min=agg.emotion_min,
+        emotion_max=agg.emotion_max,
+        updated_at=datetime.now(),
+    )
+    excluded = stmt.excluded
+    statements = [stmt.on_conflict_do_update(
+        index_elements=[stats.c.user_id, stats.c.date],
+        set_={
+            "record_count": stats.c.record_count + excluded.record_count,
+            "scored_count": stats.c.scored_count + excluded.scored_count,
+            "emotion_sum": stats.c.emotion_sum + excluded.emotion_sum,
+            # NULL 表示尚无评分，两侧互相兜底后再取极值
+            "emotion_min": least(func.coalesce(stats.c.emotion_min, excluded.emotion_min), func.coalesce(excluded.emotion_min, stats.c.emotion_min)),
+            "emotion_max": greatest(func.coalesce(stats.c.emotion_max, excluded.emotion_max), func.coalesce(excluded.emotion_max, stats.c.emotion_max)),
+            "updated_at": excluded.updated_at,
+        },
+    )]
+
+    categories = DailyCategoryStatModel.__table__
+    for category, count in agg.categories.items():
+        stmt = insert(categories).values(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            date=day,
+            category=category,
+            count=count,
+        )
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[categories.c.user_id, categories.c.date, categories.c.category],
+            set_={"count": categories.c.count + stmt.excluded.count},
+        ))
+    return statements
+
+class StatsService:
+    """
+    每日统计汇总：写路径增量维护，读路径按天直接读取汇总行
+    """
+
+    async def apply_records(self, db: AsyncSession, records: Iterable[RecordModel]) -> None:
+        """
+        将分析完成的记录计入汇总，随调用方事务一起提交
+        """
+        dialect = db.bind.dialect.name
+        for (user_id, day), agg in aggregate_records(records).items():
+            for stmt in upsert_statements(dialect, user_id, day, agg):
+                await db.execute(stmt)
+
+    async def recompute_day(self, db: AsyncSession, user_id: str, day: date) -> None:
+        """
+        从原始记录重建某一天的汇总 (记录被修改或删除时使用)，随调用方事务一起提交
+        """
+        await db.execute(delete(DailyStatModel).where(DailyStatModel.user_id == user_id, DailyStatModel.date == day))
+        await db.execute(delete(DailyCategoryStatModel).where(DailyCategoryStatModel.user_id == user_id, DailyCategoryStatModel.date == day))
+        records = (await db.execute(
+            select(RecordModel).filter(
+                RecordModel.user_id == user_id,
+                RecordModel.created_at >= datetime.combine(day, time.min),
+                RecordModel.created_at <= datetime.combine(day, time.max),
+                RecordModel.analysis_status != AnalysisStatus.PENDING.value,
+                RecordModel.deleted_at.is_(None)
+            )
+        )).scalars().all()
+        await self.apply_records(db, records)
+
+    async def get_daily_stats(self, db: AsyncSession, user_id: str, start_date: date, end_date: date) -> List[dict]:
+        """
+        返回 [start_date, end_date] 内每一天的统计 (无记录的日期补零)，只读取汇总行
+        """
+        stats = (await db.execute(
+            select(DailyStatModel).filter(
+                DailyStatModel.user_id == user_id,
+                DailyStatModel.date >= start_date,
+                DailyStatModel.date <= end_date
+            )
+        )).scalars().all()
+        category_rows = (await db.execute(
+            select(DailyCategoryStatModel).filter(
+                DailyCategoryStatModel.user_id == user_id,
+                DailyCategoryStatModel.date >= start_date,
+                DailyCategoryStatModel.date <= end_date
+            )
+        )).scalars().all()
+
+        by_day = {s.date: s for s in stats}
+        categories_by_day: Dict[date, Dict[str, int]] = {}
+        for row in category_rows:
+            categories_by_day.setdefault(row.date, {})[row.category] = row.count
+
+        points = []
+        day = start_date
+        while day <= end_date:
+            stat = by_day.get(day)
+            points.append({
+                "date": day,
+                "record_count": stat.record_count if stat else 0,
+                "avg_emotion": stat.emotion_sum / stat.scored_count if stat and stat.scored_count else None,
+                "min_emotion": stat.emotion_min if stat else None,
+                "max_emotion": stat.emotion_max if stat else None,
+                "categories": categories_by_day.get(day, {}),
+            })
+            day += timedelta(days=1)
+        return points
+
+stats_service = StatsService()
@@ -0,0 +1,162 @@
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from ..core.config import settings
+from ..models.models import RecordModel
+from ..schemas.record import AnalysisStatus
+from ..schemas.sync import SyncChange
+from .analysis_service import analysis_service
+from .change_log import stamp_changes
+from .report_service import report_service
+from .search_index import apply_search_fields
+from .stats_service import stats_service
+import uuid
+
+class SyncService:
+    """
+    本地优先客户端的增量同步：先按最后写入优先合并客户端变更，再返回水位之后的服务端变更。
+    每条记录的新建、修改、删除和分析结果回写都会分配新的变更序号，删除以墓碑形式保留
+    """
+
+    async def sync(self, db: AsyncSession, user_id: str, since: int, changes: List[SyncChange], limit: Optional[int] = None) -> Dict[str, Any]:
+        try:
+            results = await self._apply_changes(db, user_id, changes)
+        except IntegrityError:
+            # 并发的同步请求抢先创建了相同的本地 ID，回滚后重新合并
+            await db.rollback()
+            results = await self._apply_changes(db, user_id, changes)
+        records, watermark, has_more = await self.pull(db, user_id, since, limit)
+        return {"results": results, "changes": records, "watermark": watermark, "has_more": has_more}
+
+    async def pull(self, db: AsyncSession, user_id: str, since: int, limit: Optional[int] = None) -> Tuple[List[RecordModel], int, bool]:
+        """
+        返回 change_seq > since 的记录 (按序号升序)、新的水位以及是否还有更多
+        """
+        limit = min(limit or settings.SYNC_PULL_MAX_CHANGES, settings.SYNC_PULL_MAX_CHANGES)
+        rows = list((await db.execute(
+            select(RecordModel).filter(
+                RecordModel.user_id == user_id,
+                RecordModel.change_seq > since
+            ).order_by(RecordModel.change_seq).limit(limit + 1)
+        )).scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, rows[-1].change_seq if rows else since, has_more
+
+    async def _apply_changes(self, db: AsyncSession, user_id: str, changes: List[SyncChange]) -> List[Dict[str, Any]]:
+        if not changes:
+            return []
+        by_id, by_key = await self._load_targets(db, user_id, changes)
+
+        results = []
+        touched: List[RecordModel] = []
+        to_analyze: List[RecordModel] = []
+        # 需要重建每日统计的日期 (已计入统计的记录被修改或删除) 以及需要作废报告聚合的日期
+        recompute_days: Set[date] = set()
+        stale_days: Set[date] = set()
+        now = datetime.now()
+
+        for change in changes:
+            record = by_id.get(change.id) if change.id else None
+            if record is None and change.idempotency_key:
+                record = by_key.get(change.idempotency_key)
+
+            if record is None:
+                if change.deleted:
+                    results.append({"id": change.id, "idempotency_key": change.idempotency_key, "status": "ignored"})
+                    continue
+                record = RecordModel(
+                    id=str(uuid.uuid4()),
+                    user_id=user_id,
+                    content=change.content,
+                    record_type=change.record_type,
+                    created_at=change.created_at or now,
+                    updated_at=change.updated_at,
+                    categories=[],
+                    analysis_status=AnalysisStatus.PENDING.value,
+                    idempotency_key=change.idempotency_key,
+                )
+                db.add(record)
+                if change.idempotency_key:
+                    by_key[change.idempotency_key] = record
+                by_id[record.id] = record
+                stale_days.add(record.created_at.date())
+                touched.append(record)
+                to_analyze.append(record)
+                results.append({"id": record.id, "idempotency_key": record.idempotency_key, "status": "created"})
+                continue
+
+            # 最后写入优先：时间相同时保留服务端版本，保证各设备得到一致结果
+            if record.updated_at is not None and change.updated_at <= record.updated_at:
+                results.append({"id": record.id, "idempotency_key": record.idempotency_key, "status": "conflict"})
+                continue
+
+            if record.deleted_at is None and record.analysis_status != AnalysisStatus.PENDING.value:
+                recompute_days.add(record.created_at.date())
+            stale_days.add(record.created_at.date())
+            record.updated_at = change.updated_at
+            if change.deleted:
+                record.deleted_at = now
+                record.content = ""
+                record.emotion_score = None
+                record.categories = []
+                record.analysis_status = AnalysisStatus.DONE.value
+                record.analysis_claimed_at = None
+                status = "deleted"
+            else:
+                content_changed = record.deleted_at is not None or record.content != change.content
+                record.deleted_at = None
+                record.content = change.content
+                record.record_type = change.record_type
+                if change.created_at:
+                    record.created_at = change.created_at
+                    stale_days.add(record.created_at.date())
+                    # 已分析的记录移动到新日期时，新日期的统计同样需要重建
+                    if not content_changed and record.analysis_status != AnalysisStatus.PENDING.value:
+                        recompute_days.add(record.created_at.date())
+                if content_changed:
+                    # 内容变化后旧的分析结果作废，重新排队分析
+                    record.emotion_score = None
+                    record.categories = []
+                    record.analysis_status = AnalysisStatus.PENDING.value
+                    # 进行中的旧内容分析失去认领，结果不会回写，新任务可立即认领
+                    record.analysis_claimed_at = None
+                    to_analyze.append(record)
+                status = "updated"
+            touched.append(record)
+            results.append({"id": record.id, "idempotency_key": record.idempotency_key, "status": status})
+
+        # 同一批次内多次修改同一条记录只分配一个序号
+        touched = list({id(r): r for r in touched}.values())
+        apply_search_fields(touched)
+        await stamp_changes(db, user_id, touched)
+        await report_service.mark_stale(db, user_id, stale_days, reset_coverage=True)
+        if recompute_days:
+            await db.flush()
+            for day in recompute_days:
+                await stats_service.recompute_day(db, user_id, day)
+        await db.commit()
+
+        await analysis_service.submit(list(dict.fromkeys(r.id for r in to_analyze)))
+        return results
+
+    async def _load_targets(self, db: AsyncSession, user_id: str, changes: List[SyncChange]) -> Tuple[Dict[str, RecordModel], Dict[str, RecordModel]]:
+        ids = {c.id for c in changes if c.id}
+        keys = {c.idempotency_key for c in changes if c.idempotency_key}
+        by_id: Dict[str, RecordModel] = {}
+        by_key: Dict[str, RecordModel] = {}
+        if ids:
+            for record in (await db.execute(
+                select(RecordModel).filter(RecordModel.user_id == user_id, RecordModel.id.in_(ids))
+            )).scalars().all():
+                by_id[record.id] = record
+        if keys:
+            for record in (await db.execute(
+                select(RecordModel).filter(RecordModel.user_id == user_id, RecordModel.idempotency_key.in_(keys))
+            )).scalars().all():
+                by_key[record.idempotency_key] = record
+        return by_id, by_key
+
+sync_service = SyncService()
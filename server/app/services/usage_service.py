@@ -0,0 +1,221 @@
+import asyncio
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import MetricFamily
+from ..core.usage import UsageKey, usage_tracker
+from ..models.models import LLMUsageDailyModel
+
+# 汇总维度对应的列
+GROUP_COLUMNS = {
+    "user": (LLMUsageDailyModel.user_id,),
+    "endpoint": (LLMUsageDailyModel.endpoint,),
+    "model": (LLMUsageDailyModel.provider, LLMUsageDailyModel.model),
+    "task": (LLMUsageDailyModel.task,),
+    "date": (LLMUsageDailyModel.date,),
+}
+
+def upsert_statement(dialect: str, key: UsageKey, counts: Dict[str, Any]):
+    """
+    原子累加的 upsert：多个 worker 同时落库同一维度不会丢失更新
+    """
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    day, user_id, endpoint, task, provider, model = key
+    usage = LLMUsageDailyModel.__table__
+    stmt = insert(usage).values(
+        id=str(uuid.uuid4()),
+        date=day,
+        user_id=user_id,
+        endpoint=endpoint,
+        task=task,
+        provider=provider,
+        model=model,
+        updated_at=datetime.now(),
+        **counts,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[usage.c.date, usage.c.user_id, usage.c.endpoint, usage.c.task, usage.c.provider, usage.c.model],
+        set_={
+            **{name: usage.c[name] + stmt.excluded[name] for name in counts},
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    price = settings.LLM_MODEL_PRICES.get(model)
+    if price is None:
+        return None
+    return (prompt_tokens * price.get("prompt", 0.0) + completion_tokens * price.get("completion", 0.0)) / 1_000_000
+
+class UsageService:
+    """
+    LLM 用量：进程内聚合定期落库、调用前的每日配额检查与花费汇总
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        # (日期, 用户 | None 表示全部) -> (已落库 token 数, 读取时间)
+        self._flushed: Dict[Tuple[date, Optional[str]], Tuple[int, float]] = {}
+        self.downgrades = 0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.LLM_USAGE_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"LLM Usage Flush Error: {e}")
+
+    async def flush(self) -> None:
+        pending = usage_tracker.drain()
+        if not pending:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                dialect = db.bind.dialect.name
+                for key, counts in pending.items():
+                    await db.execute(upsert_statement(dialect, key, counts))
+                await db.commit()
+        except BaseException:
+            usage_tracker.restore(pending)
+            raise
+        # 已落库部分变化，下次检查配额时重新读取
+        self._flushed.clear()
+
+    async def used_today(self, user_id: Optional[str] = None) -> int:
+        """
+        今日已用 token 数 (已落库 + 本进程未落库)，user_id 为空时统计所有用户。
+        已落库部分最多缓存 LLM_USAGE_FLUSH_SECONDS，其他 worker 的用量在此延迟内可见
+        """
+        day = date.today()
+        cached = self._flushed.get((day, user_id))
+        if cached is None or time.monotonic() - cached[1] > settings.LLM_USAGE_FLUSH_SECONDS:
+            query = select(func.coalesce(
+                func.sum(LLMUsageDailyModel.prompt_tokens + LLMUsageDailyModel.completion_tokens), 0
+            )).filter(LLMUsageDailyModel.date == day)
+            if user_id is not None:
+                query = query.filter(LLMUsageDailyModel.user_id == user_id)
+            async with AsyncSessionLocal() as db:
+                flushed = int((await db.execute(query)).scalar())
+            if cached is None and len(self._flushed) >= 10000:
+                self._flushed.clear()
+            self._flushed[(day, user_id)] = (flushed, time.monotonic())
+        else:
+            flushed = cached[0]
+        return flushed + usage_tracker.pending_tokens(day, user_id)
+
+    async def allow(self, user_id: Optional[str]) -> bool:
+        """
+        调用 LLM 前检查用户及全局的每日配额。检查不预占额度，并发调用可能略微超出配额；
+        读取用量失败时放行，不因统计故障中断服务
+        """
+        try:
+            exhausted = (
+                user_id and settings.LLM_USER_DAILY_TOKEN_QUOTA > 0
+                and await self.used_today(user_id) >= settings.LLM_USER_DAILY_TOKEN_QUOTA
+            ) or (
+                settings.LLM_DAILY_TOKEN_QUOTA > 0
+                and await self.used_today() >= settings.LLM_DAILY_TOKEN_QUOTA
+            )
+        except Exception as e:
+            print(f"LLM Quota Check Error: {e}")
+            return True
+        if exhausted:
+            self.downgrades += 1
+            return False
+        return True
+
+    async def summarize(self, start_date: date, end_date: date, group_by: str, limit: int) -> Dict[str, Any]:
+        """
+        汇总 [start_date, end_date] 内的用量与估算花费，按 group_by 分组、按 token 总量降序
+        """
+        # 先落库本进程的未落库部分，汇总才完整
+        await self.flush()
+        columns = GROUP_COLUMNS[group_by]
+        # 花费按模型单价计算，因此总是带上模型列，再在内存中合并到分组
+        model_column = () if group_by == "model" else (LLMUsageDailyModel.model,)
+        query = select(
+            *columns,
+            *model_column,
+            func.sum(LLMUsageDailyModel.calls),
+            func.sum(LLMUsageDailyModel.prompt_tokens),
+            func.sum(LLMUsageDailyModel.completion_tokens),
+            func.sum(LLMUsageDailyModel.estimated_calls),
+            func.sum(LLMUsageDailyModel.latency_sum),
+        ).filter(
+            LLMUsageDailyModel.date >= start_date,
+            LLMUsageDailyModel.date <= end_date
+        ).group_by(*columns, *model_column)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        total = self._empty_group("all")
+        for row in rows:
+            keys = row[:len(columns)]
+            model = row[len(columns) - 1] if group_by == "model" else row[len(columns)]
+            calls, prompt_tokens, completion_tokens, estimated_calls, latency_sum = row[-5:]
+            name = "/".join(str(k) for k in keys)
+            cost = estimate_cost(model, prompt_tokens, completion_tokens)
+            for group in (groups.setdefault(name, self._empty_group(name)), total):
+                group["calls"] += calls
+                group["prompt_tokens"] += prompt_tokens
+                group["completion_tokens"] += completion_tokens
+                group["estimated_calls"] += estimated_calls
+                group["latency_sum"] += latency_sum
+                if cost is None:
+                    group["unpriced_tokens"] += prompt_tokens + completion_tokens
+                else:
+                    group["cost"] += cost
+
+        ranked = sorted(groups.values(), key=lambda g: -(g["prompt_tokens"] + g["completion_tokens"]))
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "group_by": group_by,
+            "total": self._finish_group(total),
+            "groups": [self._finish_group(g) for g in ranked[:limit]],
+            "quota_downgrades": self.downgrades,
+        }
+
+    @staticmethod
+    def _empty_group(name: str) -> Dict[str, Any]:
+        return {
+            "group": name, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "estimated_calls": 0, "latency_sum": 0.0, "cost": 0.0, "unpriced_tokens": 0,
+        }
+
+    @staticmethod
+    def _finish_group(group: Dict[str, Any]) -> Dict[str, Any]:
+        latency_sum = group.pop("latency_sum")
+        group["total_tokens"] = group["prompt_tokens"] + group["completion_tokens"]
+        group["avg_latency"] = latency_sum / group["calls"] if group["calls"] else None
+        group["cost"] = round(group["cost"], 6)
+        return group
+
+    def stats(self) -> Dict[str, Any]:
+        return {"quota_downgrades": self.downgrades}
+
+    def metric_families(self) -> List[MetricFamily]:
+        return usage_tracker.metric_families() + [
+            MetricFamily("jifou_llm_quota_downgrades_total", "counter", "Calls served locally because a daily token quota was exhausted", [("", {}, self.downgrades)]),
+        ]
+
+usage_service = UsageService()
@@ -0,0 +1,48 @@
+from sqlalchemy import event, select
+from typing import Optional
+from ..core.cache import LRUCache
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.models import UserModel
+
+class UserService:
+    """
+    用户查询，按主键走短 TTL 的进程内缓存，鉴权热路径无需每次访问数据库
+    """
+
+    def __init__(self):
+        self.cache = LRUCache(settings.AUTH_USER_CACHE_MAX_ENTRIES, settings.AUTH_USER_CACHE_TTL_SECONDS)
+
+    async def get_by_id(self, user_id: str) -> Optional[UserModel]:
+        user = self.cache.get(user_id)
+        if user is not None:
+            return user
+
+        async with AsyncSessionLocal() as db:
+            user = await db.get(UserModel, user_id)
+            if user is None:
+                return None
+            # 脱离会话后只读共享，缓存不持有连接
+            db.expunge(user)
+        self.cache.set(user_id, user)
+        return user
+
+    async def get_by_phone(self, phone_number: str) -> Optional[UserModel]:
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(
+                select(UserModel).filter(UserModel.phone_number == phone_number)
+            )).scalars().first()
+            if user is not None:
+                db.expunge(user)
+        return user
+
+    def invalidate(self, user_id: str) -> None:
+        self.cache.delete(user_id)
+
+user_service = UserService()
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: UserModel) -> None:
+    # 通过 ORM 更新/删除用户 (含停用) 时清除本进程缓存；其他进程依赖 TTL 过期
+    user_service.invalidate(target.id)
@@ -0,0 +1,64 @@
+"""
+回填记录的搜索词项 (search_terms) 与本地文本向量 (embedding)，
+写入后由 FTS5 触发器 / tsvector 表达式索引自动建立倒排索引
+
+用法 (在 server/ 目录下):
+    python scripts/backfill_search.py                # 只处理尚未建立索引的记录
+    python scripts/backfill_search.py --all          # 重新计算全部 (切分规则或向量维度变化后)
+    python scripts/backfill_search.py --rebuild-fts  # SQLite：VACUUM 或重建 records 表后重建 FTS5 索引
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, text, update  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.core.text_index import index_terms, user_namespace  # noqa: E402
+from app.models.models import RecordModel  # noqa: E402
+from app.services.local_classifier import embed_texts  # noqa: E402
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--all", action="store_true")
+    parser.add_argument("--rebuild-fts", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    if args.rebuild_fts:
+        if engine.dialect.name != "sqlite":
+            print("--rebuild-fts only applies to SQLite")
+            return
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO records_fts(records_fts) VALUES ('rebuild')"))
+        print("rebuilt records_fts")
+        return
+
+    total, last_id = 0, ""
+    with SessionLocal() as db:
+        while True:
+            # 按主键分块，每块单独提交，中断后重跑只处理剩余部分
+            query = select(RecordModel.id, RecordModel.user_id, RecordModel.content).filter(
+                RecordModel.id > last_id,
+                RecordModel.deleted_at.is_(None)
+            )
+            if not args.all:
+                query = query.filter(RecordModel.search_terms.is_(None))
+            rows = db.execute(query.order_by(RecordModel.id).limit(args.chunk_size)).all()
+            if not rows:
+                break
+            vectors = embed_texts([content for _, _, content in rows])
+            db.execute(update(RecordModel), [
+                {"id": record_id, "search_terms": index_terms(content, user_namespace(user_id)), "embedding": vector.tobytes()}
+                for (record_id, user_id, content), vector in zip(rows, vectors)
+            ])
+            db.commit()
+            total += len(rows)
+            last_id = rows[-1][0]
+
+    print(f"indexed {total} records")
+
+if __name__ == "__main__":
+    main()
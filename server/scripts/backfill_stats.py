@@ -0,0 +1,64 @@
+"""
+从已有记录回填每日统计汇总 (daily_stats / daily_category_stats)
+
+用法 (在 server/ 目录下):
+    python scripts/backfill_stats.py            # 所有用户
+    python scripts/backfill_stats.py --user-id <id>
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import delete, select  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.models import DailyCategoryStatModel, DailyStatModel, RecordModel  # noqa: E402
+from app.schemas.record import AnalysisStatus  # noqa: E402
+from app.services.stats_service import aggregate_records, upsert_statements  # noqa: E402
+
+def backfill_user(db, user_id: str, records) -> int:
+    db.execute(delete(DailyStatModel).where(DailyStatModel.user_id == user_id))
+    db.execute(delete(DailyCategoryStatModel).where(DailyCategoryStatModel.user_id == user_id))
+    aggregates = aggregate_records(records)
+    for (agg_user_id, day), agg in aggregates.items():
+        for stmt in upsert_statements(engine.dialect.name, agg_user_id, day, agg):
+            db.execute(stmt)
+    db.commit()
+    return len(aggregates)
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    query = select(RecordModel).filter(
+        RecordModel.analysis_status != AnalysisStatus.PENDING.value,
+        RecordModel.deleted_at.is_(None)
+    )
+    if args.user_id:
+        query = query.filter(RecordModel.user_id == args.user_id)
+    query = query.order_by(RecordModel.user_id, RecordModel.created_at).execution_options(yield_per=args.chunk_size)
+
+    users = days = 0
+    # 读写分开两个会话：读会话持续流式拉取，写会话按用户提交
+    with SessionLocal() as reader, SessionLocal() as writer:
+        current_user, buffer = None, []
+        for record in reader.execute(query).scalars():
+            if record.user_id != current_user and buffer:
+                days += backfill_user(writer, current_user, buffer)
+                users += 1
+                buffer = []
+                reader.expunge_all()
+            current_user = record.user_id
+            buffer.append(record)
+        if buffer:
+            days += backfill_user(writer, current_user, buffer)
+            users += 1
+
+    print(f"backfilled {days} user-days for {users} users")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+并发吞吐基准：对比同步 Session 与 AsyncSession 在事件循环中的表现
+
+用法 (在 server/ 目录下):
+    python scripts/bench_async_db.py --records 20000 --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmpdir = tempfile.mkdtemp(prefix="jifou-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+from sqlalchemy import select  # noqa: E402
+from app.core.database import Base, engine, SessionLocal, AsyncSessionLocal  # noqa: E402
+from app.models.models import UserModel, RecordModel  # noqa: E402
+from app.services.record_service import record_service  # noqa: E402
+
+USER_ID = "bench-user"
+
+def seed(n_records: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.get(UserModel, USER_ID):
+            return
+        db.add(UserModel(id=USER_ID, phone_number="10000000000", full_name="bench"))
+        now = datetime.now()
+        db.bulk_insert_mappings(RecordModel, [
+            {
+                "id": f"r{i}",
+                "user_id": USER_ID,
+                "content": f"记录 {i}",
+                "record_type": "text",
+                "created_at": now - timedelta(minutes=i),
+                "emotion_score": 0.5,
+                "categories": ["happiness"],
+            }
+            for i in range(n_records)
+        ])
+        db.commit()
+
+async def sync_request(limit: int) -> None:
+    # 旧路径：在协程中直接调用同步 Session，查询期间事件循环被阻塞
+    with SessionLocal() as db:
+        db.query(RecordModel).filter(RecordModel.user_id == USER_ID).order_by(RecordModel.created_at.desc()).limit(limit).all()
+
+async def async_request(limit: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await record_service.get_recent_records(db, USER_ID, limit)
+
+async def run(handler, total: int, concurrency: int, limit: int):
+    sem = asyncio.Semaphore(concurrency)
+    lag = {"max": 0.0}
+    stop = asyncio.Event()
+
+    async def probe():
+        # 测量事件循环延迟：期望每 5ms 醒来一次
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag["max"] = max(lag["max"], time.perf_counter() - t0 - 0.005)
+
+    async def one():
+        async with sem:
+            await handler(limit)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return total / elapsed, lag["max"] * 1000
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.records)
+    # 预热连接
+    await async_request(1)
+
+    for name, handler in (("sync Session", sync_request), ("AsyncSession", async_request)):
+        rps, max_lag = await run(handler, args.requests, args.concurrency, args.limit)
+        print(f"{name:<14} {rps:8.1f} req/s   max loop lag {max_lag:8.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+鉴权依赖微基准：对比「解码 JWT + 按手机号查库」与「解码 JWT + 主键缓存」的单请求开销
+
+用法 (在 server/ 目录下):
+    python scripts/bench_auth.py --iterations 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmpdir = tempfile.mkdtemp(prefix="jifou-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+from jose import jwt  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from app.api.auth import get_current_user  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.models.models import UserModel  # noqa: E402
+
+async def legacy_auth(token: str) -> UserModel:
+    # 旧实现：每个请求都解码后按手机号查询一次数据库
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(UserModel).filter(UserModel.phone_number == payload["sub"])
+        )).scalars().first()
+
+async def measure(name: str, fn, token: str, iterations: int) -> None:
+    await fn(token)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await fn(token)
+    per_call = (time.perf_counter() - started) / iterations * 1e6
+    print(f"{name:<22} {per_call:8.1f} µs/request")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    async with AsyncSessionLocal() as db:
+        user = UserModel(phone_number="13800000000", full_name="bench")
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+
+    token = create_access_token(subject=user.phone_number, claims={"uid": user.id})
+    await measure("decode + DB lookup", legacy_auth, token, args.iterations)
+    await measure("decode + cached by id", get_current_user, token, args.iterations)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+密码哈希基准：对比在事件循环内直接 bcrypt 校验与放入线程池后的吞吐量和事件循环延迟
+
+用法 (在 server/ 目录下):
+    python scripts/bench_password_hash.py --logins 64 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from passlib.context import CryptContext  # noqa: E402
+
+async def watch_loop_lag(stop: asyncio.Event) -> float:
+    # 每 10ms 醒来一次，记录最大的调度延迟
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+async def run(name: str, verify, logins: int) -> None:
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lag = await watcher
+    print(f"{name:<18} {logins / elapsed:8.1f} logins/s   max loop lag {lag * 1000:8.1f} ms")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash("correct horse battery staple")
+
+    async def inline_verify() -> None:
+        context.verify("correct horse battery staple", hashed)
+
+    await run("inline", inline_verify, args.logins)
+
+    workers = 1
+    while workers <= max(1, os.cpu_count() or 1):
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        async def pooled_verify() -> None:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, context.verify, "correct horse battery staple", hashed
+            )
+
+        await run(f"pool x{workers}", pooled_verify, args.logins)
+        executor.shutdown()
+        workers *= 2
+
+if __name__ == "__main__":
+    asyncio.run(main())
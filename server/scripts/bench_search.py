@@ -0,0 +1,125 @@
+"""
+记录搜索基准：为一个用户生成合成记录 (另有若干用户的干扰数据)，
+统计 keyword / semantic / hybrid 三种模式及带过滤条件时的 p50 / p95 耗时
+
+用法 (在 server/ 目录下):
+    python scripts/bench_search.py --records 100000 --other-users 4 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmpdir = tempfile.mkdtemp(prefix="jifou-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+from sqlalchemy import insert, text  # noqa: E402
+from app.core.database import Base, engine, AsyncSessionLocal  # noqa: E402
+from app.core.text_index import index_terms, user_namespace  # noqa: E402
+from app.models.models import UserModel, RecordModel  # noqa: E402
+from app.services.local_classifier import embed_texts  # noqa: E402
+from app.services.search_index import vector_index_cache  # noqa: E402
+from app.services.search_service import search_service  # noqa: E402
+
+USER_ID = "bench-user"
+CHUNK = 20000
+
+PLACES = ["公园", "公司", "家里", "健身房", "咖啡馆", "地铁", "医院", "超市", "学校", "海边"]
+ACTIONS = ["跑步五公里", "加班到很晚", "和朋友吃火锅", "看了一场电影", "读完一本书", "开了三个会",
+           "做了瑜伽", "失眠到凌晨", "买了新耳机", "给家人打电话", "散步半小时", "写代码", "练吉他"]
+FEELINGS = ["很开心", "有点累", "压力很大", "心情不错", "挺满足的", "很焦虑", "感觉轻松", "有些失望"]
+CATEGORIES = ["health", "wealth", "happiness"]
+QUERIES = ["跑步", "火锅", "加班", "失眠", "电影", "瑜伽", "吉他", "家人", "咖啡馆", "压力", "开心", "地铁 看书", "run"]
+
+def make_content(rng: random.Random) -> str:
+    parts = [f"今天在{rng.choice(PLACES)}{rng.choice(ACTIONS)}，{rng.choice(FEELINGS)}。" for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.05:
+        parts.append("Morning run before work.")
+    return "".join(parts)
+
+def seed(n_records: int, other_users: int) -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=365)
+    users = [USER_ID] + [f"other-{i}" for i in range(other_users)]
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel.__table__), [
+            {"id": user_id, "phone_number": f"1{i:010d}", "full_name": user_id, "is_active": True, "change_seq": n_records}
+            for i, user_id in enumerate(users)
+        ])
+        for user_id in users:
+            for offset in range(0, n_records, CHUNK):
+                size = min(CHUNK, n_records - offset)
+                contents = [make_content(rng) for _ in range(size)]
+                vectors = embed_texts(contents)
+                conn.execute(insert(RecordModel.__table__), [
+                    {
+                        "id": f"{user_id}-{offset + i}",
+                        "user_id": user_id,
+                        "content": content,
+                        "record_type": "text",
+                        "created_at": start + timedelta(seconds=rng.randrange(365 * 86400)),
+                        "updated_at": start,
+                        "emotion_score": rng.random(),
+                        "categories": rng.sample(CATEGORIES, rng.randint(1, 2)),
+                        "analysis_status": "done",
+                        "change_seq": offset + i + 1,
+                        "search_terms": index_terms(content, user_namespace(user_id)),
+                        "embedding": vector.tobytes(),
+                    }
+                    for i, (content, vector) in enumerate(zip(contents, vectors))
+                ])
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("INSERT INTO records_fts(records_fts) VALUES ('optimize')"))
+        conn.execute(text("ANALYZE"))
+
+async def measure(name: str, n_queries: int, **kwargs) -> None:
+    rng = random.Random(7)
+    samples, hits = [], 0
+    async with AsyncSessionLocal() as db:
+        for _ in range(n_queries):
+            begin = time.perf_counter()
+            results = await search_service.search(db, USER_ID, rng.choice(QUERIES), **kwargs)
+            samples.append(time.perf_counter() - begin)
+            hits += len(results)
+    samples.sort()
+    p50 = statistics.median(samples) * 1000
+    p95 = samples[int(len(samples) * 0.95) - 1] * 1000
+    print(f"  {name:<34} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  avg hits {hits / n_queries:.1f}")
+
+async def run(n_queries: int) -> None:
+    async with AsyncSessionLocal() as db:
+        begin = time.perf_counter()
+        await vector_index_cache.get(db, USER_ID)
+        print(f"  vector index cold build              {(time.perf_counter() - begin) * 1000:7.0f} ms")
+
+    last_month = date.today() - timedelta(days=30)
+    await measure("keyword", n_queries, mode="keyword")
+    await measure("keyword + last 30 days", n_queries, mode="keyword", start_date=last_month)
+    await measure("keyword + category + emotion", n_queries, mode="keyword", category="health", emotion="positive")
+    await measure("semantic", n_queries, mode="semantic")
+    await measure("semantic + category + emotion", n_queries, mode="semantic", category="health", emotion="positive")
+    await measure("hybrid", n_queries, mode="hybrid")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--other-users", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    begin = time.perf_counter()
+    seed(args.records, args.other_users)
+    print(f"seeded {args.records} records x {args.other_users + 1} users in {time.perf_counter() - begin:.1f}s ({engine.dialect.name})")
+    asyncio.run(run(args.queries))
+
+if __name__ == "__main__":
+    main()
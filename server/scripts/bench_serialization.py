@@ -0,0 +1,101 @@
+"""
+记录列表响应的序列化基准：对比 Pydantic 校验 + 序列化、jsonable_encoder + json、
+直接组装字典 + orjson / MessagePack 的耗时，以及 gzip / brotli 压缩后的大小。
+同时校验直接组装的 JSON 与 Pydantic 输出逐字节相同。
+
+用法 (在 server/ 目录下):
+    python scripts/bench_serialization.py --records 10000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from app.core import compression  # noqa: E402
+from app.core.serialization import dumps_json, dumps_msgpack, ormsgpack  # noqa: E402
+from app.models.models import RecordModel  # noqa: E402
+from app.schemas.record import Record, record_payload  # noqa: E402
+
+CATEGORIES = ["health", "wealth", "happiness", "work", "family"]
+
+def make_records(n: int) -> List[RecordModel]:
+    rng = random.Random(42)
+    start = datetime(2026, 1, 1)
+    return [
+        RecordModel(
+            id=f"{i:08d}-0000-4000-8000-000000000000",
+            user_id="u0",
+            content="今天跑步五公里，晚上和家人吃饭，心情不错。" * rng.randint(1, 4),
+            record_type="text",
+            created_at=start + timedelta(seconds=rng.randrange(365 * 86400), microseconds=rng.randrange(1000000)),
+            emotion_score=rng.random() if rng.random() > 0.1 else None,
+            categories=rng.sample(CATEGORIES, rng.randint(0, 3)),
+            analysis_status="done",
+        )
+        for i in range(n)
+    ]
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_records(args.records)
+    adapter = TypeAdapter(List[Record])
+
+    # 1. 直接组装的输出必须与 response_model 路径一致
+    expected = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    actual = dumps_json([record_payload(r) for r in rows])
+    assert actual == expected, "record_payload + orjson 与 Pydantic 输出不一致"
+
+    cases = {
+        # FastAPI 默认路径：response_model 校验 ORM 对象后由 pydantic-core 直接输出 JSON
+        "pydantic validate + dump_json": lambda: adapter.dump_json(adapter.validate_python(rows, from_attributes=True)),
+        # 自定义 response_class 时的路径：校验 -> dict -> jsonable_encoder -> json.dumps
+        "validate + jsonable_encoder + json": lambda: json.dumps(
+            jsonable_encoder(adapter.dump_python(adapter.validate_python(rows, from_attributes=True))),
+            ensure_ascii=False,
+        ).encode("utf-8"),
+        "record_payload + orjson": lambda: dumps_json([record_payload(r) for r in rows]),
+    }
+    if ormsgpack is not None:
+        cases["record_payload + msgpack"] = lambda: dumps_msgpack([record_payload(r) for r in rows])
+
+    print(f"{args.records} records, median of {args.repeat} runs")
+    for name, fn in cases.items():
+        print(f"  {name:<38} {timed(fn, args.repeat):8.2f} ms  {len(fn()):>10} bytes")
+
+    # 2. 压缩后的大小与耗时
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    payloads = {"json": actual}
+    if ormsgpack is not None:
+        payloads["msgpack"] = dumps_msgpack([record_payload(r) for r in rows])
+    for fmt, content in payloads.items():
+        for encoding in encodings:
+            compressed = compression.compress(content, encoding)
+            elapsed = timed(lambda: compression.compress(content, encoding), max(3, args.repeat // 4))
+            label = f"{fmt} + {encoding}"
+            print(f"  {label:<38} {elapsed:8.2f} ms  {len(compressed):>10} bytes ({len(compressed) / len(content):.0%})")
+    if compression.brotli is None:
+        print("  (brotli 未安装，跳过 br)")
+
+if __name__ == "__main__":
+    main()
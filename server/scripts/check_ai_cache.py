@@ -0,0 +1,47 @@
+"""
+SQLite 缓存过期清理检查：过期条目读取时不可见，并在每 purge_every 次写入时从文件中删除
+
+用法 (在 server/ 目录下):
+    python scripts/check_ai_cache.py
+"""
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.cache import SQLiteCacheTier  # noqa: E402
+
+def row_keys(path: str) -> set:
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT key FROM cache_entries")}
+
+async def main(path: str) -> None:
+    ttl = 1
+    cache = SQLiteCacheTier(path, ttl_seconds=ttl, purge_every=3)
+
+    print("1. entries expire but stay on disk until a purge")
+    await cache.set("old:1", {"emotion_score": 0.5})
+    await cache.set("old:2", {"emotion_score": 0.6})
+    time.sleep(ttl + 0.1)
+    assert await cache.get("old:1") is None
+    assert row_keys(path) == {"old:1", "old:2"}, row_keys(path)
+
+    print("2. every third write deletes expired rows")
+    await cache.set("new:1", {"emotion_score": 0.7})
+    keys = row_keys(path)
+    assert keys == {"new:1"}, keys
+    assert await cache.get("new:1") == {"emotion_score": 0.7}
+    print(f"   rows left: {sorted(keys)}")
+    print("ok")
+
+if __name__ == "__main__":
+    tmp_dir = tempfile.mkdtemp(prefix="jifou-check-")
+    try:
+        asyncio.run(main(os.path.join(tmp_dir, "ai_cache.db")))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
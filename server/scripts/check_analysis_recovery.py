@@ -0,0 +1,76 @@
+"""
+分析认领恢复检查：worker 池运行期间，一条记录的认领过期 (认领它的 worker 已退出)，
+验证定期清扫会重新投递并完成分析，而不必等到下次启动
+
+用法 (在 server/ 目录下):
+    python scripts/check_analysis_recovery.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 使用临时 SQLite 库与进程内队列，并把认领时长缩短到 1 秒
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="jifou-check-"), "check.db")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DB_PATH}",
+    "TASK_QUEUE_BACKEND": "memory",
+    "ANALYSIS_CLAIM_TIMEOUT_SECONDS": "1",
+})
+
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.models.models import RecordModel, UserModel  # noqa: E402
+from app.schemas.record import AnalysisStatus  # noqa: E402
+from app.services.ai_service import ai_service  # noqa: E402
+from app.services.analysis_service import analysis_service  # noqa: E402
+
+async def record_status(record_id: str) -> str:
+    async with AsyncSessionLocal() as db:
+        return (await db.get(RecordModel, record_id)).analysis_status
+
+async def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    # 不调用模型，分析由本地分类器完成
+    ai_service.router = None
+    await analysis_service.start()
+    try:
+        print("1. a worker claims a record and exits while the pool is running")
+        async with AsyncSessionLocal() as db:
+            user = UserModel(phone_number="13800000000")
+            db.add(user)
+            await db.flush()
+            record = RecordModel(
+                user_id=user.id,
+                content="今天跑了五公里，很舒服",
+                categories=[],
+                analysis_status=AnalysisStatus.PENDING.value,
+                analysis_claimed_at=datetime.now(),
+            )
+            db.add(record)
+            await db.commit()
+            record_id = record.id
+        assert await record_status(record_id) == AnalysisStatus.PENDING.value
+
+        print("2. the sweep re-submits the record once its claim expires")
+        started = time.perf_counter()
+        deadline = started + 5
+        while await record_status(record_id) == AnalysisStatus.PENDING.value:
+            assert time.perf_counter() < deadline, "expired claim was not recovered"
+            await asyncio.sleep(0.1)
+        status = await record_status(record_id)
+        assert status == AnalysisStatus.DONE.value, status
+        print(f"   recovered after {time.perf_counter() - started:.1f}s")
+    finally:
+        await analysis_service.stop()
+    print("ok")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutil.rmtree(os.path.dirname(DB_PATH), ignore_errors=True)
@@ -0,0 +1,153 @@
+"""
+LLM 客户端韧性检查：在本地假服务 (fake_llm_server.py) 上依次验证
+并发上限、5xx/429 重试、单次调用截止时间、熔断与恢复、多服务商故障切换与 token 用量记录，并打印延迟直方图
+
+用法 (在 server/ 目录下):
+    python scripts/check_llm_client.py
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 缩短超时与退避，让检查在几秒内完成
+os.environ.update({
+    "LLM_REQUEST_TIMEOUT_SECONDS": "0.5",
+    "LLM_CALL_DEADLINE_SECONDS": "2",
+    "LLM_MAX_IN_FLIGHT": "4",
+    "LLM_MAX_RETRIES": "3",
+    "LLM_BACKOFF_BASE_SECONDS": "0.02",
+    "LLM_BACKOFF_MAX_SECONDS": "0.1",
+    "LLM_BREAKER_FAILURE_THRESHOLD": "3",
+    "LLM_BREAKER_RESET_SECONDS": "1",
+    "LLM_PROVIDER_DEADLINE_SECONDS": "0.7",
+})
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from app.core.llm_client import CircuitBreaker, LLMCompletion, LLMUnavailableError, ResilientLLMClient  # noqa: E402
+from app.core.llm_router import LLMProvider, LLMRouter  # noqa: E402
+from app.core.usage import usage_tracker  # noqa: E402
+from fake_llm_server import create_app  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "今天跑了五公里，很舒服"}]
+
+def start_server() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+async def configure(http: httpx.AsyncClient, **control) -> None:
+    defaults = {"latency_ms": 0, "jitter_ms": 0, "error_rate": 0, "error_status": 500}
+    (await http.post("/_control", json={**defaults, **control})).raise_for_status()
+
+async def server_stats(http: httpx.AsyncClient) -> dict:
+    return (await http.get("/_stats")).json()
+
+async def call(client: ResilientLLMClient):
+    try:
+        return await client.complete("fake-model", MESSAGES)
+    except LLMUnavailableError as e:
+        return e
+
+def new_client(base_url: str) -> ResilientLLMClient:
+    return ResilientLLMClient("fake", api_key="test", base_url=f"{base_url}/v1")
+
+async def main() -> None:
+    base_url = start_server()
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        print("1. concurrency cap")
+        await configure(http, latency_ms=100)
+        client = new_client(base_url)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(client) for _ in range(20)))
+        elapsed = time.perf_counter() - started
+        stats = await server_stats(http)
+        assert all(isinstance(r, LLMCompletion) for r in results), results
+        assert stats["max_in_flight"] <= 4, stats
+        print(f"   20 calls in {elapsed:.2f}s, server saw max {stats['max_in_flight']} in flight")
+
+        print("2. retries on 503")
+        await configure(http, error_rate=0.5, error_status=503)
+        client = new_client(base_url)
+        results = await asyncio.gather(*(call(client) for _ in range(20)))
+        succeeded = sum(isinstance(r, LLMCompletion) for r in results)
+        assert client.retries > 0 and succeeded >= 15, (succeeded, client.stats())
+        print(f"   {succeeded}/20 succeeded with {client.retries} retries")
+
+        print("3. 429 exhausts retries")
+        await configure(http, error_rate=1.0, error_status=429)
+        client = new_client(base_url)
+        result = await call(client)
+        stats = await server_stats(http)
+        assert isinstance(result, LLMUnavailableError), result
+        assert stats["requests"] == 4, stats
+        print(f"   gave up after {stats['requests']} attempts: {result}")
+
+        print("4. per-call deadline")
+        await configure(http, latency_ms=1500)
+        client = new_client(base_url)
+        started = time.perf_counter()
+        result = await call(client)
+        elapsed = time.perf_counter() - started
+        assert isinstance(result, LLMUnavailableError), result
+        assert elapsed < 2.5, elapsed
+        print(f"   slow provider abandoned after {elapsed:.2f}s")
+
+        print("5. circuit breaker")
+        await configure(http, error_rate=1.0, error_status=500)
+        client = new_client(base_url)
+        for _ in range(3):
+            await call(client)
+        assert client.breaker.state == CircuitBreaker.OPEN, client.stats()
+        await configure(http, error_rate=1.0, error_status=500)
+        started = time.perf_counter()
+        result = await call(client)
+        fast_fail = time.perf_counter() - started
+        stats = await server_stats(http)
+        assert isinstance(result, LLMUnavailableError) and stats["requests"] == 0, stats
+        print(f"   open after {client.breaker.trips} trip, rejected in {fast_fail * 1000:.2f} ms without a request")
+        await configure(http)
+        await asyncio.sleep(1.1)
+        result = await call(client)
+        assert isinstance(result, LLMCompletion) and client.breaker.state == CircuitBreaker.CLOSED, client.stats()
+        print("   half-open probe succeeded, circuit closed")
+
+        print("latency histogram (last client):", client.stats()["latency"])
+
+        print("6. failover and latency-aware routing")
+        slow_url = start_server()
+        async with httpx.AsyncClient(base_url=slow_url) as slow_http:
+            await configure(slow_http, latency_ms=1500)
+            await configure(http, latency_ms=20)
+            router = LLMRouter([
+                LLMProvider(ResilientLLMClient("slow", api_key="test", base_url=f"{slow_url}/v1")),
+                LLMProvider(ResilientLLMClient("fast", api_key="test", base_url=f"{base_url}/v1"), {"report": "big-model"}),
+            ])
+            started = time.perf_counter()
+            result = await router.complete("analyze", MESSAGES)
+            elapsed = time.perf_counter() - started
+            assert isinstance(result, str) and router.failovers == 1, router.stats()
+            print(f"   slow provider timed out, served by fast after {elapsed:.2f}s")
+            for _ in range(5):
+                await router.complete("report", MESSAGES)
+            stats = router.stats()
+            assert stats["ranking"][0] == "fast" and stats["routes"]["report"] == {"fast": 5}, stats
+            print(f"   ranking {stats['ranking']}, routes {stats['routes']}")
+            usage = {(t["task"], t["provider"], t["model"]): t for t in usage_tracker.stats()["totals"]}
+            report_usage = usage[("report", "fast", "big-model")]
+            assert report_usage["calls"] == 5 and report_usage["prompt_tokens"] > 0 and not report_usage["estimated_calls"], usage
+            print(f"   token usage recorded: {report_usage}")
+    print("all checks passed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
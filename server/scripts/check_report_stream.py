@@ -0,0 +1,114 @@
+"""
+日报生成互斥检查：同一 (用户, 日期) 的两个并发流式请求、以及流式与非流式请求并发时，
+模型只被调用一次，落后的一方等待后回放已保存的报告
+
+用法 (在 server/ 目录下):
+    python scripts/check_report_stream.py
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 使用临时 SQLite 库，不影响开发数据库
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="jifou-check-"), "check.db")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DB_PATH}",
+    "LLM_USER_DAILY_TOKEN_QUOTA": "0",
+})
+
+from sqlalchemy import func, select  # noqa: E402
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.models.models import DailyReportModel, RecordModel, UserModel  # noqa: E402
+from app.schemas.record import AnalysisStatus  # noqa: E402
+from app.services.ai_service import ai_service  # noqa: E402
+from app.services.report_service import report_service  # noqa: E402
+
+NARRATIVE = {name: f"{name} text" for name in ai_service.REPORT_TEXT_FIELDS}
+
+class CountingRouter:
+    """
+    假的模型路由：记录调用次数，每次调用耗时 latency 秒，保证并发请求在生成期间重叠
+    """
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, task, messages, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return json.dumps(NARRATIVE)
+
+    async def stream(self, task, messages, **kwargs):
+        self.calls += 1
+        text = json.dumps(NARRATIVE)
+        step = len(text) // 4 + 1
+        for i in range(0, len(text), step):
+            await asyncio.sleep(self.latency / 4)
+            yield text[i:i + step]
+
+async def collect(target_date: date, user_id: str) -> list:
+    return [event async for event in report_service.stream_daily_report(target_date, user_id)]
+
+async def get_report(target_date: date, user_id: str):
+    async with AsyncSessionLocal() as db:
+        return await report_service.get_or_generate_daily_report(db, target_date, user_id)
+
+async def report_count(user_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(func.count()).select_from(DailyReportModel).filter(DailyReportModel.user_id == user_id)
+        )).scalar_one()
+
+async def seed(days) -> str:
+    async with AsyncSessionLocal() as db:
+        user = UserModel(phone_number="13800000000")
+        db.add(user)
+        await db.flush()
+        for day in days:
+            db.add(RecordModel(
+                user_id=user.id,
+                content=f"{day} 跑了五公里",
+                created_at=datetime.combine(day, datetime.min.time()).replace(hour=9),
+                emotion_score=0.8,
+                categories=["health"],
+                analysis_status=AnalysisStatus.DONE.value,
+            ))
+        await db.commit()
+        return user.id
+
+async def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    first_day, second_day = date(2026, 3, 1), date(2026, 3, 2)
+    user_id = await seed([first_day, second_day])
+    router = CountingRouter()
+    ai_service.router = router
+
+    print("1. two concurrent streams")
+    a, b = await asyncio.gather(collect(first_day, user_id), collect(first_day, user_id))
+    assert router.calls == 1, router.calls
+    assert a[-1][0] == "done" and b[-1][0] == "done", (a, b)
+    assert a[-1][1].id == b[-1][1].id and b[-1][1].summary == NARRATIVE["summary"], (a[-1], b[-1])
+    assert [e for e in a if e[0] == "field"] == [e for e in b if e[0] == "field"], (a, b)
+    print(f"   LLM calls: {router.calls}")
+
+    print("2. a stream next to a plain GET")
+    router.calls = 0
+    events, report = await asyncio.gather(collect(second_day, user_id), get_report(second_day, user_id))
+    assert router.calls == 1, router.calls
+    assert events[-1][1].id == report.id and report.summary == NARRATIVE["summary"], (events[-1], report)
+    assert await report_count(user_id) == 2
+    print(f"   LLM calls: {router.calls}")
+    print("ok")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutil.rmtree(os.path.dirname(DB_PATH), ignore_errors=True)
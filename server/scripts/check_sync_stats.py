@@ -0,0 +1,84 @@
+"""
+同步与每日统计一致性检查：把已分析的记录通过同步移动到另一天，
+验证原日期与新日期的汇总行都被重建
+
+用法 (在 server/ 目录下):
+    python scripts/check_sync_stats.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 使用临时 SQLite 库，不影响开发数据库
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="jifou-check-"), "check.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.models.models import RecordModel, UserModel  # noqa: E402
+from app.schemas.record import AnalysisStatus  # noqa: E402
+from app.schemas.sync import SyncChange  # noqa: E402
+from app.services.stats_service import stats_service  # noqa: E402
+from app.services.sync_service import sync_service  # noqa: E402
+
+async def day_stats(user_id: str, day: date) -> dict:
+    async with AsyncSessionLocal() as db:
+        return (await stats_service.get_daily_stats(db, user_id, day, day))[0]
+
+async def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    old_day = date(2026, 3, 1)
+    new_day = old_day + timedelta(days=2)
+    created_at = datetime.combine(old_day, datetime.min.time()).replace(hour=9)
+    updated_at = created_at
+
+    async with AsyncSessionLocal() as db:
+        user = UserModel(phone_number="13800000000")
+        db.add(user)
+        await db.flush()
+        record = RecordModel(
+            user_id=user.id,
+            content="早上跑了五公里",
+            created_at=created_at,
+            updated_at=updated_at,
+            emotion_score=8.0,
+            categories=["运动"],
+            analysis_status=AnalysisStatus.DONE.value,
+        )
+        db.add(record)
+        await db.flush()
+        await stats_service.apply_records(db, [record])
+        await db.commit()
+        user_id, record_id = user.id, record.id
+
+    print("1. analyzed record counted on its original day")
+    before = await day_stats(user_id, old_day)
+    assert before["record_count"] == 1 and before["categories"] == {"运动": 1}, before
+
+    print("2. sync moves the record to another day without changing content")
+    async with AsyncSessionLocal() as db:
+        result = await sync_service.sync(db, user_id, 0, [SyncChange(
+            id=record_id,
+            content="早上跑了五公里",
+            created_at=created_at + timedelta(days=2),
+            updated_at=updated_at + timedelta(minutes=1),
+        )])
+    assert result["results"][0]["status"] == "updated", result["results"]
+
+    old_stats = await day_stats(user_id, old_day)
+    new_stats = await day_stats(user_id, new_day)
+    assert old_stats["record_count"] == 0 and old_stats["categories"] == {}, old_stats
+    assert new_stats["record_count"] == 1 and new_stats["avg_emotion"] == 8.0, new_stats
+    assert new_stats["categories"] == {"运动": 1}, new_stats
+    print(f"   {old_day}: {old_stats['record_count']} record(s), {new_day}: {new_stats['record_count']} record(s)")
+    print("ok")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutil.rmtree(os.path.dirname(DB_PATH), ignore_errors=True)
@@ -0,0 +1,99 @@
+"""
+本地分类器评估：在 LLM 标注上按内容哈希切分训练/验证集，报告与 LLM 的一致程度、
+不同置信度阈值下可由本地处理的比例及其一致率，以及单条/批量打分耗时
+
+用法 (在 server/ 目录下):
+    python scripts/eval_classifier.py
+    python scripts/eval_classifier.py --jsonl labels.jsonl --holdout 0.2
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np  # noqa: E402
+from app.services.local_classifier import CATEGORIES, LocalClassifier  # noqa: E402
+from train_classifier import load_labelled, train  # noqa: E402
+
+THRESHOLDS = (0.0, 0.1, 0.2, 0.3, 0.5, 0.7)
+
+def in_holdout(content: str, ratio: float) -> bool:
+    # 按内容哈希切分，重复运行结果稳定，同一内容不会同时出现在两边
+    digest = hashlib.sha256(content.encode("utf-8")).digest()
+    return digest[0] / 256 < ratio
+
+def agreement(rows: List[Dict], predictions: List[Dict]) -> Dict[str, float]:
+    llm = np.array([r["emotion_score"] for r in rows], dtype=np.float64)
+    local = np.array([p["emotion_score"] for p in predictions], dtype=np.float64)
+    result = {
+        "emotion_mae": float(np.abs(llm - local).mean()),
+        "emotion_corr": float(np.corrcoef(llm, local)[0, 1]) if len(rows) > 1 and llm.std() and local.std() else float("nan"),
+        # 正负面方向一致 (以 0.5 为界)
+        "polarity_agree": float(((llm >= 0.5) == (local >= 0.5)).mean()),
+        "category_exact": float(np.mean([set(r["categories"] or []) == set(p["categories"]) for r, p in zip(rows, predictions)])),
+    }
+    for category in CATEGORIES:
+        truth = np.array([category in (r["categories"] or []) for r in rows])
+        guess = np.array([category in p["categories"] for p in predictions])
+        tp = float((truth & guess).sum())
+        precision = tp / guess.sum() if guess.sum() else float("nan")
+        recall = tp / truth.sum() if truth.sum() else float("nan")
+        result[f"{category}_f1"] = 2 * precision * recall / (precision + recall) if precision + recall else float("nan")
+    return result
+
+def report(name: str, classifier: LocalClassifier, rows: List[Dict]) -> None:
+    predictions = classifier.predict([r["content"] for r in rows])
+    print(f"\n== {name} ({len(rows)} holdout records)")
+    for key, value in agreement(rows, predictions).items():
+        print(f"   {key:<16} {value:.3f}")
+    print("   threshold  local share  polarity agree  category exact")
+    confidence = np.array([p["confidence"] for p in predictions])
+    for threshold in THRESHOLDS:
+        mask = confidence >= threshold
+        if not mask.any():
+            print(f"   {threshold:9.2f}  {0:10.1%}")
+            continue
+        kept_rows = [r for r, m in zip(rows, mask) if m]
+        kept_predictions = [p for p, m in zip(predictions, mask) if m]
+        stats = agreement(kept_rows, kept_predictions)
+        print(f"   {threshold:9.2f}  {mask.mean():10.1%}  {stats['polarity_agree']:14.3f}  {stats['category_exact']:14.3f}")
+
+def measure_speed(classifier: LocalClassifier, contents: List[str]) -> None:
+    batch = (contents * (10000 // max(1, len(contents)) + 1))[:10000]
+    started = time.perf_counter()
+    classifier.predict(batch)
+    per_record = (time.perf_counter() - started) / len(batch) * 1e6
+    started = time.perf_counter()
+    for content in batch[:1000]:
+        classifier.predict([content])
+    single = (time.perf_counter() - started) / 1000 * 1e6
+    print(f"\nspeed: {per_record:.1f} µs/record in batches of {len(batch)}, {single:.1f} µs for a single record")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jsonl", default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=40)
+    args = parser.parse_args()
+
+    rows = load_labelled(args.jsonl, args.limit)
+    train_rows = [r for r in rows if not in_holdout(r["content"], args.holdout)]
+    test_rows = [r for r in rows if in_holdout(r["content"], args.holdout)]
+    if not train_rows or not test_rows:
+        print(f"need LLM-labelled records on both sides of the split (have {len(rows)})")
+        return
+
+    report("lexicon prior only", LocalClassifier(), test_rows)
+    started = time.perf_counter()
+    trained = train(train_rows, args.epochs)
+    print(f"\ntrained on {len(train_rows)} records in {time.perf_counter() - started:.2f}s")
+    report("trained", trained, test_rows)
+    measure_speed(trained, [r["content"] for r in test_rows])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+本地 OpenAI 兼容的假 LLM 服务：可注入延迟与错误，用于验证客户端的超时、重试与熔断
+
+用法 (在 server/ 目录下):
+    python scripts/fake_llm_server.py --port 8900 --latency-ms 200 --error-rate 0.1
+
+运行中可通过 POST /_control 调整行为，例如:
+    curl -X POST localhost:8900/_control -d '{"error_rate": 1.0, "error_status": 503}'
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, error_status: int = 500) -> FastAPI:
+    app = FastAPI()
+    app.state.control = {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "error_rate": error_rate,
+        "error_status": error_status,
+        # 流式响应中相邻分片的间隔
+        "chunk_delay_ms": 20,
+    }
+    app.state.requests = 0
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+
+    @app.post("/_control")
+    async def control(request: Request) -> Dict[str, Any]:
+        app.state.control.update(await request.json())
+        app.state.requests = 0
+        app.state.max_in_flight = 0
+        return app.state.control
+
+    @app.get("/_stats")
+    async def stats() -> Dict[str, Any]:
+        return {"requests": app.state.requests, "max_in_flight": app.state.max_in_flight}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        control = app.state.control
+        delay = control["latency_ms"] + random.uniform(0, control["jitter_ms"])
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            await asyncio.sleep(delay / 1000)
+        finally:
+            app.state.in_flight -= 1
+
+        if random.random() < control["error_rate"]:
+            status = int(control["error_status"])
+            headers = {"Retry-After": "0"} if status == 429 else None
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": "injected failure", "type": "server_error", "code": status}},
+                headers=headers,
+            )
+
+        prompt = body["messages"][-1]["content"]
+        content = json.dumps({
+            "emotion_score": 0.8,
+            "categories": ["happiness"],
+            "life_index": 80,
+            "health_score": 75,
+            "wealth_score": 70,
+            "happiness_score": 85,
+            "summary": "今天过得很充实。",
+            "analysis": "运动和工作都有进展，情绪整体积极。",
+            "risk_warning": "注意不要熬夜。",
+            "advice": "明天早点休息。",
+            "echo_length": len(prompt),
+        }, ensure_ascii=False)
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(body.get("model", "fake"), content), media_type="text/event-stream")
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content), "total_tokens": len(prompt) + len(content)},
+        }
+
+    async def stream_chunks(model: str, content: str):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for i in range(0, len(content), 8):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(app.state.control["chunk_delay_ms"] / 1000)
+        yield "data: [DONE]\n\n"
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status),
+        host="127.0.0.1", port=args.port, log_level="warning",
+    )
@@ -0,0 +1,81 @@
+"""
+SQLite 多进程写入压测：对比默认配置与调优配置 (WAL + busy_timeout 等) 下的锁错误数与写吞吐
+
+模拟多个 uvicorn worker 同时写同一个数据库文件，每个进程并发读写。
+
+用法 (在 server/ 目录下):
+    python scripts/stress_sqlite.py --processes 4 --writes 500
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def worker(args) -> tuple:
+    db_path, tuned, worker_id, writes = args
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SQLITE_TUNED"] = "true" if tuned else "false"
+    sys.path.insert(0, SERVER_DIR)
+
+    from sqlalchemy import func, select
+    from sqlalchemy.exc import OperationalError
+    from app.core.database import SessionLocal
+    from app.models.models import RecordModel
+
+    locked = 0
+    ok = 0
+    for i in range(writes):
+        try:
+            with SessionLocal() as db:
+                db.add(RecordModel(
+                    user_id=f"stress-{worker_id}",
+                    content=f"压测记录 {i}",
+                    emotion_score=0.5,
+                    categories=["happiness"],
+                    analysis_status="done",
+                ))
+                db.commit()
+                # 读写交错，模拟列表请求与写入并发
+                db.execute(select(func.count()).select_from(RecordModel).filter(RecordModel.user_id == f"stress-{worker_id}")).scalar_one()
+            ok += 1
+        except OperationalError as e:
+            if "locked" in str(e):
+                locked += 1
+            else:
+                raise
+    return ok, locked
+
+def run(tuned: bool, processes: int, writes: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="jifou-stress-"), "stress.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SERVER_DIR)
+    from sqlalchemy import create_engine
+    from app.core.database import Base
+    from app.models import models  # noqa: F401
+    Base.metadata.create_all(create_engine(f"sqlite:///{db_path}"))
+
+    ctx = multiprocessing.get_context("spawn")
+    started = time.perf_counter()
+    with ctx.Pool(processes) as pool:
+        results = pool.map(worker, [(db_path, tuned, w, writes) for w in range(processes)])
+    elapsed = time.perf_counter() - started
+    ok = sum(r[0] for r in results)
+    locked = sum(r[1] for r in results)
+    label = "tuned (WAL)" if tuned else "default"
+    print(f"{label:<12} {ok / elapsed:8.1f} writes/s   {locked} 'database is locked' errors   {elapsed:.1f}s")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+
+    run(False, args.processes, args.writes)
+    run(True, args.processes, args.writes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+用 LLM 已标注的记录 (analysis_source = 'llm') 训练本地分类器并保存
+
+用法 (在 server/ 目录下):
+    python scripts/train_classifier.py                       # 从数据库读取
+    python scripts/train_classifier.py --jsonl labels.jsonl  # 每行 {"content", "emotion_score", "categories"}
+    python scripts/train_classifier.py --output ./classifier.npz
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.models.models import RecordModel  # noqa: E402
+from app.schemas.record import AnalysisStatus  # noqa: E402
+from app.services.local_classifier import LocalClassifier  # noqa: E402
+
+def load_labelled(jsonl: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+    if jsonl:
+        with open(jsonl, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return rows[:limit] if limit else rows
+
+    query = select(RecordModel.content, RecordModel.emotion_score, RecordModel.categories).filter(
+        RecordModel.analysis_status == AnalysisStatus.DONE.value,
+        RecordModel.analysis_source == "llm",
+        RecordModel.emotion_score.isnot(None),
+        RecordModel.deleted_at.is_(None)
+    ).order_by(RecordModel.created_at.desc())
+    if limit:
+        query = query.limit(limit)
+    with SessionLocal() as db:
+        return [
+            {"content": content, "emotion_score": score, "categories": categories or []}
+            for content, score, categories in db.execute(query)
+        ]
+
+def train(rows: List[Dict], epochs: int) -> LocalClassifier:
+    classifier = LocalClassifier()
+    classifier.fit(
+        [r["content"] for r in rows],
+        [r["emotion_score"] for r in rows],
+        [r["categories"] for r in rows],
+        epochs=epochs,
+    )
+    return classifier
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jsonl", default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--output", default=settings.LOCAL_CLASSIFIER_MODEL_PATH)
+    args = parser.parse_args()
+
+    rows = load_labelled(args.jsonl, args.limit)
+    if not rows:
+        print("no LLM-labelled records found")
+        return
+    classifier = train(rows, args.epochs)
+    classifier.save(args.output)
+    print(f"trained on {len(rows)} records, saved to {args.output}")
+
+if __name__ == "__main__":
+    main()